@@ -1,4 +1,5 @@
 import os
+import click
 from flask import Flask
 from sqlalchemy import BigInteger
 from sqlalchemy.ext.compiler import compiles
@@ -63,6 +64,8 @@ SWAGGER_TEMPLATE = {
                 "status": {"type": "string", "enum": ["active", "retired", "in_storage", "disposed", "maintenance", "planned"]},
                 "data_classification": {"type": "string", "enum": ["CUI", "FCI", "public", "internal"]},
                 "classification": {"type": "string", "description": "Alias for data_classification"},
+                "effective_classification": {"type": "string", "enum": ["CUI", "FCI", "public", "internal"],
+                                             "description": "Most sensitive classification inherited over runs/depends_on edges"},
                 "security_boundary_id": {"type": "integer"},
                 "security_boundary_name": {"type": "string"},
                 "owner_id": {"type": "integer"},
@@ -120,6 +123,32 @@ SWAGGER_TEMPLATE = {
                 "updated_at": {"type": "string", "format": "date-time"}
             }
         },
+        "SeatReconciliation": {
+            "type": "object",
+            "properties": {
+                "session_id": {"type": "string"},
+                "checked": {"type": "integer"},
+                "mismatched": {"type": "integer"},
+                "applied": {"type": "boolean"},
+                "deltas": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "license_id": {"type": "integer"},
+                            "software_asset_id": {"type": "integer"},
+                            "software_name": {"type": "string"},
+                            "vendor": {"type": "string"},
+                            "total_seats": {"type": "integer"},
+                            "recorded_seats": {"type": "integer"},
+                            "actual_seats": {"type": "integer"},
+                            "delta": {"type": "integer"},
+                            "over_allocated": {"type": "boolean"}
+                        }
+                    }
+                }
+            }
+        },
         "SecurityBoundary": {
             "type": "object",
             "properties": {
@@ -147,7 +176,159 @@ SWAGGER_TEMPLATE = {
                 "new_value": {"type": "string"},
                 "changed_at": {"type": "string", "format": "date-time"},
                 "notes": {"type": "string"},
-                "session_id": {"type": "string"}
+                "session_id": {"type": "string"},
+                "archived": {"type": "boolean", "description": "Read from the change archive (change-history endpoints only)"},
+                "compacted": {"type": "integer", "description": "Number of original changes this row represents (change-history endpoints only)"}
+            }
+        },
+        "ArchiveResult": {
+            "type": "object",
+            "properties": {
+                "session_id": {"type": "string"},
+                "cutoff": {"type": "string", "format": "date-time"},
+                "archived": {"type": "integer", "description": "Live rows moved to the archive"},
+                "written": {"type": "integer", "description": "Archived rows after compaction"},
+                "blocks": {"type": "integer"}
+            }
+        },
+        "AssetChangePage": {
+            "type": "object",
+            "properties": {
+                "changes": {"type": "array", "items": {"$ref": "#/definitions/AssetChange"}},
+                "next_cursor": {"type": "string", "description": "Pass as cursor to fetch the next page; null on the last page"},
+                "limit": {"type": "integer"}
+            }
+        },
+        "ImportJob": {
+            "type": "object",
+            "properties": {
+                "job_id": {"type": "string"},
+                "session_id": {"type": "string"},
+                "entity_type": {"type": "string"},
+                "filename": {"type": "string"},
+                "sheet": {"type": "string"},
+                "status": {"type": "string", "enum": ["queued", "running", "completed", "failed", "cancelled"]},
+                "cancel_requested": {"type": "boolean"},
+                "bytes_total": {"type": "integer"},
+                "bytes_read": {"type": "integer"},
+                "progress": {"type": "number", "description": "Fraction of the file read (CSV/TSV only)"},
+                "rows_parsed": {"type": "integer"},
+                "rows_valid": {"type": "integer"},
+                "rows_invalid": {"type": "integer"},
+                "rows_per_second": {"type": "number"},
+                "elapsed_seconds": {"type": "number"},
+                "eta_seconds": {"type": "number", "description": "Estimated seconds remaining (CSV/TSV only)"},
+                "errors": {"type": "array", "items": {"type": "string"}},
+                "error_message": {"type": "string"},
+                "created_at": {"type": "string", "format": "date-time"},
+                "started_at": {"type": "string", "format": "date-time"},
+                "finished_at": {"type": "string", "format": "date-time"}
+            }
+        },
+        "WizardCommitResult": {
+            "type": "object",
+            "properties": {
+                "message": {"type": "string"},
+                "session_id": {"type": "string"},
+                "target_session_id": {"type": "string"},
+                "mode": {"type": "string", "enum": ["insert", "upsert"]},
+                "entities": {
+                    "type": "object",
+                    "description": "Per entity type: staged, inserted, updated, unchanged, deleted, skipped and errors"
+                },
+                "inserted": {"type": "integer"},
+                "updated": {"type": "integer"},
+                "unchanged": {"type": "integer"},
+                "deleted": {"type": "integer"},
+                "skipped": {"type": "integer"},
+                "elapsed_seconds": {"type": "number"}
+            }
+        },
+        "WizardDiff": {
+            "type": "object",
+            "properties": {
+                "message": {"type": "string", "description": "e.g. 320 new, 1,100 changed, 45 would be deleted"},
+                "session_id": {"type": "string"},
+                "target_session_id": {"type": "string"},
+                "natural_keys": {"type": "object", "description": "Key columns used per entity type"},
+                "entities": {
+                    "type": "object",
+                    "description": "Per entity type: staged, new, changed, unchanged, missing, duplicate, skipped and invalid"
+                },
+                "new": {"type": "integer"},
+                "changed": {"type": "integer"},
+                "unchanged": {"type": "integer"},
+                "missing": {"type": "integer"},
+                "duplicate": {"type": "integer"},
+                "skipped": {"type": "integer"},
+                "entries": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "entity_type": {"type": "string"},
+                            "action": {"type": "string", "enum": ["new", "changed", "missing", "duplicate", "skipped"]},
+                            "row_index": {"type": "integer", "description": "Staged row, null for missing rows"},
+                            "id": {"type": "integer", "description": "Matched live row, if any"},
+                            "key": {"type": "string", "description": "Natural key"},
+                            "fields": {"type": "object", "description": "Changed fields: {field: {old, new}}"},
+                            "first_row_index": {"type": "integer", "description": "Earlier row with the same key (duplicate)"},
+                            "error": {"type": "string", "description": "Why the row would be skipped"}
+                        }
+                    }
+                },
+                "total": {"type": "integer", "description": "Entries matching the filters"},
+                "page": {"type": "integer"},
+                "per_page": {"type": "integer"},
+                "version": {"type": "string", "description": "Staged and live versions the diff was computed for"},
+                "cached": {"type": "boolean"},
+                "computed_at": {"type": "string", "format": "date-time"},
+                "elapsed_seconds": {"type": "number"}
+            }
+        },
+        "WizardGCResult": {
+            "type": "object",
+            "properties": {
+                "cutoff": {"type": "string", "format": "date-time", "description": "Sessions idle since before this were removed"},
+                "sessions": {"type": "integer"},
+                "staged_rows": {"type": "integer"},
+                "staged_chunks": {"type": "integer"},
+                "import_jobs": {"type": "integer"},
+                "error_files": {"type": "integer"},
+                "vacuum": {
+                    "type": "object",
+                    "description": "SQLite only; null elsewhere or when vacuum is off",
+                    "properties": {
+                        "ran": {"type": "string", "enum": ["full", "incremental"], "description": "null if below the threshold"},
+                        "database_bytes_before": {"type": "integer"},
+                        "database_bytes_after": {"type": "integer"},
+                        "free_bytes_before": {"type": "integer"},
+                        "free_bytes_after": {"type": "integer"},
+                        "reclaimed_bytes": {"type": "integer"}
+                    }
+                }
+            }
+        },
+        "DiscoveryRun": {
+            "type": "object",
+            "properties": {
+                "id": {"type": "integer"},
+                "source": {"type": "string"},
+                "records": {"type": "integer", "description": "Records read from the feed"},
+                "created": {"type": "integer"},
+                "updated": {"type": "integer"},
+                "unchanged": {"type": "integer"},
+                "stored": {"type": "integer", "description": "Assets set to in_storage after missing runs"},
+                "restored": {"type": "integer", "description": "Stored assets seen again and set back to active"},
+                "skipped": {"type": "integer"},
+                "phases": {"type": "object", "description": "Seconds per phase: index, match, missing, apply, total"},
+                "report": {
+                    "type": "object",
+                    "description": "Up to 100 entries each of created, updated (with per-field old/new), stored, restored and skipped"
+                },
+                "session_id": {"type": "string"},
+                "started_at": {"type": "string", "format": "date-time"},
+                "finished_at": {"type": "string", "format": "date-time"}
             }
         },
         "Person": {
@@ -218,6 +399,14 @@ def create_app(config_name=None):
     # Register error handlers
     register_error_handlers(app)
 
+    # Audit log writer (sync or batched background thread)
+    from app.audit import init_audit
+    init_audit(app)
+
+    # Background wizard import jobs
+    from app.import_jobs import init_import_jobs
+    init_import_jobs(app)
+
     # Health check endpoint
     @app.route('/api/health')
     def health_check():
@@ -268,6 +457,10 @@ def create_app(config_name=None):
     # Register CLI commands
     register_cli(app)
 
+    # Start periodic background tasks
+    from app.tasks import register_tasks
+    register_tasks(app)
+
     return app
 
 
@@ -281,8 +474,13 @@ def register_cli(app):
 
     @app.cli.command('init-db')
     def init_db_command():
-        """Create all database tables."""
-        db.create_all()
+        """Create missing tables and add columns/indexes missing from existing ones."""
+        from app.schema import upgrade_schema
+        added = upgrade_schema()
+        for name in added['columns']:
+            print(f'Added column {name}')
+        for name in added['indexes']:
+            print(f'Added index {name}')
         print('Database initialized.')
 
     @app.cli.command('reset-db')
@@ -293,3 +491,120 @@ def register_cli(app):
         from app.seed import seed
         seed()
         print('Database reset and seeded.')
+
+    @app.cli.command('reconcile-seats')
+    @click.option('--session-id', default=None, help='Only reconcile this session.')
+    @click.option('--apply', is_flag=True, help='Write reconciled seat counts.')
+    def reconcile_seats_command(session_id, apply):
+        """Reconcile license used_seats with the relationship graph."""
+        from app.services.license_service import LicenseService
+        service = LicenseService()
+        if session_id:
+            results = [service.reconcile_seats(session_id, apply=apply, changed_by='cli')]
+        elif apply:
+            results = service.reconcile_all_sessions(changed_by='cli')
+        else:
+            from app.models.license import License
+            session_ids = [sid for (sid,) in db.session.query(License.session_id).distinct()]
+            results = [service.reconcile_seats(sid) for sid in session_ids]
+        for result in results:
+            print(f"{result['session_id']}: {result['mismatched']} of {result['checked']} "
+                  f"licenses differ{' (applied)' if result['applied'] else ''}")
+
+    @app.cli.command('recompute-classifications')
+    @click.option('--session-id', default='__default__', help='Session to recompute.')
+    def recompute_classifications_command(session_id):
+        """Recompute effective classifications for a session."""
+        from app.services.classification_service import ClassificationService
+        result = ClassificationService().recompute_all(session_id)
+        print(f"{result['session_id']}: {result['updated']} assets updated")
+
+    @app.cli.command('snapshot-assets')
+    @click.option('--session-id', default=None, help='Only snapshot this session.')
+    def snapshot_assets_command(session_id):
+        """Snapshot assets changed since their last snapshot."""
+        from app.services.history_service import HistoryService
+        service = HistoryService()
+        if session_id:
+            results = [service.snapshot_session(session_id)]
+        else:
+            results = service.snapshot_all_sessions()
+        for result in results:
+            print(f"{result['session_id']}: {result['snapshots']} snapshots taken")
+
+    @app.cli.command('archive-changes')
+    @click.option('--session-id', default=None, help='Only archive this session.')
+    @click.option('--older-than-days', type=int, default=None,
+                  help='Override CHANGE_RETENTION_DAYS.')
+    def archive_changes_command(session_id, older_than_days):
+        """Move old change-log rows into the compressed archive."""
+        from app.services.retention_service import RetentionService
+        service = RetentionService()
+        if session_id:
+            results = [service.archive_session(session_id, older_than_days)]
+        else:
+            from app.models.change import AssetChange
+            session_ids = [sid for (sid,) in db.session.query(AssetChange.session_id).distinct()]
+            results = [service.archive_session(sid, older_than_days) for sid in session_ids]
+        for result in results:
+            print(f"{result['session_id']}: {result['archived']} changes archived as "
+                  f"{result['written']} rows in {result['blocks']} blocks")
+
+    @app.cli.command('gc-wizard-sessions')
+    @click.option('--ttl-hours', type=int, default=None,
+                  help='Override WIZARD_SESSION_TTL_HOURS.')
+    @click.option('--no-vacuum', is_flag=True, help='Do not reclaim free SQLite pages.')
+    def gc_wizard_sessions_command(ttl_hours, no_vacuum):
+        """Delete idle wizard sessions and their staged rows."""
+        from app.services.wizard_gc_service import WizardGCService
+        result = WizardGCService().sweep(ttl_hours, vacuum=not no_vacuum)
+        print(f"{result['sessions']} sessions removed: {result['staged_rows']} staged rows, "
+              f"{result['staged_chunks']} chunks, {result['import_jobs']} import jobs, "
+              f"{result['error_files']} error files")
+        vacuum = result['vacuum']
+        if vacuum and vacuum['ran']:
+            print(f"VACUUM ({vacuum['ran']}) reclaimed {vacuum['reclaimed_bytes']} bytes")
+        elif vacuum:
+            print(f"{vacuum['free_bytes_before']} bytes free; below the vacuum threshold")
+
+    @app.cli.command('reconcile-discovery')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--source', required=True, help='Scanner or feed name.')
+    @click.option('--session-id', default='__default__', help='Session to reconcile.')
+    @click.option('--missed-runs', type=int, default=None,
+                  help='Override DISCOVERY_MISSED_RUNS.')
+    def reconcile_discovery_command(path, source, session_id, missed_runs):
+        """Reconcile a discovery export (CSV, JSON array or NDJSON) with the inventory."""
+        import json
+        from app.services.discovery_service import DiscoveryService, number_records
+        from app.services.wizard_parsing import iter_csv_stream, iter_ndjson
+        with open(path, 'rb') as f:
+            if path.endswith(('.csv', '.tsv')):
+                records = number_records(iter_csv_stream(f))
+            elif path.endswith('.json'):
+                data = json.load(f)
+                records = number_records(data['records'] if isinstance(data, dict) else data)
+            else:
+                records = iter_ndjson(f)
+            run = DiscoveryService().reconcile(records, session_id, source, missed_runs, 'cli')
+        print(f"Run {run['id']}: {run['records']} records, {run['created']} created, "
+              f"{run['updated']} updated, {run['unchanged']} unchanged, {run['stored']} stored, "
+              f"{run['restored']} restored, {run['skipped']} skipped")
+        print('  '.join(f'{phase} {seconds:.3f}s' for phase, seconds in run['phases'].items()))
+
+    @app.cli.command('bench-staging')
+    @click.option('--rows', default='10000,100000,1000000',
+                  help='Comma-separated row counts to stage.')
+    @click.option('--batch-size', type=int, default=None,
+                  help='Bulk insert batch size (default WIZARD_STAGE_BATCH_SIZE).')
+    @click.option('--orm-limit', type=int, default=None,
+                  help='Skip the ORM baseline above this many rows.')
+    def bench_staging_command(rows, batch_size, orm_limit):
+        """Benchmark wizard staging: per-row ORM vs bulk Core inserts vs columnar chunks."""
+        from app.bench import benchmark_staging
+        sizes = [int(n) for n in rows.split(',') if n.strip()]
+        batch_size = batch_size or app.config['WIZARD_STAGE_BATCH_SIZE']
+        print(f"{'rows':>10}  {'method':<8}  {'seconds':>9}  {'rows/s':>10}  {'bytes':>12}")
+        for result in benchmark_staging(sizes, batch_size, orm_limit):
+            print(f"{result['rows']:>10}  {result['method']:<8}  "
+                  f"{result['seconds']:>9.3f}  {result['rows_per_second']:>10}  {result['bytes']:>12}")
@@ -5,6 +5,8 @@ from app.api.security import security_bp
 from app.api.licenses import licenses_bp
 from app.api.dashboard import dashboard_bp
 from app.api.wizard import wizard_bp
+from app.api.changes import changes_bp
+from app.api.discovery import discovery_bp
 
 
 def register_blueprints(app):
@@ -15,3 +17,5 @@ def register_blueprints(app):
     app.register_blueprint(licenses_bp)
     app.register_blueprint(dashboard_bp)
     app.register_blueprint(wizard_bp)
+    app.register_blueprint(changes_bp)
+    app.register_blueprint(discovery_bp)
@@ -1,9 +1,13 @@
 from flask import Blueprint, request, jsonify
 from app.services.asset_service import AssetService
+from app.services.history_service import HistoryService
+from app.services.change_service import parse_datetime
+from app.api.changes import change_page_from_request
 from app.errors import BadRequestError
 
 assets_bp = Blueprint('assets', __name__, url_prefix='/api/assets')
 service = AssetService()
+history_service = HistoryService()
 
 
 @assets_bp.route('/', methods=['GET'])
@@ -37,11 +41,23 @@ def list_assets():
         required: false
         enum: [CUI, FCI, public, internal]
         description: Filter by data classification (alias data_classification)
+      - name: effective_classification
+        in: query
+        type: string
+        required: false
+        enum: [CUI, FCI, public, internal]
+        description: Filter by classification inherited over runs/depends_on edges
       - name: search
         in: query
         type: string
         required: false
         description: Search across name, description, vendor (alias q)
+      - name: as_of
+        in: query
+        type: string
+        format: date-time
+        required: false
+        description: Return assets as they were at this time (effective_classification is null)
       - name: page
         in: query
         type: integer
@@ -75,9 +91,28 @@ def list_assets():
     asset_type = request.args.get('asset_type')
     status = request.args.get('status')
     data_classification = request.args.get('classification') or request.args.get('data_classification')
+    effective_classification = request.args.get('effective_classification')
     search = request.args.get('search') or request.args.get('q')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 50, type=int)
+    as_of = parse_datetime(request.args.get('as_of'))
+    start = (page - 1) * per_page
+    end = start + per_page
+
+    if as_of:
+        assets = history_service.list_as_of(
+            session_id, as_of,
+            asset_type=asset_type,
+            status=status,
+            data_classification=data_classification,
+            search=search,
+        )
+        return jsonify({
+            'assets': assets[start:end],
+            'total': len(assets),
+            'page': page,
+            'per_page': per_page,
+        })
 
     assets = service.find_all(
         session_id=session_id,
@@ -85,11 +120,10 @@ def list_assets():
         status=status,
         data_classification=data_classification,
         search=search,
+        effective_classification=effective_classification,
     )
 
     total = len(assets)
-    start = (page - 1) * per_page
-    end = start + per_page
     paged = assets[start:end]
 
     return jsonify({
@@ -117,15 +151,26 @@ def get_asset(asset_id):
         type: string
         required: false
         default: __default__
+      - name: as_of
+        in: query
+        type: string
+        format: date-time
+        required: false
+        description: Reconstruct the asset as it was at this time
     responses:
       200:
         description: Asset details
         schema:
           $ref: '#/definitions/Asset'
+      400:
+        description: Invalid as_of
       404:
-        description: Asset not found
+        description: Asset not found, or did not exist at as_of
     """
     session_id = request.args.get('session_id', '__default__')
+    as_of = parse_datetime(request.args.get('as_of'))
+    if as_of:
+        return jsonify(history_service.get_as_of(asset_id, session_id, as_of))
     asset = service.get_by_id(asset_id, session_id)
     return jsonify(asset.to_dict())
 
@@ -322,3 +367,75 @@ def delete_asset(asset_id):
     session_id = request.args.get('session_id', '__default__')
     service.delete(asset_id, session_id)
     return jsonify({'message': 'Asset deleted'}), 200
+
+
+@assets_bp.route('/<int:asset_id>/changes', methods=['GET'])
+def get_asset_changes(asset_id):
+    """List an asset's change history, newest first, with keyset pagination.
+    ---
+    tags:
+      - Assets
+    parameters:
+      - name: asset_id
+        in: path
+        type: integer
+        required: true
+        description: Asset primary key
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+      - name: change_type
+        in: query
+        type: string
+        required: false
+        enum: [created, updated, status_change, relationship_added]
+      - name: field_changed
+        in: query
+        type: string
+        required: false
+      - name: changed_by
+        in: query
+        type: string
+        required: false
+      - name: since
+        in: query
+        type: string
+        format: date-time
+        required: false
+      - name: until
+        in: query
+        type: string
+        format: date-time
+        required: false
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: next_cursor from the previous page
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 50
+        description: Page size (1-500)
+      - name: include_archived
+        in: query
+        type: boolean
+        required: false
+        default: true
+        description: Also return changes moved to the change archive
+    responses:
+      200:
+        description: Page of changes for the asset
+        schema:
+          $ref: '#/definitions/AssetChangePage'
+      400:
+        description: Invalid cursor, date or limit
+      404:
+        description: Asset not found
+    """
+    session_id = request.args.get('session_id', '__default__')
+    service.exists(asset_id, session_id)
+    return jsonify(change_page_from_request(asset_id))
@@ -0,0 +1,130 @@
+from flask import Blueprint, request, jsonify
+from app.services.change_service import ChangeService, parse_datetime
+from app.services.retention_service import RetentionService
+from app.errors import BadRequestError
+
+changes_bp = Blueprint('changes', __name__, url_prefix='/api/changes')
+service = ChangeService()
+retention_service = RetentionService()
+
+
+@changes_bp.route('/', methods=['GET'])
+def list_changes():
+    """List the session-wide change log, newest first, with keyset pagination.
+    ---
+    tags:
+      - Changes
+    parameters:
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+        description: Filter by session
+      - name: change_type
+        in: query
+        type: string
+        required: false
+        enum: [created, updated, status_change, relationship_added]
+      - name: field_changed
+        in: query
+        type: string
+        required: false
+      - name: changed_by
+        in: query
+        type: string
+        required: false
+      - name: since
+        in: query
+        type: string
+        format: date-time
+        required: false
+        description: Only changes at or after this ISO date/time
+      - name: until
+        in: query
+        type: string
+        format: date-time
+        required: false
+        description: Only changes at or before this ISO date/time
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: next_cursor from the previous page
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 50
+        description: Page size (1-500)
+      - name: include_archived
+        in: query
+        type: boolean
+        required: false
+        default: true
+        description: Also return changes moved to the change archive
+    responses:
+      200:
+        description: Page of changes
+        schema:
+          $ref: '#/definitions/AssetChangePage'
+      400:
+        description: Invalid cursor, date or limit
+    """
+    return jsonify(change_page_from_request(asset_id=None))
+
+
+@changes_bp.route('/archive', methods=['POST'])
+def archive_changes():
+    """Move old changes into the compressed change archive.
+    ---
+    tags:
+      - Changes
+    parameters:
+      - name: body
+        in: body
+        required: false
+        schema:
+          type: object
+          properties:
+            session_id:
+              type: string
+              default: __default__
+            older_than_days:
+              type: integer
+              description: Archive changes older than this (default CHANGE_RETENTION_DAYS)
+    responses:
+      200:
+        description: Archive run summary
+        schema:
+          $ref: '#/definitions/ArchiveResult'
+      400:
+        description: Invalid older_than_days
+    """
+    data = request.get_json(silent=True) or {}
+    older_than_days = data.get('older_than_days')
+    if older_than_days is not None and not isinstance(older_than_days, int):
+        raise BadRequestError('older_than_days must be an integer')
+    result = retention_service.archive_session(
+        data.get('session_id', request.args.get('session_id', '__default__')),
+        older_than_days,
+    )
+    return jsonify(result)
+
+
+def change_page_from_request(asset_id):
+    """Run a change-log page query from the current request's arguments."""
+    limit = request.args.get('limit', 50, type=int)
+    changes, next_cursor = service.find_page(
+        session_id=request.args.get('session_id', '__default__'),
+        asset_id=asset_id,
+        change_type=request.args.get('change_type'),
+        field_changed=request.args.get('field_changed'),
+        changed_by=request.args.get('changed_by'),
+        since=parse_datetime(request.args.get('since')),
+        until=parse_datetime(request.args.get('until')),
+        cursor=request.args.get('cursor'),
+        limit=limit,
+        include_archived=request.args.get('include_archived', 'true').lower() in ('1', 'true', 'yes'),
+    )
+    return {'changes': changes, 'next_cursor': next_cursor, 'limit': limit}
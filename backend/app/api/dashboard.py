@@ -1,14 +1,16 @@
-from datetime import datetime, timedelta, timezone
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from sqlalchemy import func
 from app.extensions import db
 from app.models.asset import Asset, AssetRelationship
 from app.models.license import License
 from app.models.change import AssetChange
+from app.services.license_service import LicenseService, annual_cost_expr
 from app.services.relationship_service import RelationshipService
+from app.errors import BadRequestError
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
 rel_service = RelationshipService()
+license_service = LicenseService()
 
 TYPE_COLORS = {
     'hardware': '#337ab7',
@@ -49,6 +51,11 @@ def get_dashboard():
         required: false
         default: __default__
         description: Filter by session
+      - name: within_days
+        in: query
+        type: integer
+        required: false
+        description: License expiry horizon in days (1-3650, defaults to LICENSE_EXPIRY_HORIZON_DAYS)
     responses:
       200:
         description: Dashboard summary data
@@ -61,7 +68,7 @@ def get_dashboard():
               type: integer
             expiring_licenses:
               type: integer
-              description: Count of licenses expiring within 180 days
+              description: Count of licenses expiring within the horizon
             orphan_assets:
               type: integer
               description: Count of assets with no relationships
@@ -115,6 +122,7 @@ def get_dashboard():
                     type: integer
                   annual_cost:
                     type: number
+                    description: Normalized annual cost (seats and billing period applied)
                   billing_period:
                     type: string
                   expiry_date:
@@ -140,6 +148,11 @@ def get_dashboard():
                 $ref: '#/definitions/AssetChange'
     """
     session_id = request.args.get('session_id', '__default__')
+    within_days = request.args.get(
+        'within_days', current_app.config['LICENSE_EXPIRY_HORIZON_DAYS'], type=int
+    )
+    if within_days < 1 or within_days > 3650:
+        raise BadRequestError('within_days must be between 1 and 3650')
 
     # Total assets
     total_assets = Asset.query.filter_by(session_id=session_id).count()
@@ -176,18 +189,13 @@ def get_dashboard():
         for cls, c in class_counts
     ]
 
-    # Expiring licenses (next 180 days) -> full License shape
-    now = datetime.now(timezone.utc).date()
-    cutoff = now + timedelta(days=180)
-    expiring = License.query.filter(
-        License.session_id == session_id,
-        License.expiry_date.isnot(None),
-        License.expiry_date <= cutoff,
-        License.expiry_date >= now,
+    # Expiring licenses within the horizon -> full License shape
+    expiring = license_service.expiring_query(session_id, within_days).add_columns(
+        annual_cost_expr().label('annual_cost')
     ).order_by(License.expiry_date).all()
 
     expiring_license_list = []
-    for lic in expiring:
+    for lic, annual_cost in expiring:
         expiring_license_list.append({
             'id': lic.id,
             'software_name': lic.software_asset.name if lic.software_asset else 'Unknown',
@@ -195,7 +203,7 @@ def get_dashboard():
             'license_type': lic.license_type or '',
             'total_seats': lic.total_seats or 0,
             'used_seats': lic.used_seats or 0,
-            'annual_cost': float(lic.cost_per_period or 0) * (lic.total_seats or 0),
+            'annual_cost': round(float(annual_cost or 0), 2),
             'billing_period': lic.billing_period or '',
             'expiry_date': lic.expiry_date.isoformat() if lic.expiry_date else '',
             'auto_renew': lic.auto_renew or False,
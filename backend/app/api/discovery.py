@@ -0,0 +1,153 @@
+from flask import Blueprint, request, jsonify
+from app.services.discovery_service import DiscoveryService, number_records
+from app.services.wizard_parsing import iter_ndjson
+from app.errors import BadRequestError
+
+discovery_bp = Blueprint('discovery', __name__, url_prefix='/api/discovery')
+service = DiscoveryService()
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+
+
+@discovery_bp.route('/runs', methods=['POST'])
+def create_run():
+    """Reconcile a full-snapshot discovery feed with the session's assets.
+    ---
+    tags:
+      - Discovery
+    consumes:
+      - application/json
+      - application/x-ndjson
+    parameters:
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+      - name: source
+        in: query
+        type: string
+        required: false
+        description: Scanner or feed name (or source in the JSON body)
+      - name: missed_runs
+        in: query
+        type: integer
+        required: false
+        description: Runs an asset may be missing before it is set to in_storage (default DISCOVERY_MISSED_RUNS)
+      - name: changed_by
+        in: query
+        type: string
+        required: false
+        description: Author recorded in the change log (default discovery:<source>)
+      - name: body
+        in: body
+        required: true
+        description: >
+          Every asset the scanner saw, as {"source": ..., "records": [...]} or
+          as NDJSON with one record per line. Records are matched on serial
+          (or serial_number), mac (or mac_address), then hostname (or host);
+          asset columns such as name, asset_type, sub_type and vendor are
+          applied and other keys are kept in attributes.
+        schema:
+          type: object
+          properties:
+            source:
+              type: string
+            records:
+              type: array
+              items:
+                type: object
+    responses:
+      201:
+        description: Run counts, phase timings and report
+        schema:
+          $ref: '#/definitions/DiscoveryRun'
+      400:
+        description: Missing source or records, or invalid missed_runs
+    """
+    source = request.args.get('source')
+    if request.mimetype in NDJSON_MIMETYPES:
+        records = iter_ndjson(request.stream)
+    else:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data.get('records'), list):
+            raise BadRequestError('Provide records (JSON array) or an application/x-ndjson body')
+        source = source or data.get('source')
+        records = number_records(data['records'])
+
+    run = service.reconcile(
+        records,
+        session_id=request.args.get('session_id', '__default__'),
+        source=source,
+        missed_runs=request.args.get('missed_runs', type=int),
+        changed_by=request.args.get('changed_by'),
+    )
+    return jsonify(run), 201
+
+
+@discovery_bp.route('/runs', methods=['GET'])
+def list_runs():
+    """List recent discovery runs, newest first.
+    ---
+    tags:
+      - Discovery
+    parameters:
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+      - name: source
+        in: query
+        type: string
+        required: false
+        description: Only runs of this source
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 20
+        description: Number of runs (1-100)
+    responses:
+      200:
+        description: Runs without their reports
+        schema:
+          type: array
+          items:
+            $ref: '#/definitions/DiscoveryRun'
+      400:
+        description: Invalid limit
+    """
+    limit = request.args.get('limit', 20, type=int)
+    if limit < 1 or limit > 100:
+        raise BadRequestError('limit must be between 1 and 100')
+    return jsonify(service.list_runs(
+        request.args.get('session_id', '__default__'), request.args.get('source'), limit,
+    ))
+
+
+@discovery_bp.route('/runs/<int:run_id>', methods=['GET'])
+def get_run(run_id):
+    """Get a discovery run with its report.
+    ---
+    tags:
+      - Discovery
+    parameters:
+      - name: run_id
+        in: path
+        type: integer
+        required: true
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+    responses:
+      200:
+        description: The run with its report
+        schema:
+          $ref: '#/definitions/DiscoveryRun'
+      404:
+        description: Run not found
+    """
+    return jsonify(service.get_run(run_id, request.args.get('session_id', '__default__')))
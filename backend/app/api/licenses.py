@@ -1,14 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.extensions import db
 from app.models.license import License
+from app.services.license_service import LicenseService
 from app.errors import NotFoundError, BadRequestError
 
 licenses_bp = Blueprint('licenses', __name__, url_prefix='/api/licenses')
+service = LicenseService()
 
 
 @licenses_bp.route('/', methods=['GET'])
 def list_licenses():
-    """List all licenses ordered by expiry date.
+    """List licenses with optional filters, sorting and pagination.
     ---
     tags:
       - Licenses
@@ -19,19 +21,367 @@ def list_licenses():
         required: false
         default: __default__
         description: Filter by session
+      - name: vendor
+        in: query
+        type: string
+        required: false
+        description: Filter by vendor (case-insensitive exact match)
+      - name: license_type
+        in: query
+        type: string
+        required: false
+        enum: [perpetual, subscription, per_seat, site]
+        description: Filter by license type
+      - name: expiring_before
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Only licenses expiring on or before this date
+      - name: expiring_after
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Only licenses expiring on or after this date
+      - name: over_utilized
+        in: query
+        type: boolean
+        required: false
+        default: false
+        description: Only licenses where used_seats exceeds total_seats
+      - name: search
+        in: query
+        type: string
+        required: false
+        description: Search across vendor, contract number, notes and software name (alias q)
+      - name: sort
+        in: query
+        type: string
+        required: false
+        default: expiry_date
+        enum: [expiry_date, start_date, vendor, software_name, license_type, total_seats, used_seats, cost_per_period, annual_cost, created_at]
+      - name: order
+        in: query
+        type: string
+        required: false
+        default: asc
+        enum: [asc, desc]
+      - name: page
+        in: query
+        type: integer
+        required: false
+        default: 1
+        description: Page number
+      - name: per_page
+        in: query
+        type: integer
+        required: false
+        default: 50
+        description: Items per page (1-500)
+    responses:
+      200:
+        description: Paginated list of licenses
+        schema:
+          type: object
+          properties:
+            licenses:
+              type: array
+              items:
+                $ref: '#/definitions/License'
+            total:
+              type: integer
+            page:
+              type: integer
+            per_page:
+              type: integer
+            summary:
+              type: object
+              description: Totals over all filtered licenses, not just this page
+              properties:
+                annual_cost:
+                  type: number
+                total_seats:
+                  type: integer
+                used_seats:
+                  type: integer
+                expiring_soon:
+                  type: integer
+                  description: Licenses expiring within the next 90 days
+      400:
+        description: Invalid filter, sort or pagination parameter
+    """
+    session_id = request.args.get('session_id', '__default__')
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+
+    licenses, total, summary = service.find_page(
+        session_id=session_id,
+        vendor=request.args.get('vendor'),
+        license_type=request.args.get('license_type'),
+        expiring_before=_parse_date(request.args.get('expiring_before')),
+        expiring_after=_parse_date(request.args.get('expiring_after')),
+        over_utilized=request.args.get('over_utilized', 'false').lower() in ('1', 'true', 'yes'),
+        search=request.args.get('search') or request.args.get('q'),
+        sort=request.args.get('sort', 'expiry_date'),
+        order=request.args.get('order', 'asc'),
+        page=page,
+        per_page=per_page,
+    )
+
+    return jsonify({
+        'licenses': [lic.to_dict() for lic in licenses],
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'summary': summary,
+    })
+
+
+@licenses_bp.route('/renewals', methods=['GET'])
+def get_renewals():
+    """Get a renewal calendar of licenses expiring within a horizon.
+    ---
+    tags:
+      - Licenses
+    parameters:
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+        description: Filter by session
+      - name: within_days
+        in: query
+        type: integer
+        required: false
+        description: Expiry horizon in days (1-3650, defaults to LICENSE_EXPIRY_HORIZON_DAYS)
+      - name: group_by
+        in: query
+        type: string
+        required: false
+        default: month
+        enum: [month, vendor]
+        description: Bucket renewals by expiry month or vendor
+    responses:
+      200:
+        description: Renewal buckets with normalized cost totals
+        schema:
+          type: object
+          properties:
+            group_by:
+              type: string
+            within_days:
+              type: integer
+            from_date:
+              type: string
+              format: date
+            to_date:
+              type: string
+              format: date
+            buckets:
+              type: array
+              items:
+                type: object
+                properties:
+                  key:
+                    type: string
+                  count:
+                    type: integer
+                  total_seats:
+                    type: integer
+                  monthly_cost:
+                    type: number
+                  annual_cost:
+                    type: number
+                  auto_renew_count:
+                    type: integer
+                  licenses:
+                    type: array
+                    items:
+                      type: object
+            total_count:
+              type: integer
+            total_monthly_cost:
+              type: number
+            total_annual_cost:
+              type: number
+      400:
+        description: Invalid within_days or group_by
+    """
+    session_id = request.args.get('session_id', '__default__')
+    within_days = request.args.get(
+        'within_days', current_app.config['LICENSE_EXPIRY_HORIZON_DAYS'], type=int
+    )
+    group_by = request.args.get('group_by', 'month')
+
+    result = service.get_renewal_calendar(session_id, within_days, group_by)
+    return jsonify(result)
+
+
+@licenses_bp.route('/forecast', methods=['GET'])
+def get_forecast():
+    """Get projected license spend over the next N years.
+    ---
+    tags:
+      - Licenses
+    parameters:
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+        description: Filter by session
+      - name: years
+        in: query
+        type: integer
+        required: false
+        default: 3
+        description: Forecast horizon in years (1-10)
+      - name: granularity
+        in: query
+        type: string
+        required: false
+        default: month
+        enum: [month, quarter, year]
+        description: Length of each output period
+      - name: seat_growth
+        in: query
+        type: number
+        required: false
+        default: 0
+        description: What-if annual seat growth for per-seat licenses (e.g. 0.1 for 10%)
+      - name: price_uplift
+        in: query
+        type: number
+        required: false
+        default: 0
+        description: What-if price uplift applied at each renewal (e.g. 0.05 for 5%)
+    responses:
+      200:
+        description: Spend projection with totals and per-vendor series
+        schema:
+          type: object
+          properties:
+            years:
+              type: integer
+            granularity:
+              type: string
+            seat_growth:
+              type: number
+            price_uplift:
+              type: number
+            periods:
+              type: array
+              description: Start month (YYYY-MM) of each period
+              items:
+                type: string
+            totals:
+              type: array
+              items:
+                type: number
+            total:
+              type: number
+            vendors:
+              type: array
+              items:
+                type: object
+                properties:
+                  vendor:
+                    type: string
+                  series:
+                    type: array
+                    items:
+                      type: number
+                  total:
+                    type: number
+            license_count:
+              type: integer
+      400:
+        description: Invalid forecast parameters
+    """
+    session_id = request.args.get('session_id', '__default__')
+    years = request.args.get('years', 3, type=int)
+    granularity = request.args.get('granularity', 'month')
+    seat_growth = request.args.get('seat_growth', 0.0, type=float)
+    price_uplift = request.args.get('price_uplift', 0.0, type=float)
+
+    result = service.get_forecast(
+        session_id, years=years, granularity=granularity,
+        seat_growth=seat_growth, price_uplift=price_uplift,
+    )
+    return jsonify(result)
+
+
+@licenses_bp.route('/seat-reconciliation', methods=['GET'])
+def get_seat_reconciliation():
+    """Report differences between recorded and relationship-derived seat usage.
+    ---
+    tags:
+      - Licenses
+    parameters:
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+        description: Filter by session
+      - name: include_untracked
+        in: query
+        type: boolean
+        required: false
+        default: false
+        description: Also report licenses whose software has no usage relationships
     responses:
       200:
-        description: List of licenses
+        description: Seat reconciliation report
         schema:
-          type: array
-          items:
-            $ref: '#/definitions/License'
+          $ref: '#/definitions/SeatReconciliation'
     """
     session_id = request.args.get('session_id', '__default__')
-    licenses = License.query.filter_by(session_id=session_id).order_by(
-        License.expiry_date
-    ).all()
-    return jsonify([lic.to_dict() for lic in licenses])
+    include_untracked = request.args.get('include_untracked', 'false').lower() in ('1', 'true', 'yes')
+    result = service.reconcile_seats(session_id, include_untracked=include_untracked)
+    return jsonify(result)
+
+
+@licenses_bp.route('/seat-reconciliation', methods=['POST'])
+def apply_seat_reconciliation():
+    """Apply relationship-derived seat usage to license used_seats.
+    ---
+    tags:
+      - Licenses
+    parameters:
+      - name: body
+        in: body
+        required: false
+        schema:
+          type: object
+          properties:
+            session_id:
+              type: string
+              default: __default__
+            include_untracked:
+              type: boolean
+              default: false
+              description: Also reset licenses whose software has no usage relationships to 0
+            changed_by:
+              type: string
+              description: Username for change audit trail
+    responses:
+      200:
+        description: Applied seat reconciliation report
+        schema:
+          $ref: '#/definitions/SeatReconciliation'
+    """
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('session_id', request.args.get('session_id', '__default__'))
+    result = service.reconcile_seats(
+        session_id,
+        apply=True,
+        changed_by=data.get('changed_by', 'api'),
+        include_untracked=bool(data.get('include_untracked', False)),
+    )
+    return jsonify(result)
 
 
 @licenses_bp.route('/<int:license_id>', methods=['GET'])
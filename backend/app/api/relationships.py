@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
 from app.services.relationship_service import RelationshipService
+from app.services.classification_service import ClassificationService
 from app.errors import BadRequestError
 
 relationships_bp = Blueprint('relationships', __name__, url_prefix='/api/relationships')
 service = RelationshipService()
+classification_service = ClassificationService()
 
 
 @relationships_bp.route('/graph', methods=['GET'])
@@ -114,6 +116,100 @@ def get_impact(asset_id):
     return jsonify(result)
 
 
+@relationships_bp.route('/cost-rollup', methods=['GET'])
+def get_cost_rollup():
+    """Get total license cost of the assets supporting each top-level system.
+    ---
+    tags:
+      - Relationships
+    parameters:
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+        description: Filter by session
+      - name: asset_id
+        in: query
+        type: integer
+        required: false
+        description: Roll up a single system (includes per-asset contributors)
+    responses:
+      200:
+        description: Cost roll-up for one system, or all top-level systems
+        schema:
+          type: object
+          properties:
+            systems:
+              type: array
+              items:
+                type: object
+                properties:
+                  asset_id:
+                    type: integer
+                  name:
+                    type: string
+                  asset_type:
+                    type: string
+                  supporting_assets:
+                    type: integer
+                  licensed_assets:
+                    type: integer
+                  license_count:
+                    type: integer
+                  cost_per_period:
+                    type: number
+                  monthly_cost:
+                    type: number
+                  annual_cost:
+                    type: number
+            count:
+              type: integer
+      404:
+        description: Asset not found
+    """
+    session_id = request.args.get('session_id', '__default__')
+    asset_id = request.args.get('asset_id', type=int)
+    result = service.get_cost_rollup(session_id, asset_id)
+    return jsonify(result)
+
+
+@relationships_bp.route('/classifications/recompute', methods=['POST'])
+def recompute_classifications():
+    """Recompute effective classifications for every asset in a session.
+    ---
+    tags:
+      - Relationships
+    parameters:
+      - name: body
+        in: body
+        required: false
+        schema:
+          type: object
+          properties:
+            session_id:
+              type: string
+              default: __default__
+    responses:
+      200:
+        description: Recompute summary
+        schema:
+          type: object
+          properties:
+            session_id:
+              type: string
+            mode:
+              type: string
+            updated:
+              type: integer
+              description: Assets whose effective classification changed
+    """
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('session_id', request.args.get('session_id', '__default__'))
+    result = classification_service.recompute_all(session_id)
+    return jsonify(result)
+
+
 @relationships_bp.route('/', methods=['POST'])
 def create_relationship():
     """Create a new asset relationship.
@@ -1,10 +1,11 @@
 from flask import Blueprint, request, jsonify
 from app.extensions import db
 from app.models.security import SecurityBoundary
-from app.models.asset import Asset
+from app.services.security_service import SecurityService, VIOLATION_KINDS
 from app.errors import NotFoundError, BadRequestError
 
 security_bp = Blueprint('security', __name__, url_prefix='/api/security')
+service = SecurityService()
 
 
 @security_bp.route('/boundaries', methods=['GET'])
@@ -20,19 +21,53 @@ def list_boundaries():
         required: false
         default: __default__
         description: Filter by session
+      - name: include
+        in: query
+        type: string
+        required: false
+        enum: [stats]
+        description: Set to "stats" to add per-boundary asset counts
     responses:
       200:
         description: List of security boundaries
         schema:
           type: array
           items:
-            $ref: '#/definitions/SecurityBoundary'
+            allOf:
+              - $ref: '#/definitions/SecurityBoundary'
+              - type: object
+                properties:
+                  stats:
+                    type: object
+                    description: Present when include=stats
+                    properties:
+                      asset_count:
+                        type: integer
+                      by_classification:
+                        type: object
+                      by_status:
+                        type: object
+                      by_type:
+                        type: object
     """
     session_id = request.args.get('session_id', '__default__')
+    include = {i.strip() for i in request.args.get('include', '').split(',') if i.strip()}
     boundaries = SecurityBoundary.query.filter_by(session_id=session_id).order_by(
         SecurityBoundary.name
     ).all()
-    return jsonify([b.to_dict() for b in boundaries])
+    result = [b.to_dict() for b in boundaries]
+
+    if 'stats' in include:
+        stats = service.get_boundary_stats(session_id)
+        for b in result:
+            b['stats'] = stats.get(b['id'], {
+                'asset_count': 0,
+                'by_classification': {},
+                'by_status': {},
+                'by_type': {},
+            })
+
+    return jsonify(result)
 
 
 @security_bp.route('/boundaries/<int:boundary_id>', methods=['GET'])
@@ -71,7 +106,7 @@ def get_boundary(boundary_id):
 
 @security_bp.route('/boundaries/<int:boundary_id>/assets', methods=['GET'])
 def get_boundary_assets(boundary_id):
-    """Get all assets within a security boundary.
+    """Get a page of assets within a security boundary.
     ---
     tags:
       - Security
@@ -86,6 +121,23 @@ def get_boundary_assets(boundary_id):
         type: string
         required: false
         default: __default__
+      - name: page
+        in: query
+        type: integer
+        required: false
+        default: 1
+        description: Page number
+      - name: per_page
+        in: query
+        type: integer
+        required: false
+        default: 50
+        description: Items per page (1-500)
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Comma-separated asset fields to return (e.g. id,name,status)
     responses:
       200:
         description: Boundary details with its assets
@@ -100,6 +152,15 @@ def get_boundary_assets(boundary_id):
                 $ref: '#/definitions/Asset'
             count:
               type: integer
+              description: Total assets in the boundary
+            total:
+              type: integer
+            page:
+              type: integer
+            per_page:
+              type: integer
+      400:
+        description: Invalid pagination or unknown field
       404:
         description: Security boundary not found
     """
@@ -110,14 +171,139 @@ def get_boundary_assets(boundary_id):
     if not boundary:
         raise NotFoundError(f'Security boundary {boundary_id} not found')
 
-    assets = Asset.query.filter_by(
-        security_boundary_id=boundary_id, session_id=session_id
-    ).order_by(Asset.name).all()
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+
+    assets, total = service.get_boundary_assets(
+        boundary_id, session_id, page=page, per_page=per_page, fields=fields or None,
+    )
 
     return jsonify({
         'boundary': boundary.to_dict(),
-        'assets': [a.to_dict() for a in assets],
-        'count': len(assets),
+        'assets': assets,
+        'count': total,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+    })
+
+
+@security_bp.route('/violations', methods=['GET'])
+def list_violations():
+    """Scan for CUI boundary-crossing and classification-downgrade relationships.
+    ---
+    tags:
+      - Security
+    parameters:
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+      - name: kind
+        in: query
+        type: string
+        required: false
+        enum: [boundary_crossing, classification_downgrade, transitive_crossing]
+        description: Only return violations of this kind
+      - name: transitive
+        in: query
+        type: boolean
+        required: false
+        default: false
+        description: Also follow CUI assets over multiple hops
+      - name: max_depth
+        in: query
+        type: integer
+        required: false
+        default: 5
+        description: Maximum hops for transitive scanning (2-10)
+      - name: page
+        in: query
+        type: integer
+        required: false
+        default: 1
+      - name: per_page
+        in: query
+        type: integer
+        required: false
+        default: 50
+        description: Items per page (1-500)
+    responses:
+      200:
+        description: Paginated violation report
+        schema:
+          type: object
+          properties:
+            violations:
+              type: array
+              items:
+                type: object
+                properties:
+                  kinds:
+                    type: array
+                    items:
+                      type: string
+                  relationship_id:
+                    type: integer
+                  relationship_type:
+                    type: string
+                  depth:
+                    type: integer
+                  source:
+                    type: object
+                  target:
+                    type: object
+            summary:
+              type: object
+              description: Violation count per kind
+            total:
+              type: integer
+            page:
+              type: integer
+            per_page:
+              type: integer
+            version:
+              type: string
+              description: Session version the scan was computed for
+            cached:
+              type: boolean
+            scanned_at:
+              type: string
+              format: date-time
+      400:
+        description: Invalid kind, depth or pagination parameter
+    """
+    session_id = request.args.get('session_id', '__default__')
+    kind = request.args.get('kind')
+    transitive = request.args.get('transitive', 'false').lower() in ('1', 'true', 'yes')
+    max_depth = request.args.get('max_depth', 5, type=int)
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+
+    if kind and kind not in VIOLATION_KINDS:
+        raise BadRequestError(f'kind must be one of: {", ".join(VIOLATION_KINDS)}')
+    if page < 1:
+        raise BadRequestError('page must be 1 or greater')
+    if per_page < 1 or per_page > 500:
+        raise BadRequestError('per_page must be between 1 and 500')
+
+    scan = service.scan_violations(session_id, transitive=transitive, max_depth=max_depth)
+    violations = scan['violations']
+    if kind:
+        violations = [v for v in violations if kind in v['kinds']]
+    start = (page - 1) * per_page
+
+    return jsonify({
+        'violations': violations[start:start + per_page],
+        'summary': scan['summary'],
+        'total': len(violations),
+        'page': page,
+        'per_page': per_page,
+        'version': scan['version'],
+        'cached': scan['cached'],
+        'scanned_at': scan['scanned_at'],
     })
 
 
@@ -1,9 +1,23 @@
-from flask import Blueprint, request, jsonify
+import json
+import os
+
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 from app.services.wizard_service import WizardService, ENTITY_TYPES
+from app.services.wizard_parsing import iter_csv_text, iter_ndjson
+from app.services.wizard_commit_service import DIFF_ACTIONS, ENTITY_MODELS, WizardCommitService
+from app.services.wizard_gc_service import WizardGCService
+from app.import_jobs import get_import_runner
+from app.models.wizard_import import ImportJob, WizardSession
 
 wizard_bp = Blueprint('wizard', __name__, url_prefix='/api/wizard')
 service = WizardService()
 
+PREVIEW_LIMIT = 50
+MAX_PREVIEW_LIMIT = 500
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+MAX_INGEST_CHUNK_SIZE = 5000
+
 
 @wizard_bp.route('/session', methods=['POST'])
 def create_session():
@@ -113,6 +127,11 @@ def import_entity(entity_type):
         type: file
         required: false
         description: CSV or XLSX file upload
+      - name: sheet
+        in: formData
+        type: string
+        required: false
+        description: Excel sheet name or 1-based position (default the active sheet)
       - name: body
         in: body
         required: false
@@ -135,14 +154,20 @@ def import_entity(entity_type):
           properties:
             imported:
               type: integer
+            total:
+              type: integer
             errors:
               type: array
+              description: First 20 errors, e.g. "Line 7: total_seats: \"ten\" is not a whole number"
               items:
                 type: string
+            error_count:
+              type: integer
+              description: All errors; download them from /api/wizard/errors/{entity_type}
       207:
         description: Partial import (some rows had errors)
       400:
-        description: Missing session_id or no data provided
+        description: Missing session_id, no data provided or unknown Excel sheet
       404:
         description: Unknown entity type
     """
@@ -156,15 +181,15 @@ def import_entity(entity_type):
     # Check if this is a file upload or JSON body
     if request.files and 'file' in request.files:
         file = request.files['file']
-        rows = service.parse_file(file)
+        rows = service.iter_file(file, request.form.get('sheet'))
     elif request.content_type and 'multipart' in request.content_type:
         # Pasted text sent as form data
         text = request.form.get('text', '')
-        rows = service.parse_csv_text(text)
+        rows = iter_csv_text(text)
     else:
         data = request.get_json(silent=True) or {}
         if 'text' in data:
-            rows = service.parse_csv_text(data['text'])
+            rows = iter_csv_text(data['text'])
         elif 'rows' in data:
             rows = data['rows']
         else:
@@ -175,9 +200,162 @@ def import_entity(entity_type):
     return jsonify(result), status
 
 
+@wizard_bp.route('/jobs', methods=['POST'])
+def create_import_job():
+    """Start a background import of an uploaded CSV/TSV/XLSX file.
+    ---
+    tags:
+      - Wizard
+    consumes:
+      - multipart/form-data
+    parameters:
+      - name: X-Session-Id
+        in: header
+        type: string
+        required: false
+        description: Wizard session ID (alternative to session_id query param)
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        description: Wizard session ID (alternative to X-Session-Id header)
+      - name: entity_type
+        in: formData
+        type: string
+        required: true
+        description: Entity type (e.g. assets, people, locations, licenses, relationships)
+      - name: file
+        in: formData
+        type: file
+        required: true
+        description: CSV, TSV or XLSX file upload
+      - name: sheet
+        in: formData
+        type: string
+        required: false
+        description: Excel sheet name or 1-based position (default the active sheet)
+    responses:
+      202:
+        description: Job queued
+        schema:
+          $ref: '#/definitions/ImportJob'
+      400:
+        description: Missing session_id or file
+      404:
+        description: Unknown entity type or wizard session
+    """
+    session_id = request.headers.get('X-Session-Id') or request.args.get('session_id')
+    if not session_id:
+        return jsonify({'error': 'session_id is required (header X-Session-Id or query param)'}), 400
+    entity_type = request.form.get('entity_type', '')
+    if entity_type not in ENTITY_TYPES:
+        return jsonify({'error': f'Unknown entity type: {entity_type}'}), 404
+    if not WizardSession.query.filter_by(session_id=session_id).first():
+        return jsonify({'error': 'Session not found'}), 404
+    if not request.files or 'file' not in request.files:
+        return jsonify({'error': 'Provide a file upload'}), 400
+
+    job = get_import_runner().submit(session_id, entity_type, request.files['file'],
+                                     sheet=request.form.get('sheet') or None)
+    return jsonify(job.to_dict()), 202
+
+
+@wizard_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_import_job(job_id):
+    """Get progress of a background import job.
+    ---
+    tags:
+      - Wizard
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Job status with row counts, throughput and ETA
+        schema:
+          $ref: '#/definitions/ImportJob'
+      404:
+        description: Job not found
+    """
+    job = ImportJob.query.filter_by(job_id=job_id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+
+@wizard_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_import_job(job_id):
+    """Cancel a background import job.
+    ---
+    tags:
+      - Wizard
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+    responses:
+      202:
+        description: Cancellation requested; a running job stops after its current batch
+        schema:
+          $ref: '#/definitions/ImportJob'
+      404:
+        description: Job not found
+    """
+    job = ImportJob.query.filter_by(job_id=job_id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    job = get_import_runner().cancel(job)
+    return jsonify(job.to_dict()), 202
+
+
+@wizard_bp.route('/errors/<entity_type>', methods=['GET'])
+def download_errors(entity_type):
+    """Download every error from the last import of an entity type as CSV.
+    ---
+    tags:
+      - Wizard
+    produces:
+      - text/csv
+    parameters:
+      - name: entity_type
+        in: path
+        type: string
+        required: true
+      - name: X-Session-Id
+        in: header
+        type: string
+        required: false
+        description: Wizard session ID (alternative to session_id query param)
+      - name: session_id
+        in: query
+        type: string
+        required: false
+        description: Wizard session ID (alternative to X-Session-Id header)
+    responses:
+      200:
+        description: CSV with line, column, value and error columns
+      400:
+        description: session_id is required
+      404:
+        description: The last import had no errors
+    """
+    session_id = request.headers.get('X-Session-Id') or request.args.get('session_id')
+    if not session_id:
+        return jsonify({'error': 'session_id is required'}), 400
+
+    path = service.error_file_path(session_id, entity_type)
+    if not os.path.exists(path):
+        return jsonify({'error': 'No errors recorded for this import'}), 404
+    return send_file(path, mimetype='text/csv', as_attachment=True,
+                     download_name=f'{entity_type}-errors.csv')
+
+
 @wizard_bp.route('/preview/<entity_type>', methods=['GET'])
 def get_preview(entity_type):
-    """Preview imported data for an entity type.
+    """Page through imported data for an entity type.
     ---
     tags:
       - Wizard
@@ -197,9 +375,34 @@ def get_preview(entity_type):
         type: string
         required: false
         description: Wizard session ID (alternative to X-Session-Id header)
+      - name: after
+        in: query
+        type: integer
+        required: false
+        description: Cursor; return rows with a row_index greater than this (next_cursor of the previous page)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Rows per page (default 50, max 500)
+      - name: columns
+        in: query
+        type: string
+        required: false
+        description: Comma-separated columns to return (default all)
+      - name: filter
+        in: query
+        type: string
+        required: false
+        description: column:text; keep rows whose column contains text (case-insensitive). Repeatable.
+      - name: errors_only
+        in: query
+        type: boolean
+        required: false
+        description: Only return rows that failed validation
     responses:
       200:
-        description: Preview of imported rows
+        description: A page of staged rows
         schema:
           type: object
           properties:
@@ -209,17 +412,50 @@ def get_preview(entity_type):
               type: array
               items:
                 type: object
+                properties:
+                  row_index:
+                    type: integer
+                  data:
+                    type: object
+                  errors:
+                    type: array
+                    description: Validation errors, null for valid rows
+                    items:
+                      type: object
             count:
               type: integer
+            next_cursor:
+              type: integer
+              description: Pass as after to get the next page; null on the last page
       400:
-        description: session_id is required
+        description: session_id is required, or a filter is not column:text
     """
     session_id = request.headers.get('X-Session-Id') or request.args.get('session_id')
     if not session_id:
         return jsonify({'error': 'session_id is required'}), 400
 
-    rows = service.get_preview(session_id, entity_type)
-    return jsonify({'entity_type': entity_type, 'rows': rows, 'count': len(rows)})
+    after = request.args.get('after', type=int)
+    limit = min(max(request.args.get('limit', PREVIEW_LIMIT, type=int), 1), MAX_PREVIEW_LIMIT)
+
+    filters = {}
+    for item in request.args.getlist('filter'):
+        column, sep, text = item.partition(':')
+        if not sep or not column.strip():
+            return jsonify({'error': 'filter must be column:text'}), 400
+        filters[column.strip()] = text
+    columns = [c.strip() for c in request.args.get('columns', '').split(',') if c.strip()]
+    errors_only = request.args.get('errors_only', '').lower() in ('1', 'true', 'yes')
+
+    page = service.get_preview(
+        session_id, entity_type, limit=limit, after=after,
+        columns=columns or None, filters=filters, errors_only=errors_only,
+    )
+    return jsonify({
+        'entity_type': entity_type,
+        'rows': page['rows'],
+        'count': len(page['rows']),
+        'next_cursor': page['next_cursor'],
+    })
 
 
 @wizard_bp.route('/status', methods=['GET'])
@@ -291,3 +527,275 @@ def clear_session(session_id):
     """
     service.clear_session(session_id)
     return jsonify({'message': 'Session cleared'}), 200
+
+
+@wizard_bp.route('/<session_id>/commit', methods=['POST'])
+def commit_session(session_id):
+    """Promote a wizard session's staged rows into the live tables.
+    ---
+    tags:
+      - Wizard
+    parameters:
+      - name: session_id
+        in: path
+        type: string
+        required: true
+        description: Wizard session ID to commit
+      - name: body
+        in: body
+        required: false
+        schema:
+          type: object
+          properties:
+            target_session_id:
+              type: string
+              description: Inventory session to insert into (default __default__)
+            changed_by:
+              type: string
+              description: Author recorded in the change log (default wizard)
+            mode:
+              type: string
+              enum: [insert, upsert]
+              description: insert adds every row; upsert updates rows matching a natural key
+            natural_keys:
+              type: object
+              description: Per entity type key columns overriding the defaults, e.g. {"assets": ["name"]}
+            delete_missing:
+              type: boolean
+              description: In upsert mode, delete existing rows of each imported entity type not in the upload
+    responses:
+      200:
+        description: Rows inserted, updated, deleted and skipped per entity type
+        schema:
+          $ref: '#/definitions/WizardCommitResult'
+      400:
+        description: Invalid mode or natural key
+      404:
+        description: Session not found
+    """
+    if not WizardSession.query.filter_by(session_id=session_id).first():
+        return jsonify({'error': 'Session not found'}), 404
+    data = request.get_json(silent=True) or {}
+    result = WizardCommitService().commit(
+        session_id,
+        target_session_id=data.get('target_session_id') or '__default__',
+        changed_by=data.get('changed_by') or 'wizard',
+        mode=data.get('mode') or 'insert',
+        natural_keys=data.get('natural_keys'),
+        delete_missing=bool(data.get('delete_missing')),
+    )
+    return jsonify(result)
+
+
+@wizard_bp.route('/<session_id>/diff', methods=['GET'])
+def diff_session(session_id):
+    """Dry run: diff a wizard session's staged rows against the live inventory.
+    ---
+    tags:
+      - Wizard
+    parameters:
+      - name: session_id
+        in: path
+        type: string
+        required: true
+        description: Wizard session ID to diff
+      - name: target_session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+        description: Inventory session the upload would be committed into
+      - name: natural_key
+        in: query
+        type: string
+        required: false
+        description: entity_type:column[,column]; overrides that type's key columns. Repeatable.
+      - name: entity_type
+        in: query
+        type: string
+        required: false
+        description: Only return entries of this entity type
+      - name: action
+        in: query
+        type: string
+        required: false
+        enum: [new, changed, missing, duplicate, skipped]
+        description: Only return entries with this action
+      - name: page
+        in: query
+        type: integer
+        required: false
+        default: 1
+      - name: per_page
+        in: query
+        type: integer
+        required: false
+        default: 50
+        description: Entries per page (1-500)
+    responses:
+      200:
+        description: Summary and a page of entries of what an upsert commit would change
+        schema:
+          $ref: '#/definitions/WizardDiff'
+      400:
+        description: Invalid filter, natural key or pagination parameter
+      404:
+        description: Session not found
+    """
+    if not WizardSession.query.filter_by(session_id=session_id).first():
+        return jsonify({'error': 'Session not found'}), 404
+
+    entity_type = request.args.get('entity_type')
+    action = request.args.get('action')
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+    if entity_type and entity_type not in ENTITY_MODELS:
+        return jsonify({'error': f'Unknown entity type: {entity_type}'}), 400
+    if action and action not in DIFF_ACTIONS:
+        return jsonify({'error': f'action must be one of: {", ".join(DIFF_ACTIONS)}'}), 400
+    if page < 1:
+        return jsonify({'error': 'page must be 1 or greater'}), 400
+    if per_page < 1 or per_page > MAX_PREVIEW_LIMIT:
+        return jsonify({'error': f'per_page must be between 1 and {MAX_PREVIEW_LIMIT}'}), 400
+
+    natural_keys = {}
+    for item in request.args.getlist('natural_key'):
+        key_type, sep, names = item.partition(':')
+        if not sep or not key_type.strip():
+            return jsonify({'error': 'natural_key must be entity_type:column[,column]'}), 400
+        natural_keys[key_type.strip()] = [n.strip() for n in names.split(',') if n.strip()]
+
+    commit_service = WizardCommitService()
+    diff = commit_service.dry_run(
+        session_id,
+        target_session_id=request.args.get('target_session_id') or '__default__',
+        natural_keys=natural_keys,
+    )
+    entries, total = commit_service.diff_page(
+        diff, entity_type=entity_type, action=action, page=page, per_page=per_page,
+    )
+    return jsonify({
+        **{k: v for k, v in diff.items() if k != 'entries'},
+        'entries': entries,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+    })
+
+
+@wizard_bp.route('/gc', methods=['POST'])
+def collect_sessions():
+    """Delete wizard sessions idle beyond the TTL and reclaim their space.
+    ---
+    tags:
+      - Wizard
+    parameters:
+      - name: body
+        in: body
+        required: false
+        schema:
+          type: object
+          properties:
+            ttl_hours:
+              type: integer
+              description: Delete sessions idle longer than this (default WIZARD_SESSION_TTL_HOURS)
+            vacuum:
+              type: boolean
+              default: true
+              description: On SQLite, VACUUM once free space passes WIZARD_VACUUM_THRESHOLD_MB
+    responses:
+      200:
+        description: What the sweep removed and reclaimed
+        schema:
+          $ref: '#/definitions/WizardGCResult'
+      400:
+        description: Invalid ttl_hours
+    """
+    data = request.get_json(silent=True) or {}
+    ttl_hours = data.get('ttl_hours')
+    if ttl_hours is not None and (not isinstance(ttl_hours, int) or isinstance(ttl_hours, bool)):
+        return jsonify({'error': 'ttl_hours must be an integer'}), 400
+    result = WizardGCService().sweep(ttl_hours, vacuum=data.get('vacuum', True) is not False)
+    return jsonify(result)
+
+
+@wizard_bp.route('/ingest/<entity_type>', methods=['POST'])
+def ingest_entity(entity_type):
+    """Stream NDJSON records straight into the live tables, upserting by natural key.
+    ---
+    tags:
+      - Wizard
+    consumes:
+      - application/x-ndjson
+    produces:
+      - application/x-ndjson
+    parameters:
+      - name: entity_type
+        in: path
+        type: string
+        required: true
+        description: Entity type (people, locations, security_boundaries, assets, licenses, relationships)
+      - name: body
+        in: body
+        required: true
+        description: One JSON object per line, with the same columns as a wizard import
+        schema:
+          type: string
+      - name: target_session_id
+        in: query
+        type: string
+        required: false
+        default: __default__
+        description: Inventory session to upsert into
+      - name: changed_by
+        in: query
+        type: string
+        required: false
+        default: ingest
+        description: Author recorded in the change log
+      - name: natural_key
+        in: query
+        type: string
+        required: false
+        description: Comma-separated key columns overriding the entity type's default
+      - name: chunk_size
+        in: query
+        type: integer
+        required: false
+        description: Records validated and committed together (default WIZARD_INGEST_CHUNK_SIZE, max 5000)
+    responses:
+      200:
+        description: >
+          NDJSON log streamed as the feed is read: one line per chunk (chunk,
+          first_line, last_line, received, invalid, inserted, updated,
+          unchanged, skipped, errors), then a line with done and the totals.
+          A chunk line with error means that chunk was rolled back and the
+          feed stopped.
+      400:
+        description: Unknown natural key column
+      404:
+        description: Unknown entity type
+      415:
+        description: Body is not application/x-ndjson
+    """
+    if entity_type not in ENTITY_TYPES:
+        return jsonify({'error': f'Unknown entity type: {entity_type}'}), 404
+    if request.mimetype not in NDJSON_MIMETYPES:
+        return jsonify({'error': 'Content-Type must be application/x-ndjson'}), 415
+
+    chunk_size = request.args.get('chunk_size', type=int)
+    if chunk_size is not None:
+        chunk_size = min(max(chunk_size, 1), MAX_INGEST_CHUNK_SIZE)
+    natural_key = [c.strip() for c in request.args.get('natural_key', '').split(',') if c.strip()]
+
+    results = WizardCommitService().ingest(
+        entity_type, iter_ndjson(request.stream),
+        target_session_id=request.args.get('target_session_id') or '__default__',
+        changed_by=request.args.get('changed_by') or 'ingest',
+        natural_key=natural_key or None,
+        chunk_size=chunk_size,
+    )
+    return Response(
+        stream_with_context(json.dumps(result) + '\n' for result in results),
+        mimetype='application/x-ndjson',
+    )
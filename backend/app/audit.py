@@ -0,0 +1,249 @@
+"""Writer for AssetChange audit records.
+
+In ``sync`` mode (the default) change rows are inserted in the caller's
+transaction, exactly as before. In ``async`` mode they are held on the
+caller's session until its transaction commits (and dropped if it rolls
+back), then queued in-process, and a background thread inserts them in batches with one commit per batch
+(group commit). A batch is written once it reaches ``AUDIT_BATCH_SIZE`` rows
+or ``AUDIT_FLUSH_INTERVAL`` seconds after its first row was queued, whichever
+comes first.
+
+Rows that cannot be written, and rows still queued at shutdown, are appended
+to a JSON-lines spill file under ``AUDIT_SPILL_DIR``. Spill files are
+replayed into the database the next time the app starts.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.change import AssetChange
+
+logger = logging.getLogger(__name__)
+
+AUDIT_MODES = ('sync', 'async')
+
+# Seconds to keep writing queued rows at shutdown before spilling the rest
+_SHUTDOWN_GRACE = 5.0
+
+# Session.info key of async rows waiting for their transaction to commit
+_PENDING_KEY = 'audit_pending'
+
+
+class AuditWriter:
+    """Records AssetChange rows synchronously or through a batching thread."""
+
+    def __init__(self, app, mode='sync', batch_size=500, flush_interval=0.5,
+                 spill_dir=None):
+        if mode not in AUDIT_MODES:
+            raise ValueError(f'AUDIT_MODE must be one of: {", ".join(AUDIT_MODES)}')
+        self.app = app
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_dir = spill_dir
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+
+    def record(self, rows):
+        """Record change rows (dicts of AssetChange column values).
+
+        ``changed_at`` defaults to now at the time of the call, so queued rows
+        keep their real timestamp regardless of when they are written.
+        """
+        now = datetime.now(timezone.utc)
+        rows = [dict(row, changed_at=row.get('changed_at') or now) for row in rows]
+        if not rows:
+            return
+        if self.mode == 'sync' or self._thread is None:
+            db.session.execute(insert(AssetChange), rows)
+            return
+        # Queued by _enqueue_pending once the caller's transaction commits
+        db.session().info.setdefault(_PENDING_KEY, []).append((self, rows))
+
+    def enqueue(self, rows):
+        """Queue rows for the writer thread."""
+        for row in rows:
+            self._queue.put(row)
+
+    def flush(self, timeout=10.0):
+        """Block until queued rows are written. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def start(self):
+        """Replay spilled rows and, in async mode, start the writer thread."""
+        self.replay_spill()
+        if self.mode == 'async' and self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='audit-writer', daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the writer thread and spill anything it could not write."""
+        if self._thread is None:
+            return
+        self.flush(timeout=_SHUTDOWN_GRACE)
+        self._stop_event.set()
+        self._thread.join(timeout=_SHUTDOWN_GRACE)
+        self._thread = None
+
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+                self._queue.task_done()
+            except queue.Empty:
+                break
+        if remaining:
+            self._spill(remaining)
+
+    def replay_spill(self):
+        """Insert rows from spill files left by earlier processes."""
+        if not self.spill_dir:
+            return 0
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, '*.jsonl'))):
+            claimed = f'{path}.replaying-{os.getpid()}'
+            try:
+                os.replace(path, claimed)  # only one worker claims each file
+            except OSError:
+                continue
+            with open(claimed, encoding='utf-8') as f:
+                rows = [_decode_row(line) for line in f if line.strip()]
+            with self.app.app_context():
+                try:
+                    for i in range(0, len(rows), self.batch_size):
+                        db.session.execute(insert(AssetChange), rows[i:i + self.batch_size])
+                    db.session.commit()
+                except Exception:
+                    logger.exception('Failed to replay audit spill file %s', claimed)
+                    db.session.rollback()
+                    os.replace(claimed, path)
+                    continue
+                finally:
+                    db.session.remove()
+            os.remove(claimed)
+            replayed += len(rows)
+        if replayed:
+            logger.info('Replayed %d spilled audit rows', replayed)
+        return replayed
+
+    def _run(self):
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _take_batch(self):
+        """Collect up to batch_size rows, waiting at most flush_interval after the first."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(AssetChange), batch)
+                db.session.commit()
+            except Exception:
+                logger.exception('Audit batch of %d rows failed; spilling to disk', len(batch))
+                db.session.rollback()
+                self._spill(batch)
+            finally:
+                db.session.remove()
+
+    def _spill(self, rows):
+        if not rows:
+            return
+        if not self.spill_dir:
+            logger.error('Dropping %d audit rows: AUDIT_SPILL_DIR is not set', len(rows))
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f'audit-{os.getpid()}.jsonl')
+        with self._spill_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(''.join(_encode_row(row) + '\n' for row in rows))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_pending(session):
+    for writer, rows in session.info.pop(_PENDING_KEY, ()):
+        writer.enqueue(rows)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _encode_row(row):
+    return json.dumps({
+        k: v.isoformat() if isinstance(v, datetime) else v
+        for k, v in row.items()
+    })
+
+
+def _decode_row(line):
+    row = json.loads(line)
+    if row.get('changed_at'):
+        row['changed_at'] = datetime.fromisoformat(row['changed_at'])
+    return row
+
+
+def init_audit(app):
+    """Create the app's AuditWriter from config and start it."""
+    spill_dir = app.config.get('AUDIT_SPILL_DIR') or os.path.join(
+        app.instance_path, 'audit_spill'
+    )
+    writer = AuditWriter(
+        app,
+        mode=app.config.get('AUDIT_MODE', 'sync'),
+        batch_size=app.config.get('AUDIT_BATCH_SIZE', 500),
+        flush_interval=app.config.get('AUDIT_FLUSH_INTERVAL', 0.5),
+        spill_dir=spill_dir,
+    )
+    app.extensions['audit_writer'] = writer
+    with app.app_context():
+        writer.start()
+    return writer
+
+
+def get_audit_writer():
+    """Return the current app's AuditWriter."""
+    return current_app.extensions['audit_writer']
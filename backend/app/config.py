@@ -11,6 +11,33 @@ class BaseConfig:
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour
     JWT_REFRESH_TOKEN_EXPIRES = 86400 * 30  # 30 days
     JWT_TOKEN_LOCATION = ['headers']
+    LICENSE_EXPIRY_HORIZON_DAYS = int(os.getenv('LICENSE_EXPIRY_HORIZON_DAYS', 180))
+    AUDIT_MODE = os.getenv('AUDIT_MODE', 'sync')  # sync, async
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 0.5))  # seconds
+    AUDIT_SPILL_DIR = os.getenv('AUDIT_SPILL_DIR')  # defaults to <instance>/audit_spill
+    LICENSE_SEAT_RECONCILE_INTERVAL = int(os.getenv('LICENSE_SEAT_RECONCILE_INTERVAL', 0))  # seconds, 0 = off
+    ASSET_SNAPSHOT_EVERY = int(os.getenv('ASSET_SNAPSHOT_EVERY', 50))  # changes between snapshots
+    ASSET_SNAPSHOT_INTERVAL = int(os.getenv('ASSET_SNAPSHOT_INTERVAL', 0))  # seconds, 0 = off
+    CHANGE_RETENTION_DAYS = int(os.getenv('CHANGE_RETENTION_DAYS', 365))  # archive changes older than this
+    CHANGE_ARCHIVE_BATCH_SIZE = int(os.getenv('CHANGE_ARCHIVE_BATCH_SIZE', 1000))  # rows per transaction
+    CHANGE_COMPACT_WINDOW = int(os.getenv('CHANGE_COMPACT_WINDOW', 3600))  # seconds, 0 = no compaction
+    CHANGE_ARCHIVE_INTERVAL = int(os.getenv('CHANGE_ARCHIVE_INTERVAL', 0))  # seconds, 0 = off
+    DISCOVERY_MISSED_RUNS = int(os.getenv('DISCOVERY_MISSED_RUNS', 3))  # runs missed before in_storage
+    WIZARD_STREAM_CHUNK_SIZE = int(os.getenv('WIZARD_STREAM_CHUNK_SIZE', 64 * 1024))  # bytes read per upload chunk
+    # Staged rows per bulk insert; WIZARD_STAGE_CHUNK_SIZE is the earlier name
+    WIZARD_STAGE_BATCH_SIZE = int(os.getenv('WIZARD_STAGE_BATCH_SIZE', os.getenv('WIZARD_STAGE_CHUNK_SIZE', 1000)))
+    WIZARD_STAGING_FORMAT = os.getenv('WIZARD_STAGING_FORMAT', 'rows')  # rows or columnar
+    WIZARD_VALIDATE_CHUNK_SIZE = int(os.getenv('WIZARD_VALIDATE_CHUNK_SIZE', 5000))  # rows per validation task
+    WIZARD_VALIDATE_WORKERS = int(os.getenv('WIZARD_VALIDATE_WORKERS', 2))  # validation processes, 0 = in-process
+    WIZARD_IMPORT_WORKERS = int(os.getenv('WIZARD_IMPORT_WORKERS', 2))  # background import threads
+    WIZARD_SPOOL_DIR = os.getenv('WIZARD_SPOOL_DIR')  # defaults to <instance>/import_spool
+    WIZARD_ERROR_DIR = os.getenv('WIZARD_ERROR_DIR')  # defaults to <instance>/import_errors
+    WIZARD_INGEST_CHUNK_SIZE = int(os.getenv('WIZARD_INGEST_CHUNK_SIZE', 500))  # NDJSON records per transaction
+    WIZARD_SESSION_TTL_HOURS = int(os.getenv('WIZARD_SESSION_TTL_HOURS', 72))  # delete sessions idle longer
+    WIZARD_GC_BATCH_SIZE = int(os.getenv('WIZARD_GC_BATCH_SIZE', 100))  # sessions deleted per transaction
+    WIZARD_GC_INTERVAL = int(os.getenv('WIZARD_GC_INTERVAL', 0))  # seconds, 0 = off
+    WIZARD_VACUUM_THRESHOLD_MB = int(os.getenv('WIZARD_VACUUM_THRESHOLD_MB', 64))  # free SQLite space before VACUUM
 
 
 class DevelopmentConfig(BaseConfig):
@@ -0,0 +1,231 @@
+"""Background wizard import jobs.
+
+An upload is spooled to ``WIZARD_SPOOL_DIR`` and an ImportJob row records
+it. A thread pool of ``WIZARD_IMPORT_WORKERS`` workers parses, validates and
+stages the file in batches, committing after each batch together with the
+job's progress counters. Cancellation is requested through the job row and
+checked between batches, so it works from any worker process. Jobs left
+unfinished by a worker process that exited (e.g. a restarted gunicorn
+worker) are marked failed when the next process on that host starts.
+"""
+import logging
+import os
+import socket
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from app.extensions import db
+from app.models.wizard_import import ImportJob
+from app.services.wizard_staging import STAGING_FORMATS, delete_staged, pending_key
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+class ImportCancelled(Exception):
+    """Raised inside a running job when cancellation was requested."""
+
+
+class ImportJobRunner:
+    """Runs ImportJobs on a thread pool."""
+
+    def __init__(self, app, workers=2, spool_dir=None):
+        self.app = app
+        self.spool_dir = spool_dir
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='import-job')
+
+    def submit(self, session_id, entity_type, file_storage, sheet=None):
+        """Spool an upload to disk, create its job and queue it. Returns the job."""
+        job_id = str(uuid.uuid4())
+        filename = secure_filename(file_storage.filename or '') or 'upload.csv'
+        os.makedirs(self.spool_dir, exist_ok=True)
+        spool_path = os.path.join(self.spool_dir, f'{job_id}-{filename}')
+        file_storage.save(spool_path)
+
+        job = ImportJob(
+            job_id=job_id,
+            session_id=session_id,
+            entity_type=entity_type,
+            filename=filename,
+            sheet=sheet,
+            spool_path=spool_path,
+            status='queued',
+            worker=self.worker,
+            bytes_total=os.path.getsize(spool_path),
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._executor.submit(self._run, job_id)
+        return job
+
+    def cancel(self, job):
+        """Request cancellation; queued jobs are cancelled immediately."""
+        if job.status in FINISHED_STATUSES:
+            return job
+        job.cancel_requested = True
+        db.session.commit()
+        # A job still queued never starts; running ones stop at their next batch
+        if self._claim(job.job_id, 'cancelled'):
+            job = ImportJob.query.filter_by(job_id=job.job_id).first()
+            self._finish(job, 'cancelled')
+        return job
+
+    def recover_orphans(self):
+        """Fail unfinished jobs whose worker process on this host has exited.
+
+        Their staged rows and spool files are removed as for any failed job.
+        Returns the number of jobs marked failed.
+        """
+        host = f'{socket.gethostname()}:'
+        recovered = 0
+        for job in ImportJob.query.filter(
+            ImportJob.status.notin_(FINISHED_STATUSES),
+            db.or_(ImportJob.worker.is_(None), ImportJob.worker.startswith(host)),
+        ).all():
+            if job.worker and _process_alive(int(job.worker[len(host):])):
+                continue
+            claimed = ImportJob.query.filter_by(job_id=job.job_id, status=job.status).update(
+                {'status': 'failed'}, synchronize_session=False
+            )
+            db.session.commit()
+            if not claimed:
+                continue  # finished meanwhile, or recovered by another process
+            db.session.refresh(job)
+            self._discard_staged(job)
+            job.error_message = 'Worker process exited before the job finished'
+            self._finish(job, 'failed')
+            recovered += 1
+        if recovered:
+            logger.warning('Marked %d orphaned import jobs failed', recovered)
+        return recovered
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                self._process(job_id)
+            except Exception:
+                logger.exception('Import job %s crashed', job_id)
+            finally:
+                db.session.remove()
+
+    def _process(self, job_id):
+        from app.services.wizard_service import WizardService
+
+        if not self._claim(job_id, 'running'):
+            return  # cancelled while queued
+        job = ImportJob.query.filter_by(job_id=job_id).first()
+        job.started_at = datetime.now(timezone.utc)
+        db.session.commit()
+
+        try:
+            with open(job.spool_path, 'rb') as f:
+                upload = FileStorage(stream=f, filename=job.filename)
+                csv_like = job.filename.endswith(('.csv', '.tsv'))
+
+                def on_batch(counts):
+                    job.rows_parsed = counts['total']
+                    job.rows_invalid = counts['invalid']
+                    job.rows_valid = counts['valid']
+                    if csv_like:
+                        job.bytes_read = f.tell()
+                    db.session.commit()
+                    cancelled = db.session.query(ImportJob.cancel_requested).filter_by(
+                        job_id=job_id
+                    ).scalar()
+                    if cancelled:
+                        raise ImportCancelled()
+
+                result = WizardService().import_entity(
+                    job.session_id, job.entity_type,
+                    WizardService().iter_file(upload, job.sheet), on_batch=on_batch,
+                )
+        except ImportCancelled:
+            db.session.rollback()
+            self._discard_staged(job)
+            self._finish(job, 'cancelled')
+        except Exception as e:
+            logger.exception('Import job %s failed', job_id)
+            db.session.rollback()
+            self._discard_staged(job)
+            job.error_message = str(e)
+            self._finish(job, 'failed')
+        else:
+            job.rows_parsed = result['total']
+            job.rows_valid = result['imported']
+            job.rows_invalid = result['total'] - result['imported']
+            if csv_like:
+                job.bytes_read = job.bytes_total
+            job.errors = result['errors']
+            self._finish(job, 'completed')
+
+    def _claim(self, job_id, status):
+        """Move a queued job to ``status``; False if it was no longer queued."""
+        claimed = ImportJob.query.filter_by(job_id=job_id, status='queued').update(
+            {'status': status}, synchronize_session=False
+        )
+        db.session.commit()
+        return claimed == 1
+
+    def _discard_staged(self, job):
+        """Remove rows a cancelled or failed job staged before stopping.
+
+        Only the job's pending rows go; a previous upload stays staged.
+        """
+        delete_staged(job.session_id, pending_key(job.entity_type))
+        db.session.commit()
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = datetime.now(timezone.utc)
+        db.session.commit()
+        if job.spool_path and os.path.exists(job.spool_path):
+            os.remove(job.spool_path)
+
+
+def init_import_jobs(app):
+    """Create the app's ImportJobRunner from config."""
+    if app.config.get('WIZARD_STAGING_FORMAT', 'rows') not in STAGING_FORMATS:
+        raise ValueError(f'WIZARD_STAGING_FORMAT must be one of: {", ".join(STAGING_FORMATS)}')
+    spool_dir = app.config.get('WIZARD_SPOOL_DIR') or os.path.join(
+        app.instance_path, 'import_spool'
+    )
+    runner = ImportJobRunner(
+        app,
+        workers=app.config.get('WIZARD_IMPORT_WORKERS', 2),
+        spool_dir=spool_dir,
+    )
+    app.extensions['import_jobs'] = runner
+    with app.app_context():
+        try:
+            runner.recover_orphans()
+        except SQLAlchemyError:
+            # Tables not created (or not upgraded) yet; see flask init-db
+            db.session.rollback()
+        finally:
+            db.session.remove()
+    return runner
+
+
+def _process_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+def get_import_runner():
+    """Return the current app's ImportJobRunner."""
+    return current_app.extensions['import_jobs']
@@ -5,5 +5,8 @@ from app.models.people import Person  # noqa: F401
 from app.models.location import Location  # noqa: F401
 from app.models.security import SecurityBoundary  # noqa: F401
 from app.models.license import License  # noqa: F401
-from app.models.change import AssetChange  # noqa: F401
-from app.models.wizard_import import WizardImport, WizardSession  # noqa: F401
+from app.models.change import AssetChange, AssetChangeArchive  # noqa: F401
+from app.models.snapshot import AssetSnapshot  # noqa: F401
+from app.models.wizard_import import ImportJob, WizardImport, WizardImportChunk, WizardSession  # noqa: F401
+from app.models.discovery import DiscoveredAsset, DiscoveryRun  # noqa: F401
+from app.models.task_lease import TaskLease  # noqa: F401
@@ -4,6 +4,10 @@ from app.extensions import db
 
 class Asset(db.Model):
     __tablename__ = 'assets'
+    __table_args__ = (
+        db.Index('ix_assets_session_effective_classification',
+                 'session_id', 'effective_classification'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     asset_type = db.Column(db.String(50), nullable=False)  # hardware, software, cloud_service, license, network, contract
@@ -12,6 +16,7 @@ class Asset(db.Model):
     description = db.Column(db.Text)
     status = db.Column(db.String(30), default='active')  # active, retired, in_storage, disposed, maintenance
     data_classification = db.Column(db.String(30))  # CUI, FCI, public, internal
+    effective_classification = db.Column(db.String(30))  # derived, see ClassificationService
 
     security_boundary_id = db.Column(db.Integer, db.ForeignKey('security_boundaries.id'))
     owner_id = db.Column(db.Integer, db.ForeignKey('people.id'))
@@ -45,6 +50,7 @@ class Asset(db.Model):
             'status': self.status,
             'data_classification': self.data_classification,
             'classification': self.data_classification,
+            'effective_classification': self.effective_classification,
             'security_boundary_id': self.security_boundary_id,
             'security_boundary_name': self.security_boundary.name if self.security_boundary else None,
             'owner_id': self.owner_id,
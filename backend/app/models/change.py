@@ -4,6 +4,10 @@ from app.extensions import db
 
 class AssetChange(db.Model):
     __tablename__ = 'asset_changes'
+    __table_args__ = (
+        db.Index('ix_asset_changes_asset_changed', 'asset_id', 'changed_at', 'id'),
+        db.Index('ix_asset_changes_session_changed', 'session_id', 'changed_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), nullable=False)
@@ -35,3 +39,29 @@ class AssetChange(db.Model):
             'notes': self.notes,
             'session_id': self.session_id,
         }
+
+
+class AssetChangeArchive(db.Model):
+    """A compressed block of archived AssetChange rows.
+
+    Each block holds one asset's changes from one calendar month as
+    zlib-compressed JSON, ordered by ``(changed_at, id)``. Rows keep their
+    original ids so keyset cursors stay valid across the live and archived
+    log. See RetentionService.
+    """
+    __tablename__ = 'asset_change_archive'
+    __table_args__ = (
+        db.Index('ix_asset_change_archive_asset_end', 'asset_id', 'period_end'),
+        db.Index('ix_asset_change_archive_session_end', 'session_id', 'period_end'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), nullable=False)
+    period_start = db.Column(db.DateTime, nullable=False)  # first changed_at in the block
+    period_end = db.Column(db.DateTime, nullable=False)  # last changed_at in the block
+    row_count = db.Column(db.Integer, nullable=False)
+    source_count = db.Column(db.Integer, nullable=False)  # rows before compaction
+    payload = db.Column(db.LargeBinary, nullable=False)
+    archived_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    session_id = db.Column(db.String(64), nullable=False, default='__default__', index=True)
@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class DiscoveryRun(db.Model):
+    """One reconciliation of a discovery feed against a session's assets.
+
+    ``phases`` holds the seconds spent in each phase; ``report`` lists the
+    assets created, updated, stored and restored (capped, see
+    app.services.discovery_service) and the records that were skipped.
+    """
+    __tablename__ = 'discovery_runs'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    source = db.Column(db.String(100), nullable=False)  # scanner or feed name
+    records = db.Column(db.Integer, default=0)
+    created = db.Column(db.Integer, default=0)
+    updated = db.Column(db.Integer, default=0)
+    unchanged = db.Column(db.Integer, default=0)
+    stored = db.Column(db.Integer, default=0)  # marked in_storage after missing runs
+    restored = db.Column(db.Integer, default=0)  # seen again after being stored
+    skipped = db.Column(db.Integer, default=0)
+    phases = db.Column(db.JSON)
+    report = db.Column(db.JSON)
+    started_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = db.Column(db.DateTime)
+
+    session_id = db.Column(db.String(64), nullable=False, default='__default__', index=True)
+
+    def to_dict(self, include_report=False):
+        data = {
+            'id': self.id,
+            'source': self.source,
+            'records': self.records,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'stored': self.stored,
+            'restored': self.restored,
+            'skipped': self.skipped,
+            'phases': self.phases or {},
+            'session_id': self.session_id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if include_report:
+            data['report'] = self.report or {}
+        return data
+
+
+class DiscoveredAsset(db.Model):
+    """Discovery state of an asset for one source.
+
+    Created the first time a source's feed contains the asset. Only assets
+    with a state for a source are marked ``in_storage`` when that source
+    stops seeing them, so manually tracked assets are never touched.
+    """
+    __tablename__ = 'discovered_assets'
+    __table_args__ = (
+        db.UniqueConstraint('asset_id', 'source', name='uq_discovered_assets_asset_source'),
+        db.Index('ix_discovered_assets_session_source', 'session_id', 'source'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), nullable=False)
+    source = db.Column(db.String(100), nullable=False)
+    last_seen_run_id = db.Column(db.Integer)
+    last_seen_at = db.Column(db.DateTime)
+    missed_runs = db.Column(db.Integer, nullable=False, default=0)  # consecutive runs without the asset
+    stored = db.Column(db.Boolean, nullable=False, default=False)  # set to in_storage by discovery
+
+    session_id = db.Column(db.String(64), nullable=False, default='__default__')
@@ -4,6 +4,9 @@ from app.extensions import db
 
 class License(db.Model):
     __tablename__ = 'licenses'
+    __table_args__ = (
+        db.Index('ix_licenses_session_expiry', 'session_id', 'expiry_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     software_asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'))
@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class AssetSnapshot(db.Model):
+    """Full copy of an asset's column values at a point in time.
+
+    Snapshots bound the cost of point-in-time reconstruction: an asset's
+    state at time T is its latest snapshot at or before T with later
+    AssetChange rows replayed on top.
+    """
+    __tablename__ = 'asset_snapshots'
+    __table_args__ = (
+        db.Index('ix_asset_snapshots_asset_taken', 'asset_id', 'taken_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), nullable=False)
+    state = db.Column(db.JSON, nullable=False)
+    taken_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    session_id = db.Column(db.String(64), nullable=False, default='__default__', index=True)
@@ -0,0 +1,15 @@
+from app.extensions import db
+
+
+class TaskLease(db.Model):
+    """Lease that lets one process at a time run a periodic task.
+
+    Every worker process starts the same periodic tasks; before each run a
+    task takes or renews its lease, and skips the run while another process
+    holds an unexpired one (see app.tasks).
+    """
+    __tablename__ = 'task_leases'
+
+    name = db.Column(db.String(100), primary_key=True)
+    holder = db.Column(db.String(255), nullable=False)  # host:pid of the running process
+    expires_at = db.Column(db.DateTime, nullable=False)
@@ -6,16 +6,44 @@ class WizardImport(db.Model):
     """Staging table for wizard data imports.
 
     Each row stores a single imported record as JSON, isolated by session_id.
-    Data stays here until the user finalizes, at which point it can be
-    promoted to the real entity tables.
+    Rows that failed validation are kept with their ``errors`` for review
+    and are never promoted. Data stays here until the user finalizes, at
+    which point it can be promoted to the real entity tables.
     """
     __tablename__ = 'wizard_imports'
+    __table_args__ = (
+        db.Index('ix_wizard_imports_session_entity_row', 'session_id', 'entity_type', 'row_index'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     session_id = db.Column(db.String(64), nullable=False, index=True)
     entity_type = db.Column(db.String(50), nullable=False)
     row_data = db.Column(db.JSON, nullable=False)
     row_index = db.Column(db.Integer, default=0)
+    errors = db.Column(db.JSON(none_as_null=True))  # [{line, column, value, message}], NULL if valid
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class WizardImportChunk(db.Model):
+    """Columnar staging for wizard imports.
+
+    Each record holds ``row_count`` consecutive staged rows, starting at
+    ``row_start``, as one compressed columnar payload (see
+    app.services.wizard_staging). Used instead of WizardImport rows when
+    WIZARD_STAGING_FORMAT is 'columnar'.
+    """
+    __tablename__ = 'wizard_import_chunks'
+    __table_args__ = (
+        db.Index('ix_wizard_import_chunks_session_entity_start', 'session_id', 'entity_type', 'row_start'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    session_id = db.Column(db.String(64), nullable=False)
+    entity_type = db.Column(db.String(50), nullable=False)
+    row_start = db.Column(db.Integer, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    error_count = db.Column(db.Integer, nullable=False, default=0)  # rows that failed validation
+    payload = db.Column(db.LargeBinary, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
 
@@ -28,3 +56,70 @@ class WizardSession(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
                            onupdate=lambda: datetime.now(timezone.utc))
+
+
+class ImportJob(db.Model):
+    """A background wizard import of a spooled upload.
+
+    Progress counters are committed after every staged batch so any worker
+    process can report on the job. See app.import_jobs.
+    """
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    job_id = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    session_id = db.Column(db.String(64), nullable=False, index=True)
+    entity_type = db.Column(db.String(50), nullable=False)
+    filename = db.Column(db.String(255))
+    sheet = db.Column(db.String(100))  # Excel sheet name or 1-based position
+    spool_path = db.Column(db.String(500))
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    # queued, running, completed, failed, cancelled
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    worker = db.Column(db.String(255))  # host:pid of the process running the job
+    bytes_total = db.Column(db.BigInteger)
+    bytes_read = db.Column(db.BigInteger, default=0)
+    rows_parsed = db.Column(db.Integer, default=0)
+    rows_valid = db.Column(db.Integer, default=0)
+    rows_invalid = db.Column(db.Integer, default=0)
+    errors = db.Column(db.JSON)
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        elapsed = None
+        if self.started_at:
+            end = self.finished_at or datetime.now(timezone.utc).replace(tzinfo=None)
+            elapsed = max((end - self.started_at).total_seconds(), 0.0)
+        throughput = round(self.rows_parsed / elapsed, 1) if elapsed else None
+        eta = None
+        if self.status == 'running' and elapsed and self.bytes_total and self.bytes_read:
+            remaining = max(self.bytes_total - self.bytes_read, 0)
+            eta = round(elapsed * remaining / self.bytes_read, 1)
+        return {
+            'job_id': self.job_id,
+            'session_id': self.session_id,
+            'entity_type': self.entity_type,
+            'filename': self.filename,
+            'sheet': self.sheet,
+            'status': self.status,
+            'cancel_requested': self.cancel_requested,
+            'bytes_total': self.bytes_total,
+            'bytes_read': self.bytes_read,
+            'progress': round(self.bytes_read / self.bytes_total, 4) if self.bytes_total else None,
+            'rows_parsed': self.rows_parsed,
+            'rows_valid': self.rows_valid,
+            'rows_invalid': self.rows_invalid,
+            'rows_per_second': throughput,
+            'elapsed_seconds': round(elapsed, 1) if elapsed is not None else None,
+            'eta_seconds': eta,
+            'errors': self.errors or [],
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,61 @@
+"""In-place schema upgrades for existing databases.
+
+``db.create_all()`` creates missing tables but never alters existing ones,
+so a database created before a column or index was added to a model fails
+queries with "no such column". ``upgrade_schema`` adds what is missing.
+
+Call via: flask init-db (also run by ``seed``)
+"""
+from sqlalchemy import inspect
+
+from app.extensions import db
+from app.models.asset import Asset
+
+
+def upgrade_schema():
+    """Create missing tables, then add missing columns and indexes.
+
+    Added columns must be nullable or have a scalar default, which is
+    written to existing rows. When ``assets.effective_classification`` is
+    added, it is computed for every session. Returns the added columns and
+    indexes as ``table.name`` strings.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    added = {'columns': [], 'indexes': []}
+
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column)}')
+                added['columns'].append(f'{table.name}.{column.name}')
+
+            indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    added['indexes'].append(f'{table.name}.{index.name}')
+
+    if 'assets.effective_classification' in added['columns']:
+        from app.services.classification_service import ClassificationService
+        service = ClassificationService()
+        for (session_id,) in db.session.query(Asset.session_id).distinct():
+            service.recompute_all(session_id)
+    return added
+
+
+def _column_ddl(column):
+    dialect = db.engine.dialect
+    ddl = f'{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}'
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        ddl += f' DEFAULT {int(default) if isinstance(default, bool) else repr(default)}'
+    if not column.nullable:
+        if default is None:
+            raise RuntimeError(f'Cannot add NOT NULL column {column.table.name}.{column.name} '
+                               'without a default; reset the database instead')
+        ddl += ' NOT NULL'
+    return ddl
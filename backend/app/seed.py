@@ -4,20 +4,22 @@ Call via: flask seed
 """
 from datetime import date, datetime, timezone
 from app.extensions import db
+from app.schema import upgrade_schema
 from app.models.user import User
 from app.models.people import Person
 from app.models.location import Location
 from app.models.security import SecurityBoundary
 from app.models.asset import Asset, AssetRelationship
 from app.models.license import License
-from app.models.change import AssetChange
+from app.models.change import AssetChange, AssetChangeArchive
+from app.models.snapshot import AssetSnapshot
 
 SESSION = '__default__'
 
 
 def seed():
     """Seed the database with sample data."""
-    db.create_all()
+    upgrade_schema()
 
     # Clear existing default session data
     _clear_default_data()
@@ -49,10 +51,16 @@ def seed():
 
     db.session.commit()
 
+    # Derive effective classifications from the relationship graph
+    from app.services.classification_service import ClassificationService
+    ClassificationService().recompute_all(SESSION)
+
 
 def _clear_default_data():
     """Clear existing seed data."""
     AssetChange.query.filter_by(session_id=SESSION).delete()
+    AssetChangeArchive.query.filter_by(session_id=SESSION).delete()
+    AssetSnapshot.query.filter_by(session_id=SESSION).delete()
     AssetRelationship.query.filter_by(session_id=SESSION).delete()
     License.query.filter_by(session_id=SESSION).delete()
     Asset.query.filter_by(session_id=SESSION).delete()
@@ -1,15 +1,23 @@
 from datetime import datetime, timezone
 from app.extensions import db
 from app.models.asset import Asset
-from app.models.change import AssetChange
+from app.models.change import AssetChange, AssetChangeArchive
+from app.models.discovery import DiscoveredAsset
+from app.models.snapshot import AssetSnapshot
+from app.audit import get_audit_writer
+from app.services.classification_service import ClassificationService, RANK_LABELS, classification_rank
+from app.services.history_service import HistoryService, audit_value
 from app.errors import NotFoundError, BadRequestError
 
+classification_service = ClassificationService()
+history_service = HistoryService()
+
 
 class AssetService:
     """Service layer for Asset CRUD operations."""
 
     def find_all(self, session_id='__default__', asset_type=None, status=None,
-                 data_classification=None, search=None):
+                 data_classification=None, search=None, effective_classification=None):
         """Find all assets with optional filters."""
         query = Asset.query.filter_by(session_id=session_id)
 
@@ -19,6 +27,8 @@ class AssetService:
             query = query.filter(Asset.status == status)
         if data_classification:
             query = query.filter(Asset.data_classification == data_classification)
+        if effective_classification:
+            query = query.filter(Asset.effective_classification == effective_classification)
         if search:
             search_term = f'%{search}%'
             query = query.filter(
@@ -39,6 +49,14 @@ class AssetService:
             raise NotFoundError(f'Asset with id {asset_id} not found')
         return asset
 
+    def exists(self, asset_id, session_id='__default__'):
+        """Raise NotFoundError unless the asset exists, without loading it."""
+        found = db.session.query(Asset.id).filter_by(
+            id=asset_id, session_id=session_id
+        ).first()
+        if not found:
+            raise NotFoundError(f'Asset with id {asset_id} not found')
+
     def create(self, data, changed_by='system'):
         """Create a new asset."""
         if not data.get('name'):
@@ -53,6 +71,9 @@ class AssetService:
             description=data.get('description'),
             status=data.get('status', 'active'),
             data_classification=data.get('data_classification'),
+            effective_classification=RANK_LABELS.get(
+                classification_rank(data.get('data_classification'))
+            ),
             security_boundary_id=data.get('security_boundary_id'),
             owner_id=data.get('owner_id'),
             managed_by_id=data.get('managed_by_id'),
@@ -70,14 +91,14 @@ class AssetService:
         db.session.flush()  # get the ID
 
         # Log the creation
-        change = AssetChange(
-            asset_id=asset.id,
-            changed_by=changed_by,
-            change_type='created',
-            notes=f'Asset "{asset.name}" created',
-            session_id=asset.session_id,
-        )
-        db.session.add(change)
+        get_audit_writer().record([{
+            'asset_id': asset.id,
+            'changed_by': changed_by,
+            'change_type': 'created',
+            'notes': f'Asset "{asset.name}" created',
+            'session_id': asset.session_id,
+        }])
+        history_service.snapshot(asset)
         db.session.commit()
 
         return asset
@@ -86,29 +107,40 @@ class AssetService:
         """Update an existing asset and log changes."""
         asset = self.get_by_id(asset_id, session_id)
 
+        classification_changed = (
+            'data_classification' in data
+            and data['data_classification'] != asset.data_classification
+        )
+
         # Track changes for audit log
         tracked_fields = [
             'name', 'asset_type', 'sub_type', 'description', 'status',
             'data_classification', 'security_boundary_id', 'owner_id',
-            'managed_by_id', 'vendor', 'location_id', 'tags',
+            'managed_by_id', 'vendor', 'location_id', 'attributes', 'tags',
+            'acquired_date', 'warranty_expiry', 'last_audit_date',
         ]
+        date_fields = ['acquired_date', 'warranty_expiry', 'last_audit_date']
 
+        changes = []
         for field in tracked_fields:
-            if field in data and data[field] != getattr(asset, field):
-                old_val = str(getattr(asset, field)) if getattr(asset, field) is not None else None
-                new_val = str(data[field]) if data[field] is not None else None
+            if field not in data:
+                continue
+            new = _parse_date(data[field]) if field in date_fields else data[field]
+            if new != getattr(asset, field):
+                old_val = audit_value(field, getattr(asset, field))
+                new_val = audit_value(field, new)
 
                 change_type = 'status_change' if field == 'status' else 'updated'
-                change = AssetChange(
-                    asset_id=asset.id,
-                    changed_by=changed_by,
-                    change_type=change_type,
-                    field_changed=field,
-                    old_value=old_val,
-                    new_value=new_val,
-                    session_id=session_id,
-                )
-                db.session.add(change)
+                changes.append({
+                    'asset_id': asset.id,
+                    'changed_by': changed_by,
+                    'change_type': change_type,
+                    'field_changed': field,
+                    'old_value': old_val,
+                    'new_value': new_val,
+                    'session_id': session_id,
+                })
+        get_audit_writer().record(changes)
 
         # Apply updates
         updatable_fields = [
@@ -121,12 +153,17 @@ class AssetService:
                 setattr(asset, field, data[field])
 
         # Handle date fields separately
-        date_fields = ['acquired_date', 'warranty_expiry', 'last_audit_date']
         for field in date_fields:
             if field in data:
                 setattr(asset, field, _parse_date(data[field]))
 
         asset.updated_at = datetime.now(timezone.utc)
+        if classification_changed:
+            db.session.flush()
+            classification_service.propagate(session_id, [asset.id])
+        if changes:
+            db.session.flush()
+            history_service.maybe_snapshot(asset)
         db.session.commit()
 
         return asset
@@ -134,9 +171,14 @@ class AssetService:
     def delete(self, asset_id, session_id='__default__'):
         """Delete an asset and its relationships."""
         asset = self.get_by_id(asset_id, session_id)
+        dependents = classification_service.predecessors(session_id, asset_id)
 
-        # Delete related changes
+        # Delete related changes, including any still queued for writing
+        get_audit_writer().flush()
         AssetChange.query.filter_by(asset_id=asset_id, session_id=session_id).delete()
+        AssetChangeArchive.query.filter_by(asset_id=asset_id, session_id=session_id).delete()
+        AssetSnapshot.query.filter_by(asset_id=asset_id, session_id=session_id).delete()
+        DiscoveredAsset.query.filter_by(asset_id=asset_id, session_id=session_id).delete()
 
         # Delete related relationships (both directions)
         from app.models.asset import AssetRelationship
@@ -155,6 +197,8 @@ class AssetService:
         License.query.filter_by(software_asset_id=asset_id, session_id=session_id).delete()
 
         db.session.delete(asset)
+        db.session.flush()
+        classification_service.propagate(session_id, dependents)
         db.session.commit()
 
 
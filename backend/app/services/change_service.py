@@ -0,0 +1,177 @@
+import base64
+import json
+from datetime import datetime, timezone
+from app.extensions import db
+from app.models.asset import Asset
+from app.models.change import AssetChange
+from app.services.retention_service import archived_blocks, decode_block
+from app.errors import BadRequestError
+
+
+class ChangeService:
+    """Service for reading the asset change log."""
+
+    def find_page(self, session_id='__default__', asset_id=None, change_type=None,
+                  field_changed=None, changed_by=None, since=None, until=None,
+                  cursor=None, limit=50, include_archived=True):
+        """Return one page of changes, newest first, and the cursor for the next.
+
+        Pagination is keyset-based on ``(changed_at, id)`` so each page is an
+        index range scan on ``(asset_id, changed_at, id)`` or
+        ``(session_id, changed_at, id)`` regardless of depth. Rows are read as
+        columns with the asset name from an outer join, not as ORM objects
+        with their eager-loaded asset.
+
+        With ``include_archived`` the page also draws on archive blocks
+        (see RetentionService). Blocks are read newest first and only until
+        no remaining block can contain a row that belongs on the page.
+        """
+        if limit < 1 or limit > 500:
+            raise BadRequestError('limit must be between 1 and 500')
+
+        query = db.session.query(
+            AssetChange.id,
+            AssetChange.asset_id,
+            Asset.name.label('asset_name'),
+            AssetChange.changed_by,
+            AssetChange.change_type,
+            AssetChange.field_changed,
+            AssetChange.old_value,
+            AssetChange.new_value,
+            AssetChange.changed_at,
+            AssetChange.notes,
+            AssetChange.session_id,
+        ).outerjoin(Asset, Asset.id == AssetChange.asset_id).filter(
+            AssetChange.session_id == session_id
+        )
+
+        if asset_id is not None:
+            query = query.filter(AssetChange.asset_id == asset_id)
+        if change_type:
+            query = query.filter(AssetChange.change_type == change_type)
+        if field_changed:
+            query = query.filter(AssetChange.field_changed == field_changed)
+        if changed_by:
+            query = query.filter(AssetChange.changed_by == changed_by)
+        if since:
+            query = query.filter(AssetChange.changed_at >= since)
+        if until:
+            query = query.filter(AssetChange.changed_at <= until)
+        cursor_at = cursor_id = None
+        if cursor:
+            cursor_at, cursor_id = decode_cursor(cursor)
+            query = query.filter(db.or_(
+                AssetChange.changed_at < cursor_at,
+                db.and_(AssetChange.changed_at == cursor_at, AssetChange.id < cursor_id),
+            ))
+
+        rows = [
+            dict(row._asdict(), archived=False, compacted=1)
+            for row in query.order_by(
+                AssetChange.changed_at.desc(), AssetChange.id.desc()
+            ).limit(limit + 1)
+        ]
+
+        if include_archived:
+            rows = self._merge_archived(
+                rows, session_id, asset_id, change_type, field_changed, changed_by,
+                since, until, cursor_at, cursor_id, limit + 1,
+            )
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['changed_at'], rows[-1]['id'])
+
+        return [_row_to_dict(row) for row in rows], next_cursor
+
+    def _merge_archived(self, rows, session_id, asset_id, change_type, field_changed,
+                        changed_by, since, until, cursor_at, cursor_id, wanted):
+        """Merge matching archived rows into ``rows`` and keep the newest ``wanted``."""
+        upper = cursor_at if cursor_at is not None else until
+        if until is not None and upper is not None:
+            upper = min(upper, until)
+        key = _sort_key
+
+        found = []
+        for _, period_end, payload in archived_blocks(
+                session_id, None if asset_id is None else [asset_id], since, upper):
+            candidates = sorted(rows + found, key=key, reverse=True)[:wanted]
+            if len(candidates) == wanted and candidates[-1]['changed_at'] > period_end:
+                break  # every remaining block is older than the page
+            for row in decode_block(payload):
+                if asset_id is not None and row['asset_id'] != asset_id:
+                    continue
+                if change_type and row['change_type'] != change_type:
+                    continue
+                if field_changed and row['field_changed'] != field_changed:
+                    continue
+                if changed_by and row['changed_by'] != changed_by:
+                    continue
+                if since and row['changed_at'] < since:
+                    continue
+                if until and row['changed_at'] > until:
+                    continue
+                if cursor_at is not None and (row['changed_at'], row['id']) >= (cursor_at, cursor_id):
+                    continue
+                found.append(dict(row, archived=True))
+            found = sorted(found, key=key, reverse=True)[:wanted]
+
+        if not found:
+            return rows
+        names = dict(db.session.query(Asset.id, Asset.name).filter(
+            Asset.id.in_({row['asset_id'] for row in found})
+        ))
+        for row in found:
+            row['asset_name'] = names.get(row['asset_id'])
+        return sorted(rows + found, key=key, reverse=True)[:wanted]
+
+
+def encode_cursor(changed_at, change_id):
+    """Encode a ``(changed_at, id)`` position as an opaque URL-safe token."""
+    raw = json.dumps([changed_at.isoformat() if changed_at else None, change_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from :func:`encode_cursor`."""
+    try:
+        changed_at, change_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(changed_at), int(change_id)
+    except (ValueError, TypeError):
+        raise BadRequestError('Invalid cursor')
+
+
+def parse_datetime(value):
+    """Parse an ISO date or datetime string as naive UTC, or return None."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise BadRequestError(f'Invalid date: {value}')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _sort_key(row):
+    return (row['changed_at'], row['id'])
+
+
+def _row_to_dict(row):
+    return {
+        'id': row['id'],
+        'asset_id': row['asset_id'],
+        'asset_name': row['asset_name'],
+        'changed_by': row['changed_by'],
+        'change_type': row['change_type'],
+        'field_changed': row['field_changed'],
+        'old_value': row['old_value'],
+        'new_value': row['new_value'],
+        'changed_at': row['changed_at'].isoformat() if row['changed_at'] else None,
+        'notes': row['notes'],
+        'session_id': row['session_id'],
+        'archived': row['archived'],
+        'compacted': row['compacted'],
+    }
@@ -0,0 +1,183 @@
+import networkx as nx
+from sqlalchemy import case, select, update
+from app.extensions import db
+from app.models.asset import Asset, AssetRelationship
+from app.services.security_service import CLASSIFICATION_RANK
+
+# Edge types along which data handling flows back to the source: a server that
+# `runs` an app, or an app that `depends_on` a data store, handles that
+# target's data and inherits its classification.
+PROPAGATION_EDGE_TYPES = ('runs', 'depends_on')
+
+RANK_LABELS = {3: 'CUI', 2: 'FCI', 1: 'internal', 0: 'public'}
+
+# Incremental updates touching more assets than this fall back to a full pass
+FULL_RECOMPUTE_THRESHOLD = 5000
+
+# Maximum ids per bulk UPDATE statement
+_WRITE_CHUNK = 500
+
+
+def classification_rank(value):
+    """Return the sensitivity rank of a classification, or -1 if unset/unknown."""
+    return CLASSIFICATION_RANK.get((value or '').lower(), -1)
+
+
+class ClassificationService:
+    """Maintains each asset's effective classification.
+
+    The effective classification is the most sensitive classification among
+    the asset itself and every asset it reaches over
+    ``PROPAGATION_EDGE_TYPES`` edges, i.e. a fixed point of
+    ``effective(a) = max(own(a), effective(t) for a -> t)``.
+    """
+
+    def recompute_all(self, session_id='__default__'):
+        """Recompute effective classification for every asset in a session."""
+        updated = self._recompute_all(session_id)
+        db.session.commit()
+        return {'session_id': session_id, 'mode': 'full', 'updated': updated}
+
+    def propagate(self, session_id, asset_ids):
+        """Recompute the subgraph affected by changes at ``asset_ids``.
+
+        ``asset_ids`` are assets whose own classification or outgoing
+        propagation edges changed. Only they and their ancestors (found with
+        a recursive CTE) are recomputed; successors outside that set keep
+        their stored values. Writes are flushed but not committed.
+        Returns the number of assets whose effective classification changed.
+        """
+        seeds = {a for a in asset_ids if a is not None}
+        if not seeds:
+            return 0
+
+        ancestors = select(Asset.id.label('id')).where(
+            Asset.id.in_(seeds), Asset.session_id == session_id,
+        ).cte('ancestors', recursive=True)
+        ancestors = ancestors.union(
+            select(AssetRelationship.source_asset_id).join(
+                ancestors, AssetRelationship.target_asset_id == ancestors.c.id
+            ).where(
+                AssetRelationship.session_id == session_id,
+                AssetRelationship.relationship_type.in_(PROPAGATION_EDGE_TYPES),
+            )
+        )
+        affected = {row[0] for row in db.session.execute(select(ancestors.c.id))}
+        if not affected:
+            return 0
+        if len(affected) > FULL_RECOMPUTE_THRESHOLD:
+            return self._recompute_all(session_id)
+
+        edges = []
+        for chunk in _chunks(sorted(affected)):
+            edges.extend(db.session.query(
+                AssetRelationship.source_asset_id, AssetRelationship.target_asset_id
+            ).filter(
+                AssetRelationship.session_id == session_id,
+                AssetRelationship.relationship_type.in_(PROPAGATION_EDGE_TYPES),
+                AssetRelationship.source_asset_id.in_(chunk),
+            ).all())
+
+        involved = affected | {t for _, t in edges}
+        own, stored = {}, {}
+        for chunk in _chunks(sorted(involved)):
+            for asset_id, classification, effective in db.session.query(
+                Asset.id, Asset.data_classification, Asset.effective_classification
+            ).filter(Asset.id.in_(chunk)):
+                own[asset_id] = classification_rank(classification)
+                stored[asset_id] = effective
+
+        G = nx.DiGraph()
+        G.add_nodes_from(affected)
+        boundary = {}
+        for source, target in edges:
+            if target in affected:
+                G.add_edge(source, target)
+            elif target in stored:
+                boundary[source] = max(boundary.get(source, -1),
+                                       classification_rank(stored[target]))
+
+        ranks = self._solve(G, lambda m: max(own.get(m, -1), boundary.get(m, -1)))
+        changed = {
+            asset_id: RANK_LABELS.get(rank)
+            for asset_id, rank in ranks.items()
+            if RANK_LABELS.get(rank) != stored.get(asset_id)
+        }
+        self._write(changed)
+        return len(changed)
+
+    def predecessors(self, session_id, asset_id):
+        """Return ids of assets with a propagation edge into ``asset_id``."""
+        return [source for (source,) in db.session.query(
+            AssetRelationship.source_asset_id
+        ).filter(
+            AssetRelationship.session_id == session_id,
+            AssetRelationship.relationship_type.in_(PROPAGATION_EDGE_TYPES),
+            AssetRelationship.target_asset_id == asset_id,
+        ).distinct()]
+
+    def _recompute_all(self, session_id):
+        rows = db.session.query(
+            Asset.id, Asset.data_classification, Asset.effective_classification
+        ).filter(Asset.session_id == session_id).all()
+        own = {asset_id: classification_rank(c) for asset_id, c, _ in rows}
+        stored = {asset_id: e for asset_id, _, e in rows}
+
+        G = nx.DiGraph()
+        G.add_nodes_from(own)
+        G.add_edges_from(
+            (s, t) for s, t in db.session.query(
+                AssetRelationship.source_asset_id, AssetRelationship.target_asset_id
+            ).filter(
+                AssetRelationship.session_id == session_id,
+                AssetRelationship.relationship_type.in_(PROPAGATION_EDGE_TYPES),
+            ) if s in own and t in own
+        )
+
+        ranks = self._solve(G, lambda m: own[m])
+        changed = {
+            asset_id: RANK_LABELS.get(rank)
+            for asset_id, rank in ranks.items()
+            if RANK_LABELS.get(rank) != stored[asset_id]
+        }
+        self._write(changed)
+        return len(changed)
+
+    def _solve(self, G, base_rank):
+        """Fixed point of max-rank over ``G`` in one reverse-topological pass.
+
+        Strongly connected components share a rank, so cycles are handled by
+        condensing them first.
+        """
+        C = nx.condensation(G)
+        comp_rank = {}
+        for c in reversed(list(nx.topological_sort(C))):
+            rank = max(base_rank(m) for m in C.nodes[c]['members'])
+            for succ in C.successors(c):
+                rank = max(rank, comp_rank[succ])
+            comp_rank[c] = rank
+        return {node: comp_rank[c] for node, c in C.graph['mapping'].items()}
+
+    def _write(self, changed):
+        """Bulk-write effective classifications without touching updated_at."""
+        ids = sorted(changed)
+        for chunk in _chunks(ids):
+            db.session.execute(
+                update(Asset).where(Asset.id.in_(chunk)).values(
+                    effective_classification=case(
+                        {asset_id: changed[asset_id] for asset_id in chunk},
+                        value=Asset.id,
+                    ),
+                    updated_at=Asset.updated_at,
+                ).execution_options(synchronize_session=False)
+            )
+        if ids:
+            # Refresh any loaded instances so they see the new values
+            for obj in list(db.session.identity_map.values()):
+                if isinstance(obj, Asset) and obj.id in changed:
+                    db.session.expire(obj, ['effective_classification'])
+
+
+def _chunks(items, size=_WRITE_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
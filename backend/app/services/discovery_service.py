@@ -0,0 +1,397 @@
+"""Reconciliation of discovery scanner feeds with a session's assets.
+
+A feed is a full snapshot: every asset the scanner saw on this run. Records
+are matched to assets through in-memory indexes of the serial, MAC address
+and hostname kept in asset attributes. Matched assets are updated with the
+values that changed, unmatched records become new assets, and assets a
+source has seen before but misses for ``DISCOVERY_MISSED_RUNS`` runs in a
+row are marked ``in_storage``. All writes are bulk statements in one
+transaction, logged in the change log like any other edit.
+"""
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import insert, select, update
+
+from app.extensions import db
+from app.audit import get_audit_writer
+from app.models.asset import Asset
+from app.models.discovery import DiscoveredAsset, DiscoveryRun
+from app.models.snapshot import AssetSnapshot
+from app.services.classification_service import ClassificationService, RANK_LABELS, classification_rank
+from app.services.history_service import SNAPSHOT_FIELDS, audit_value
+from app.services.wizard_schema import ENTITY_COLUMNS, EntitySchema, convert_row, json_safe
+from app.services.wizard_service import ENTITY_TYPES
+from app.errors import BadRequestError, NotFoundError
+
+# Identity attributes in match priority order, with the record keys read for each
+IDENTITY_KEYS = {
+    'serial': ('serial', 'serial_number'),
+    'mac': ('mac', 'mac_address'),
+    'hostname': ('hostname', 'host'),
+}
+
+# Asset columns a feed may set; other record keys are kept in attributes.
+# Status is left to reconciliation.
+FEED_COLUMNS = {k: v for k, v in ENTITY_COLUMNS['assets'].items() if k != 'status'}
+
+# Record key -> canonical identity name, under which it is kept in attributes
+IDENTITY_ALIASES = {name: names[0] for names in IDENTITY_KEYS.values() for name in names}
+
+# Statuses reconciliation never changes
+FINAL_STATUSES = ('retired', 'disposed')
+
+# Entries kept per list in a run's report
+MAX_REPORTED = 100
+
+# Rows per bulk INSERT/UPDATE
+WRITE_BATCH_SIZE = 1000
+
+_MAC_SEPARATORS = re.compile(r'[\s:.-]')
+
+
+class DiscoveryService:
+    """Runs and reports discovery reconciliations."""
+
+    def reconcile(self, records, session_id='__default__', source='discovery',
+                  missed_runs=None, changed_by=None):
+        """Reconcile a full-snapshot feed with a session's assets.
+
+        ``records`` yields ``(line, record, error)`` as ``iter_ndjson`` does
+        (see ``number_records`` for plain row dicts). Each record is matched
+        on its serial, then MAC address, then hostname (case-insensitive;
+        MAC separators ignored) against the same keys in asset attributes:
+
+        - unmatched records create ``active`` assets (``asset_type``
+          defaults to hardware, ``name`` to the hostname, serial or MAC);
+        - matched assets get the columns and attributes that differ;
+          blank values never clear existing ones;
+        - assets this source has seen before and misses for
+          ``missed_runs`` runs in a row (``DISCOVERY_MISSED_RUNS``) are set
+          to ``in_storage``, and set back to ``active`` when seen again.
+
+        Records without any identity key, with invalid values, or matching
+        an asset an earlier record already matched are skipped. Returns the
+        run with its counts, the seconds spent per phase and the report.
+        """
+        if missed_runs is None:
+            missed_runs = current_app.config['DISCOVERY_MISSED_RUNS']
+        if missed_runs < 1:
+            raise BadRequestError('missed_runs must be 1 or greater')
+        source = (source or '').strip()
+        if not source:
+            raise BadRequestError('source is required')
+
+        reconciliation = _Reconciliation(session_id, source, missed_runs,
+                                         changed_by or f'discovery:{source}')
+        try:
+            run = reconciliation.execute(records)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return run.to_dict(include_report=True)
+
+    def list_runs(self, session_id='__default__', source=None, limit=20):
+        """Return the session's most recent runs, newest first."""
+        query = DiscoveryRun.query.filter_by(session_id=session_id)
+        if source:
+            query = query.filter_by(source=source)
+        return [r.to_dict() for r in query.order_by(DiscoveryRun.id.desc()).limit(limit)]
+
+    def get_run(self, run_id, session_id='__default__'):
+        run = DiscoveryRun.query.filter_by(id=run_id, session_id=session_id).first()
+        if not run:
+            raise NotFoundError(f'Discovery run {run_id} not found')
+        return run.to_dict(include_report=True)
+
+
+class _Reconciliation:
+    """Indexes, pending writes and report of a single run."""
+
+    def __init__(self, session_id, source, missed_runs, changed_by):
+        self.session_id = session_id
+        self.source = source
+        self.missed_runs = missed_runs
+        self.changed_by = changed_by
+        self.now = datetime.now(timezone.utc)
+        self.phases = {}
+        self.counts = {field: 0 for field in (
+            'records', 'created', 'updated', 'unchanged', 'stored', 'restored', 'skipped',
+        )}
+        self.report = {field: [] for field in ('created', 'updated', 'stored', 'restored', 'skipped')}
+        self.assets = {}  # id -> row
+        self.index = {kind: {} for kind in IDENTITY_KEYS}  # kind -> key -> asset id
+        self.states = {}  # asset id -> {id, missed_runs, stored}
+        self.seen = set()  # matched asset ids; -n for the nth pending create
+        self.creates = []
+        self.updates = {}  # asset id -> changed column values
+        enums = {k: v for k, v in ENTITY_TYPES['assets']['enums'].items() if k != 'status'}
+        self.schema = EntitySchema('assets', enums=enums)
+
+    def execute(self, records):
+        started = time.perf_counter()
+        run = DiscoveryRun(source=self.source, session_id=self.session_id, started_at=self.now)
+        db.session.add(run)
+        db.session.flush()
+
+        with self._phase('index'):
+            self._load()
+        with self._phase('match'):
+            self._match(records)
+        with self._phase('missing'):
+            state_updates = self._missing()
+        with self._phase('apply'):
+            self._apply(run.id, state_updates)
+
+        self.phases['total'] = round(time.perf_counter() - started, 3)
+        for field, count in self.counts.items():
+            setattr(run, field, count)
+        run.phases = self.phases
+        run.report = self.report
+        run.finished_at = datetime.now(timezone.utc)
+        return run
+
+    @contextmanager
+    def _phase(self, name):
+        started = time.perf_counter()
+        yield
+        self.phases[name] = round(time.perf_counter() - started, 3)
+
+    def _load(self):
+        """Index the session's assets by identity key and load this source's states."""
+        table = Asset.__table__
+        for row in db.session.execute(
+            select(table).where(table.c.session_id == self.session_id).order_by(table.c.id.desc())
+        ).mappings():  # lowest id wins among duplicate keys
+            self.assets[row['id']] = row
+            attributes = row['attributes'] if isinstance(row['attributes'], dict) else {}
+            for kind, key in _identities(attributes).items():
+                self.index[kind][key] = row['id']
+        for state_id, asset_id, missed, stored in db.session.query(
+            DiscoveredAsset.id, DiscoveredAsset.asset_id,
+            DiscoveredAsset.missed_runs, DiscoveredAsset.stored,
+        ).filter_by(session_id=self.session_id, source=self.source):
+            self.states[asset_id] = {'id': state_id, 'missed_runs': missed, 'stored': stored}
+
+    def _match(self, records):
+        for line, record, error in records:
+            self.counts['records'] += 1
+            identities = None
+            if error is None:
+                identities = _identities(record)
+                if not identities:
+                    error = f'no {", ".join(IDENTITY_KEYS)}'
+            if error is None:
+                record, row_errors = self.schema.validate(line, record)
+                if row_errors:
+                    error = f'{row_errors[0].column}: {row_errors[0].message}'
+            if error is None:
+                values, error = convert_row(
+                    FEED_COLUMNS, record, attributes=True, aliases=IDENTITY_ALIASES, ignore=('status',),
+                )
+            if error is None:
+                asset_id = next((self.index[kind][key] for kind, key in identities.items()
+                                 if key in self.index[kind]), None)
+                if asset_id in self.seen:
+                    error = 'matches the same asset as an earlier record'
+            if error is not None:
+                self.counts['skipped'] += 1
+                self._note('skipped', {'line': line, 'error': error})
+                continue
+
+            if asset_id is None:
+                self._create(values, identities)
+            else:
+                self.seen.add(asset_id)
+                self._compare(asset_id, values)
+
+    def _create(self, values, identities):
+        placeholder = -(len(self.creates) + 1)
+        self.seen.add(placeholder)
+        for kind, key in identities.items():
+            self.index[kind][key] = placeholder
+        attributes = values.get('attributes', {})
+        if not values.get('name'):
+            values['name'] = next(str(attributes[name]) for name in ('hostname', 'serial', 'mac')
+                                  if attributes.get(name))
+        values['asset_type'] = values.get('asset_type') or 'hardware'
+        values['status'] = 'active'
+        self.creates.append(values)
+
+    def _compare(self, asset_id, values):
+        """Queue the changes a record makes to an existing asset."""
+        old = self.assets[asset_id]
+        new = {}
+        fields = {}
+        for column, value in values.items():
+            if column == 'attributes':
+                current = old['attributes'] if isinstance(old['attributes'], dict) else {}
+                changed = {k: v for k, v in value.items() if current.get(k) != v
+                           and not _same_identity(k, current.get(k), v)}
+                if changed:
+                    new['attributes'] = {**current, **changed}
+                    for k, v in changed.items():
+                        fields[f'attributes.{k}'] = {'old': current.get(k), 'new': v}
+            elif value is not None and value != old[column]:
+                new[column] = value
+                fields[column] = {'old': json_safe(old[column]), 'new': json_safe(value)}
+
+        state = self.states.get(asset_id)
+        if state and state['stored'] and old['status'] == 'in_storage':
+            new['status'] = 'active'
+            self.counts['restored'] += 1
+            self._note('restored', {'id': asset_id, 'name': old['name']})
+        if fields:
+            self.counts['updated'] += 1
+            self._note('updated', {'id': asset_id, 'name': old['name'], 'fields': fields})
+        elif 'status' not in new:
+            self.counts['unchanged'] += 1
+        if new:
+            self.updates[asset_id] = new
+
+    def _missing(self):
+        """Count a missed run for tracked assets not in the feed; store the long gone.
+
+        Returns the state row updates for the missed assets.
+        """
+        state_updates = []
+        for asset_id, state in self.states.items():
+            old = self.assets.get(asset_id)
+            if asset_id in self.seen or old is None:
+                continue
+            missed = state['missed_runs'] + 1
+            params = {'id': state['id'], 'missed_runs': missed}
+            if (missed >= self.missed_runs and not state['stored']
+                    and old['status'] not in ('in_storage',) + FINAL_STATUSES):
+                self.updates.setdefault(asset_id, {})['status'] = 'in_storage'
+                params['stored'] = True
+                self.counts['stored'] += 1
+                self._note('stored', {'id': asset_id, 'name': old['name'], 'missed_runs': missed})
+            state_updates.append(params)
+        return state_updates
+
+    def _apply(self, run_id, state_updates):
+        """Write creates, updates, states and change log rows in bulk."""
+        audit_rows = []
+        reclassify = set()
+
+        created_ids = {}  # placeholder -> new id
+        for i in range(0, len(self.creates), WRITE_BATCH_SIZE):
+            batch = self.creates[i:i + WRITE_BATCH_SIZE]
+            for values in batch:
+                values['session_id'] = self.session_id
+                values['created_at'] = values['updated_at'] = self.now
+                values['effective_classification'] = RANK_LABELS.get(
+                    classification_rank(values.get('data_classification'))
+                )
+            ids = db.session.execute(
+                insert(Asset).returning(Asset.id, sort_by_parameter_order=True), batch
+            ).scalars().all()
+            for offset, (values, asset_id) in enumerate(zip(batch, ids)):
+                values['id'] = asset_id
+                created_ids[-(i + offset + 1)] = asset_id
+                audit_rows.append({
+                    'asset_id': asset_id,
+                    'changed_by': self.changed_by,
+                    'change_type': 'created',
+                    'notes': f'Asset "{values["name"]}" created by discovery ({self.source})',
+                    'session_id': self.session_id,
+                })
+                self._note('created', {'id': asset_id, 'name': values['name']})
+            db.session.execute(insert(AssetSnapshot), [
+                {
+                    'asset_id': values['id'],
+                    'state': {field: json_safe(values.get(field)) for field in SNAPSHOT_FIELDS},
+                    'taken_at': self.now,
+                    'session_id': self.session_id,
+                }
+                for values in batch
+            ])
+            reclassify.update(ids)
+        self.counts['created'] = len(created_ids)
+
+        params = []
+        for asset_id, new in self.updates.items():
+            old = self.assets[asset_id]
+            for field, value in new.items():
+                audit_rows.append({
+                    'asset_id': asset_id,
+                    'changed_by': self.changed_by,
+                    'change_type': 'status_change' if field == 'status' else 'updated',
+                    'field_changed': field,
+                    'old_value': audit_value(field, old[field]),
+                    'new_value': audit_value(field, value),
+                    'session_id': self.session_id,
+                })
+            if 'data_classification' in new:
+                reclassify.add(asset_id)
+            params.append({'id': asset_id, **new, 'updated_at': self.now})
+        for i in range(0, len(params), WRITE_BATCH_SIZE):
+            db.session.execute(update(Asset), params[i:i + WRITE_BATCH_SIZE])
+
+        seen_at = {'last_seen_run_id': run_id, 'last_seen_at': self.now, 'missed_runs': 0}
+        new_states = []
+        for asset_id in self.seen:
+            asset_id = created_ids.get(asset_id, asset_id)
+            state = self.states.get(asset_id)
+            if state is None:
+                new_states.append({'asset_id': asset_id, 'source': self.source, 'stored': False,
+                                   'session_id': self.session_id, **seen_at})
+            else:
+                state_updates.append({'id': state['id'], 'stored': False, **seen_at})
+        for i in range(0, len(new_states), WRITE_BATCH_SIZE):
+            db.session.execute(insert(DiscoveredAsset), new_states[i:i + WRITE_BATCH_SIZE])
+        for i in range(0, len(state_updates), WRITE_BATCH_SIZE):
+            db.session.execute(update(DiscoveredAsset), state_updates[i:i + WRITE_BATCH_SIZE])
+
+        get_audit_writer().record(audit_rows)
+        ClassificationService().propagate(self.session_id, reclassify)
+
+    def _note(self, kind, entry):
+        if len(self.report[kind]) < MAX_REPORTED:
+            self.report[kind].append(entry)
+
+
+def number_records(rows):
+    """Adapt row dicts to the ``(line, record, error)`` items ``reconcile`` reads.
+
+    Items that are not dicts yield ``(line, None, message)``, as
+    ``iter_ndjson`` does for lines that are not JSON objects.
+    """
+    for i, row in enumerate(rows):
+        line = getattr(row, 'line', None) or i + 1
+        if not isinstance(row, dict):
+            yield line, None, 'expected a JSON object'
+            continue
+        yield line, row, None
+
+
+def _identities(values):
+    """Return ``{kind: normalized key}`` for the identity keys present in ``values``."""
+    found = {}
+    for kind, names in IDENTITY_KEYS.items():
+        for name in names:
+            key = _normalize(kind, values.get(name))
+            if key:
+                found[kind] = key
+                break
+    return found
+
+
+def _same_identity(name, old, new):
+    """True if ``name`` is an identity key and both values normalize alike."""
+    kind = next((kind for kind, names in IDENTITY_KEYS.items() if names[0] == name), None)
+    return kind is not None and old is not None and _normalize(kind, old) == _normalize(kind, new)
+
+
+def _normalize(kind, value):
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    text = str(value).strip()
+    if kind == 'mac':
+        text = _MAC_SEPARATORS.sub('', text)
+    return text.casefold()
@@ -0,0 +1,359 @@
+import ast
+import json
+from datetime import date, datetime, timezone
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models.asset import Asset
+from app.models.change import AssetChange
+from app.models.location import Location
+from app.models.people import Person
+from app.models.security import SecurityBoundary
+from app.models.snapshot import AssetSnapshot
+from app.services.retention_service import archived_blocks, decode_block
+from app.errors import NotFoundError
+
+# Asset columns captured in snapshots and replayable from AssetChange rows
+SNAPSHOT_FIELDS = [
+    'id', 'asset_type', 'sub_type', 'name', 'description', 'status',
+    'data_classification', 'security_boundary_id', 'owner_id', 'managed_by_id',
+    'vendor', 'location_id', 'attributes', 'acquired_date', 'warranty_expiry',
+    'last_audit_date', 'tags', 'session_id', 'created_at', 'updated_at',
+]
+JSON_FIELDS = {'attributes', 'tags'}
+DATE_FIELDS = {'acquired_date', 'warranty_expiry', 'last_audit_date'}
+INT_FIELDS = {'security_boundary_id', 'owner_id', 'managed_by_id', 'location_id'}
+REPLAYABLE_FIELDS = set(SNAPSHOT_FIELDS) - {'id', 'session_id', 'created_at', 'updated_at'}
+
+_UNDECODABLE = object()
+
+
+def audit_value(field, value):
+    """Encode a field value for AssetChange.old_value/new_value.
+
+    JSON fields are stored as JSON and dates as ISO strings so the change log
+    can be replayed losslessly.
+    """
+    if value is None:
+        return None
+    if field in JSON_FIELDS:
+        return json.dumps(value, sort_keys=True)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def decode_audit_value(field, text):
+    """Decode an audit value into its snapshot (JSON-safe) form.
+
+    Returns ``_UNDECODABLE`` for legacy free-text values that cannot be
+    replayed (for example ``'version: 3.1'`` for attributes).
+    """
+    if text is None:
+        return None
+    try:
+        if field in JSON_FIELDS:
+            try:
+                return json.loads(text)
+            except ValueError:
+                return ast.literal_eval(text)  # changes logged before JSON encoding
+        if field in DATE_FIELDS:
+            return date.fromisoformat(text).isoformat()
+        if field in INT_FIELDS:
+            return int(text)
+    except (ValueError, SyntaxError):
+        return _UNDECODABLE
+    return text
+
+
+def _apply(state, field, value, changed_at=None):
+    state[field] = value
+    if changed_at is not None:
+        state['updated_at'] = changed_at.isoformat()
+
+
+def _merged(query, archived, reverse=False):
+    """Yield live and archived change rows in replay order with decoded values.
+
+    Rows are ``(asset_id, field, value, changed_at)``; undecodable values are
+    skipped.
+    """
+    rows = sorted(list(query) + archived, key=lambda r: (r[3], r[4]), reverse=reverse)
+    for asset_id, field, text, changed_at, _ in rows:
+        value = decode_audit_value(field, text)
+        if value is not _UNDECODABLE:
+            yield asset_id, field, value, changed_at
+
+
+def snapshot_state(asset):
+    """Return an asset's column values in JSON-safe form."""
+    state = {}
+    for field in SNAPSHOT_FIELDS:
+        value = getattr(asset, field)
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        state[field] = value
+    return state
+
+
+class HistoryService:
+    """Asset snapshots and point-in-time reconstruction."""
+
+    def snapshot(self, asset):
+        """Store a snapshot of the asset's current (flushed) state."""
+        snap = AssetSnapshot(
+            asset_id=asset.id,
+            state=snapshot_state(asset),
+            taken_at=datetime.now(timezone.utc),
+            session_id=asset.session_id,
+        )
+        db.session.add(snap)
+        return snap
+
+    def maybe_snapshot(self, asset):
+        """Snapshot the asset if enough changes accumulated since the last one.
+
+        Keeps replay cost per reconstruction below ``ASSET_SNAPSHOT_EVERY``
+        changes.
+        """
+        last_taken = db.session.query(func.max(AssetSnapshot.taken_at)).filter(
+            AssetSnapshot.asset_id == asset.id
+        ).scalar()
+        pending = db.session.query(func.count(AssetChange.id)).filter(
+            AssetChange.asset_id == asset.id
+        )
+        if last_taken is not None:
+            pending = pending.filter(AssetChange.changed_at > last_taken)
+        if last_taken is None or pending.scalar() >= current_app.config['ASSET_SNAPSHOT_EVERY']:
+            self.snapshot(asset)
+
+    def snapshot_session(self, session_id='__default__'):
+        """Snapshot every asset in a session changed since its last snapshot."""
+        last = db.session.query(
+            AssetSnapshot.asset_id, func.max(AssetSnapshot.taken_at).label('taken_at')
+        ).filter(AssetSnapshot.session_id == session_id).group_by(
+            AssetSnapshot.asset_id
+        ).subquery()
+        changed_ids = db.session.query(AssetChange.asset_id).outerjoin(
+            last, last.c.asset_id == AssetChange.asset_id
+        ).filter(
+            AssetChange.session_id == session_id,
+            db.or_(last.c.taken_at.is_(None), AssetChange.changed_at > last.c.taken_at),
+        ).distinct()
+        never = db.session.query(Asset.id).outerjoin(
+            last, last.c.asset_id == Asset.id
+        ).filter(Asset.session_id == session_id, last.c.asset_id.is_(None))
+        ids = {a for (a,) in changed_ids} | {a for (a,) in never}
+
+        assets = Asset.query.filter(Asset.session_id == session_id, Asset.id.in_(ids)).all() if ids else []
+        for asset in assets:
+            self.snapshot(asset)
+        db.session.commit()
+        return {'session_id': session_id, 'snapshots': len(assets)}
+
+    def snapshot_all_sessions(self):
+        """Run snapshot_session for every session that has assets."""
+        session_ids = [sid for (sid,) in db.session.query(Asset.session_id).distinct()]
+        return [self.snapshot_session(sid) for sid in session_ids]
+
+    def get_as_of(self, asset_id, session_id, as_of):
+        """Reconstruct one asset as it was at ``as_of`` (naive UTC datetime)."""
+        states = self._reconstruct(session_id, as_of, asset_ids=[asset_id])
+        if asset_id not in states:
+            raise NotFoundError(f'Asset with id {asset_id} did not exist at {as_of.isoformat()}')
+        return self._to_dicts([states[asset_id]], as_of)[0]
+
+    def list_as_of(self, session_id, as_of, asset_type=None, status=None,
+                   data_classification=None, search=None):
+        """Reconstruct every asset in a session at ``as_of`` and apply list filters."""
+        states = list(self._reconstruct(session_id, as_of).values())
+        if asset_type:
+            states = [s for s in states if s['asset_type'] == asset_type]
+        if status:
+            states = [s for s in states if s['status'] == status]
+        if data_classification:
+            states = [s for s in states if s['data_classification'] == data_classification]
+        if search:
+            term = search.lower()
+            states = [s for s in states if any(
+                term in (s[f] or '').lower()
+                for f in ('name', 'description', 'vendor', 'sub_type')
+            )]
+        states.sort(key=lambda s: (s['name'] or '').lower())
+        return self._to_dicts(states, as_of)
+
+    def _reconstruct(self, session_id, as_of, asset_ids=None):
+        """Return {asset_id: state} for assets that existed at ``as_of``.
+
+        Each asset starts from its latest snapshot at or before ``as_of`` and
+        replays only the changes between that snapshot and ``as_of``, so
+        replay is bounded by ``ASSET_SNAPSHOT_EVERY``. Assets with no such
+        snapshot (history from before snapshots existed) are rebuilt
+        backwards, undoing changes from their earliest later snapshot, or
+        from the current row if they have none.
+
+        ``asset_ids`` limits reconstruction to those assets; without it the
+        queries filter by session alone rather than binding every id.
+        """
+        existing = db.session.query(Asset.id).filter(
+            Asset.session_id == session_id,
+            Asset.created_at <= as_of,
+        )
+        if asset_ids is not None:
+            existing = existing.filter(Asset.id.in_(asset_ids))
+        existing = {asset_id for (asset_id,) in existing}
+        if not existing:
+            return {}
+
+        # Forward: latest snapshot at or before as_of, then replay new values
+        before = self._nearest(session_id, asset_ids, as_of, before=True)
+        states, since = self._load(before, existing)
+        replay = self._changes(session_id, asset_ids, AssetChange.new_value).join(
+            before, before.c.asset_id == AssetChange.asset_id
+        ).filter(
+            AssetChange.changed_at > before.c.taken_at,
+            AssetChange.changed_at <= as_of,
+        )
+        if since:
+            archived = self._archived(
+                session_id, asset_ids, 'new_value', min(since.values()), as_of,
+                lambda a, at: a in since and at > since[a],
+            )
+            for asset_id, field, value, changed_at in _merged(replay, archived):
+                if asset_id in states:
+                    _apply(states[asset_id], field, value, changed_at)
+
+        # Backward: earliest snapshot after as_of, then undo with old values
+        remaining = existing - set(states)
+        if remaining:
+            after = self._nearest(session_id, asset_ids, as_of, before=False)
+            later, until = self._load(after, remaining)
+            undo = self._changes(session_id, asset_ids, AssetChange.old_value).join(
+                after, after.c.asset_id == AssetChange.asset_id
+            ).filter(
+                AssetChange.changed_at > as_of,
+                AssetChange.changed_at <= after.c.taken_at,
+            )
+            if until:
+                archived = self._archived(
+                    session_id, asset_ids, 'old_value', as_of, max(until.values()),
+                    lambda a, at: a in until and at <= until[a],
+                )
+                for asset_id, field, value, _ in _merged(undo, archived, reverse=True):
+                    if asset_id in later:
+                        _apply(later[asset_id], field, value)
+            states.update(later)
+            remaining -= set(later)
+
+        # Backward from the current row for assets never snapshotted
+        if remaining:
+            rows = Asset.query.filter(Asset.session_id == session_id)
+            if asset_ids is not None:
+                rows = rows.filter(Asset.id.in_(asset_ids))
+            current = {a.id: snapshot_state(a) for a in rows if a.id in remaining}
+            undo = self._changes(session_id, asset_ids, AssetChange.old_value).filter(
+                AssetChange.changed_at > as_of,
+            )
+            archived = self._archived(
+                session_id, asset_ids, 'old_value', as_of, None,
+                lambda a, at: a in current,
+            )
+            for asset_id, field, value, _ in _merged(undo, archived, reverse=True):
+                if asset_id in current:
+                    _apply(current[asset_id], field, value)
+            states.update(current)
+
+        return states
+
+    def _nearest(self, session_id, asset_ids, as_of, before):
+        """Subquery of each asset's nearest snapshot time at/before or after ``as_of``."""
+        if before:
+            taken_at = func.max(AssetSnapshot.taken_at)
+            window = AssetSnapshot.taken_at <= as_of
+        else:
+            taken_at = func.min(AssetSnapshot.taken_at)
+            window = AssetSnapshot.taken_at > as_of
+        query = db.session.query(
+            AssetSnapshot.asset_id, taken_at.label('taken_at')
+        ).filter(AssetSnapshot.session_id == session_id, window)
+        if asset_ids is not None:
+            query = query.filter(AssetSnapshot.asset_id.in_(asset_ids))
+        return query.group_by(AssetSnapshot.asset_id).subquery()
+
+    def _load(self, nearest, wanted):
+        """Load {asset_id: state} and {asset_id: taken_at} for the snapshots in ``nearest``."""
+        rows = db.session.query(
+            AssetSnapshot.asset_id, AssetSnapshot.state, AssetSnapshot.taken_at
+        ).join(
+            nearest, db.and_(
+                nearest.c.asset_id == AssetSnapshot.asset_id,
+                nearest.c.taken_at == AssetSnapshot.taken_at,
+            )
+        )
+        states, taken = {}, {}
+        for asset_id, state, taken_at in rows:
+            if asset_id in wanted:
+                states[asset_id] = dict(state)
+                taken[asset_id] = taken_at
+        return states, taken
+
+    def _changes(self, session_id, asset_ids, value_column):
+        """Base query for replayable change rows."""
+        query = db.session.query(
+            AssetChange.asset_id, AssetChange.field_changed,
+            value_column, AssetChange.changed_at, AssetChange.id,
+        ).filter(
+            AssetChange.session_id == session_id,
+            AssetChange.field_changed.in_(REPLAYABLE_FIELDS),
+        )
+        if asset_ids is not None:
+            query = query.filter(AssetChange.asset_id.in_(list(asset_ids)))
+        return query
+
+    def _archived(self, session_id, asset_ids, value_key, after, until, keep):
+        """Return replayable archived change rows in ``(after, until]``.
+
+        ``keep(asset_id, changed_at)`` applies each asset's own bound.
+        """
+        rows = []
+        for _, _, payload in archived_blocks(session_id, asset_ids, after, until):
+            for row in decode_block(payload):
+                changed_at = row['changed_at']
+                if (row['field_changed'] in REPLAYABLE_FIELDS
+                        and changed_at > after
+                        and (until is None or changed_at <= until)
+                        and keep(row['asset_id'], changed_at)):
+                    rows.append((row['asset_id'], row['field_changed'], row[value_key],
+                                 changed_at, row['id']))
+        return rows
+
+    def _to_dicts(self, states, as_of):
+        """Render reconstructed states in the Asset.to_dict() shape."""
+        boundary_ids = {s['security_boundary_id'] for s in states} - {None}
+        person_ids = {s['owner_id'] for s in states} | {s['managed_by_id'] for s in states}
+        person_ids.discard(None)
+        location_ids = {s['location_id'] for s in states} - {None}
+        boundaries = dict(db.session.query(SecurityBoundary.id, SecurityBoundary.name).filter(
+            SecurityBoundary.id.in_(boundary_ids))) if boundary_ids else {}
+        people = dict(db.session.query(Person.id, Person.name).filter(
+            Person.id.in_(person_ids))) if person_ids else {}
+        locations = dict(db.session.query(Location.id, Location.name).filter(
+            Location.id.in_(location_ids))) if location_ids else {}
+
+        result = []
+        for s in states:
+            result.append({
+                **s,
+                'classification': s['data_classification'],
+                'security_boundary_name': boundaries.get(s['security_boundary_id']),
+                'owner_name': people.get(s['owner_id']),
+                'managed_by_name': people.get(s['managed_by_id']),
+                'location_name': locations.get(s['location_id']),
+                'effective_classification': None,  # derived; not reconstructed
+                'attributes': s['attributes'] or {},
+                'tags': s['tags'] or [],
+                'as_of': as_of.isoformat(),
+            })
+        return result
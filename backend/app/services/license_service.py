@@ -0,0 +1,487 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import case, func, select, union_all, update
+from sqlalchemy.orm import contains_eager
+from app.extensions import db
+from app.models.asset import Asset, AssetRelationship
+from app.models.license import License
+from app.audit import get_audit_writer
+from app.errors import BadRequestError
+
+RENEWAL_GROUPINGS = ('month', 'vendor')
+
+# Relationship types that consume a seat of the software asset's license.
+# Outgoing edges point from the software to the consumer (software installed_on
+# host); incoming edges point from the consumer to the software.
+SEAT_USAGE_OUTGOING = ('installed_on', 'assigned_to')
+SEAT_USAGE_INCOMING = ('licensed_under',)
+
+# Days ahead counted as "expiring soon" in the license list summary
+SUMMARY_EXPIRING_DAYS = 90
+
+# Months folded into one output period for each forecast granularity
+FORECAST_GRANULARITIES = {'month': 1, 'quarter': 3, 'year': 12}
+
+
+def period_cost_expr():
+    """SQL expression for the full cost of one billing period.
+
+    ``cost_per_period`` is a per-seat price for ``per_seat`` licenses and a
+    flat price for every other license type.
+    """
+    return case(
+        (License.license_type == 'per_seat',
+         func.coalesce(License.cost_per_period, 0) * func.coalesce(License.total_seats, 0)),
+        else_=func.coalesce(License.cost_per_period, 0),
+    )
+
+
+def monthly_cost_expr():
+    """SQL expression normalizing a license's cost to a monthly amount."""
+    return case(
+        (License.billing_period == 'annual', period_cost_expr() / 12.0),
+        else_=period_cost_expr(),
+    )
+
+
+def annual_cost_expr():
+    """SQL expression normalizing a license's cost to an annual amount."""
+    return monthly_cost_expr() * 12
+
+
+def month_bucket_expr(column):
+    """Render a date column as a ``YYYY-MM`` string for the active dialect."""
+    if db.engine.dialect.name == 'sqlite':
+        return func.strftime('%Y-%m', column)
+    return func.to_char(column, 'YYYY-MM')
+
+
+# Sortable columns for the license list, keyed by the `sort` query value
+LICENSE_SORT_COLUMNS = {
+    'expiry_date': License.expiry_date,
+    'start_date': License.start_date,
+    'vendor': License.vendor,
+    'software_name': Asset.name,
+    'license_type': License.license_type,
+    'total_seats': License.total_seats,
+    'used_seats': License.used_seats,
+    'cost_per_period': License.cost_per_period,
+    'annual_cost': annual_cost_expr(),
+    'created_at': License.created_at,
+}
+
+
+class LicenseService:
+    """Service for license listing and reporting queries."""
+
+    def find_page(self, session_id='__default__', vendor=None, license_type=None,
+                  expiring_before=None, expiring_after=None, over_utilized=False,
+                  search=None, sort='expiry_date', order='asc', page=1, per_page=50):
+        """Return one page of licenses, the filtered total and a summary.
+
+        Filtering, sorting and pagination all run in SQL. The software asset
+        is joined once and used both for sorting by name and to populate
+        ``software_asset`` so ``to_dict`` does not issue extra queries. The
+        summary aggregates every filtered license, not just the page: annual
+        cost, total and used seats, and how many expire within
+        ``SUMMARY_EXPIRING_DAYS``.
+        """
+        if sort not in LICENSE_SORT_COLUMNS:
+            raise BadRequestError(
+                f'sort must be one of: {", ".join(LICENSE_SORT_COLUMNS)}'
+            )
+        if order not in ('asc', 'desc'):
+            raise BadRequestError('order must be asc or desc')
+        if page < 1:
+            raise BadRequestError('page must be 1 or greater')
+        if per_page < 1 or per_page > 500:
+            raise BadRequestError('per_page must be between 1 and 500')
+
+        query = License.query.outerjoin(
+            Asset, Asset.id == License.software_asset_id
+        ).filter(License.session_id == session_id)
+
+        if vendor:
+            query = query.filter(License.vendor.ilike(vendor))
+        if license_type:
+            query = query.filter(License.license_type == license_type)
+        if expiring_before:
+            query = query.filter(License.expiry_date <= expiring_before)
+        if expiring_after:
+            query = query.filter(License.expiry_date >= expiring_after)
+        if over_utilized:
+            query = query.filter(License.used_seats > License.total_seats)
+        if search:
+            search_term = f'%{search}%'
+            query = query.filter(
+                db.or_(
+                    License.vendor.ilike(search_term),
+                    License.contract_number.ilike(search_term),
+                    License.notes.ilike(search_term),
+                    Asset.name.ilike(search_term),
+                )
+            )
+
+        today, cutoff = _expiry_window(SUMMARY_EXPIRING_DAYS)
+        total, annual_cost, total_seats, used_seats, expiring = query.order_by(None).with_entities(
+            func.count(License.id),
+            func.coalesce(func.sum(annual_cost_expr()), 0),
+            func.coalesce(func.sum(License.total_seats), 0),
+            func.coalesce(func.sum(License.used_seats), 0),
+            func.coalesce(func.sum(case(
+                (License.expiry_date.between(today, cutoff), 1), else_=0,
+            )), 0),
+        ).one()
+        summary = {
+            'annual_cost': round(float(annual_cost), 2),
+            'total_seats': int(total_seats),
+            'used_seats': int(used_seats),
+            'expiring_soon': int(expiring),
+        }
+
+        sort_column = LICENSE_SORT_COLUMNS[sort]
+        sort_column = sort_column.desc() if order == 'desc' else sort_column.asc()
+        licenses = query.options(contains_eager(License.software_asset)).order_by(
+            sort_column, License.id
+        ).offset((page - 1) * per_page).limit(per_page).all()
+
+        return licenses, total, summary
+
+    def expiring_query(self, session_id='__default__', within_days=180):
+        """Query for licenses expiring between today and ``within_days`` from now.
+
+        Both bounds are on ``expiry_date`` so the ``(session_id, expiry_date)``
+        index drives the scan.
+        """
+        today, cutoff = _expiry_window(within_days)
+        return License.query.filter(
+            License.session_id == session_id,
+            License.expiry_date >= today,
+            License.expiry_date <= cutoff,
+        )
+
+    def get_renewal_calendar(self, session_id='__default__', within_days=180,
+                             group_by='month'):
+        """Return renewal buckets with cost totals for upcoming expiries.
+
+        Bucket totals are aggregated in SQL; each bucket also lists its
+        licenses as a narrow column projection rather than ORM objects.
+        """
+        if group_by not in RENEWAL_GROUPINGS:
+            raise BadRequestError(
+                f'group_by must be one of: {", ".join(RENEWAL_GROUPINGS)}'
+            )
+        if within_days < 1 or within_days > 3650:
+            raise BadRequestError('within_days must be between 1 and 3650')
+
+        today, cutoff = _expiry_window(within_days)
+        filters = (
+            License.session_id == session_id,
+            License.expiry_date >= today,
+            License.expiry_date <= cutoff,
+        )
+
+        if group_by == 'month':
+            bucket = month_bucket_expr(License.expiry_date)
+        else:
+            bucket = func.coalesce(License.vendor, '')
+        bucket = bucket.label('bucket')
+        monthly_cost = monthly_cost_expr()
+        annual_cost = annual_cost_expr()
+
+        totals = db.session.query(
+            bucket,
+            func.count(License.id),
+            func.sum(func.coalesce(License.total_seats, 0)),
+            func.sum(monthly_cost),
+            func.sum(annual_cost),
+            func.sum(case((License.auto_renew.is_(True), 1), else_=0)),
+        ).filter(*filters).group_by(bucket).order_by(bucket).all()
+
+        rows = db.session.query(
+            bucket,
+            License.id,
+            License.vendor,
+            License.license_type,
+            License.total_seats,
+            License.used_seats,
+            License.billing_period,
+            License.expiry_date,
+            License.auto_renew,
+            License.software_asset_id,
+            Asset.name,
+            monthly_cost.label('monthly_cost'),
+            annual_cost.label('annual_cost'),
+        ).outerjoin(Asset, Asset.id == License.software_asset_id).filter(
+            *filters
+        ).order_by(License.expiry_date, License.id).all()
+
+        items_by_bucket = {}
+        for row in rows:
+            items_by_bucket.setdefault(row.bucket, []).append({
+                'id': row.id,
+                'software_asset_id': row.software_asset_id,
+                'software_name': row.name,
+                'vendor': row.vendor,
+                'license_type': row.license_type,
+                'total_seats': row.total_seats,
+                'used_seats': row.used_seats,
+                'billing_period': row.billing_period,
+                'expiry_date': row.expiry_date.isoformat() if row.expiry_date else None,
+                'auto_renew': bool(row.auto_renew),
+                'monthly_cost': round(float(row.monthly_cost or 0), 2),
+                'annual_cost': round(float(row.annual_cost or 0), 2),
+            })
+
+        buckets = []
+        for key, count, seats, monthly, annual, auto_renew in totals:
+            buckets.append({
+                'key': key,
+                'count': count,
+                'total_seats': int(seats or 0),
+                'monthly_cost': round(float(monthly or 0), 2),
+                'annual_cost': round(float(annual or 0), 2),
+                'auto_renew_count': int(auto_renew or 0),
+                'licenses': items_by_bucket.get(key, []),
+            })
+
+        return {
+            'group_by': group_by,
+            'within_days': within_days,
+            'from_date': today.isoformat(),
+            'to_date': cutoff.isoformat(),
+            'buckets': buckets,
+            'total_count': sum(b['count'] for b in buckets),
+            'total_monthly_cost': round(sum(b['monthly_cost'] for b in buckets), 2),
+            'total_annual_cost': round(sum(b['annual_cost'] for b in buckets), 2),
+        }
+
+    def get_forecast(self, session_id='__default__', years=3, granularity='month',
+                     seat_growth=0.0, price_uplift=0.0):
+        """Project license spend over the next ``years`` years.
+
+        The session's licenses are loaded as columns and projected as a
+        (license x month) cost matrix with NumPy. Spend is accrued monthly
+        from the SQL-normalized monthly cost. A license is active from its
+        start month until its expiry month, and indefinitely afterwards if
+        ``auto_renew`` is set. ``seat_growth`` compounds annually on
+        per-seat licenses; ``price_uplift`` compounds once per renewal that
+        falls inside the forecast window (or per year for licenses with no
+        expiry).
+        """
+        if years < 1 or years > 10:
+            raise BadRequestError('years must be between 1 and 10')
+        if granularity not in FORECAST_GRANULARITIES:
+            raise BadRequestError(
+                f'granularity must be one of: {", ".join(FORECAST_GRANULARITIES)}'
+            )
+        if seat_growth <= -1 or seat_growth > 10:
+            raise BadRequestError('seat_growth must be greater than -1 and at most 10')
+        if price_uplift <= -1 or price_uplift > 10:
+            raise BadRequestError('price_uplift must be greater than -1 and at most 10')
+
+        rows = db.session.query(
+            func.coalesce(License.vendor, ''),
+            monthly_cost_expr(),
+            License.license_type == 'per_seat',
+            License.start_date,
+            License.expiry_date,
+            func.coalesce(License.auto_renew, False),
+        ).filter(License.session_id == session_id).all()
+
+        today = datetime.now(timezone.utc).date()
+        first_month = np.datetime64(today, 'M')
+        months = years * 12
+        step = FORECAST_GRANULARITIES[granularity]
+        labels = _forecast_labels(first_month, months, step)
+
+        if not rows:
+            zeros = [0.0] * len(labels)
+            return {
+                'years': years, 'granularity': granularity,
+                'seat_growth': seat_growth, 'price_uplift': price_uplift,
+                'periods': labels, 'totals': zeros, 'total': 0.0,
+                'vendors': [], 'license_count': 0,
+            }
+
+        vendor_col, cost_col, per_seat_col, start_col, expiry_col, renew_col = zip(*rows)
+        vendors = np.array(vendor_col, dtype=object)
+        monthly_cost = np.array(cost_col, dtype=np.float64)
+        per_seat = np.array(per_seat_col, dtype=bool)
+        auto_renew = np.array(renew_col, dtype=bool)
+        start = np.array(start_col, dtype='datetime64[M]')
+        expiry = np.array(expiry_col, dtype='datetime64[M]')
+
+        # Month offsets relative to the first forecast month; NaT means open-ended
+        t = np.arange(months)
+        start_off = np.where(np.isnat(start), np.iinfo(np.int64).min,
+                             (start - first_month).astype(np.int64))
+        has_expiry = ~np.isnat(expiry)
+        expiry_off = np.where(has_expiry, (expiry - first_month).astype(np.int64), 0)
+
+        started = t[None, :] >= start_off[:, None]
+        in_term = ~has_expiry[:, None] | (t[None, :] <= expiry_off[:, None])
+        active = started & (in_term | auto_renew[:, None])
+
+        # Renewal count drives price uplift; licenses without an expiry renew yearly.
+        # Only renewals inside the window count: a lapsed auto-renew license's
+        # earlier renewals are already in its current price.
+        months_past = t[None, :] - expiry_off[:, None]
+        renewed = np.where(months_past > 0, (months_past - 1) // 12 + 1, 0)
+        before_window = np.where(-expiry_off > 1, (-expiry_off - 2) // 12 + 1, 0)
+        renewals = np.where(
+            has_expiry[:, None],
+            renewed - before_window[:, None],
+            t[None, :] // 12,
+        )
+        price_factor = np.power(1.0 + price_uplift, renewals)
+        seat_factor = np.where(
+            per_seat[:, None], np.power(1.0 + seat_growth, t[None, :] // 12), 1.0
+        )
+
+        cost = np.where(active, monthly_cost[:, None] * price_factor * seat_factor, 0.0)
+        cost = cost.reshape(len(rows), months // step, step).sum(axis=2)
+
+        vendor_keys, vendor_idx = np.unique(vendors, return_inverse=True)
+        vendor_series = np.zeros((len(vendor_keys), cost.shape[1]))
+        np.add.at(vendor_series, vendor_idx, cost)
+        totals = cost.sum(axis=0)
+
+        return {
+            'years': years,
+            'granularity': granularity,
+            'seat_growth': seat_growth,
+            'price_uplift': price_uplift,
+            'periods': labels,
+            'totals': np.round(totals, 2).tolist(),
+            'total': round(float(totals.sum()), 2),
+            'vendors': [
+                {
+                    'vendor': vendor or None,
+                    'series': np.round(series, 2).tolist(),
+                    'total': round(float(series.sum()), 2),
+                }
+                for vendor, series in zip(vendor_keys.tolist(), vendor_series)
+            ],
+            'license_count': len(rows),
+        }
+
+    def reconcile_seats(self, session_id='__default__', apply=False,
+                        changed_by='system', include_untracked=False):
+        """Compare recorded ``used_seats`` with usage in the relationship graph.
+
+        Actual usage per software asset is the number of distinct assets it
+        is installed on or assigned to, plus those licensed under it,
+        computed in one aggregate query over ``asset_relationships``. By
+        default only licenses whose software has at least one usage edge are
+        reconciled, so hand-entered counts for untracked software are left
+        alone. With ``apply`` set, all deltas are written in a single bulk
+        UPDATE and logged as ``AssetChange`` rows on the software asset.
+        """
+        usage_edges = union_all(
+            select(
+                AssetRelationship.source_asset_id.label('software_id'),
+                AssetRelationship.target_asset_id.label('consumer_id'),
+            ).where(
+                AssetRelationship.session_id == session_id,
+                AssetRelationship.relationship_type.in_(SEAT_USAGE_OUTGOING),
+            ),
+            select(
+                AssetRelationship.target_asset_id.label('software_id'),
+                AssetRelationship.source_asset_id.label('consumer_id'),
+            ).where(
+                AssetRelationship.session_id == session_id,
+                AssetRelationship.relationship_type.in_(SEAT_USAGE_INCOMING),
+            ),
+        ).subquery()
+        usage = select(
+            usage_edges.c.software_id,
+            func.count(func.distinct(usage_edges.c.consumer_id)).label('seats'),
+        ).group_by(usage_edges.c.software_id).subquery()
+
+        query = db.session.query(
+            License.id,
+            License.software_asset_id,
+            Asset.name,
+            License.vendor,
+            License.total_seats,
+            License.used_seats,
+            func.coalesce(usage.c.seats, 0).label('actual_seats'),
+        ).outerjoin(
+            usage, usage.c.software_id == License.software_asset_id
+        ).outerjoin(
+            Asset, Asset.id == License.software_asset_id
+        ).filter(
+            License.session_id == session_id,
+            License.software_asset_id.isnot(None),
+        )
+        if not include_untracked:
+            query = query.filter(usage.c.seats.isnot(None))
+        rows = query.order_by(License.id).all()
+
+        deltas = []
+        for row in rows:
+            recorded = row.used_seats or 0
+            if recorded == row.actual_seats and row.used_seats is not None:
+                continue
+            deltas.append({
+                'license_id': row.id,
+                'software_asset_id': row.software_asset_id,
+                'software_name': row.name,
+                'vendor': row.vendor,
+                'total_seats': row.total_seats,
+                'recorded_seats': row.used_seats,
+                'actual_seats': row.actual_seats,
+                'delta': row.actual_seats - recorded,
+                'over_allocated': (row.total_seats is not None
+                                   and row.actual_seats > row.total_seats),
+            })
+
+        if apply and deltas:
+            db.session.execute(
+                update(License).where(
+                    License.id.in_([d['license_id'] for d in deltas])
+                ).values(used_seats=case(
+                    {d['license_id']: d['actual_seats'] for d in deltas},
+                    value=License.id,
+                )).execution_options(synchronize_session=False)
+            )
+            get_audit_writer().record([{
+                'asset_id': d['software_asset_id'],
+                'changed_by': changed_by,
+                'change_type': 'updated',
+                'field_changed': 'used_seats',
+                'old_value': str(d['recorded_seats']) if d['recorded_seats'] is not None else None,
+                'new_value': str(d['actual_seats']),
+                'notes': f'License {d["license_id"]} seat count reconciled from relationships',
+                'session_id': session_id,
+            } for d in deltas])
+            db.session.commit()
+
+        return {
+            'session_id': session_id,
+            'checked': len(rows),
+            'mismatched': len(deltas),
+            'applied': bool(apply and deltas),
+            'deltas': deltas,
+        }
+
+    def reconcile_all_sessions(self, changed_by='scheduler'):
+        """Apply seat reconciliation to every session that has licenses."""
+        session_ids = [sid for (sid,) in db.session.query(License.session_id).distinct()]
+        return [
+            self.reconcile_seats(sid, apply=True, changed_by=changed_by)
+            for sid in session_ids
+        ]
+
+
+def _forecast_labels(first_month, months, step):
+    """Return period labels (YYYY-MM) for each forecast output period."""
+    period_starts = first_month + np.arange(0, months, step)
+    return [str(m) for m in period_starts]
+
+
+def _expiry_window(within_days):
+    """Return the (today, cutoff) date pair for an expiry horizon."""
+    today = datetime.now(timezone.utc).date()
+    return today, today + timedelta(days=within_days)
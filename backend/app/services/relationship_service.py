@@ -15,6 +15,16 @@ ASSET_TYPE_COLORS = {
     'contract': '#6366f1',      # indigo
 }
 
+# Relationship types that carry support, mapped to the end of the edge that is
+# the supporter: a server that `runs` an app supports it, software
+# `installed_on` a host supports the host, and a `depends_on` target supports
+# its source.
+SUPPORT_EDGE_TYPES = {
+    'runs': 'source',
+    'installed_on': 'source',
+    'depends_on': 'target',
+}
+
 # D3 group IDs for asset types
 ASSET_TYPE_GROUPS = {
     'hardware': 1,
@@ -149,6 +159,102 @@ class RelationshipService:
 
         return orphans
 
+    def get_cost_rollup(self, session_id='__default__', asset_id=None):
+        """Total license cost of everything that supports each system.
+
+        Builds a support graph (dependent -> supporter) from the
+        ``SUPPORT_EDGE_TYPES`` edges, condenses strongly connected components
+        so cycles are counted once, then computes the reachable supporter set
+        of every component in a single reverse-topological pass with
+        memoization. Without ``asset_id`` the result covers every top-level
+        system: assets that have supporters but support nothing themselves.
+        """
+        from app.models.license import License
+        from app.services.license_service import monthly_cost_expr
+
+        assets = {
+            row.id: row for row in db.session.query(
+                Asset.id, Asset.name, Asset.asset_type
+            ).filter(Asset.session_id == session_id)
+        }
+        if asset_id is not None and asset_id not in assets:
+            raise NotFoundError(f'Asset {asset_id} not found in graph')
+
+        G = nx.DiGraph()
+        G.add_nodes_from(assets)
+        edges = db.session.query(
+            AssetRelationship.source_asset_id,
+            AssetRelationship.target_asset_id,
+            AssetRelationship.relationship_type,
+        ).filter(
+            AssetRelationship.session_id == session_id,
+            AssetRelationship.relationship_type.in_(SUPPORT_EDGE_TYPES),
+        )
+        for source, target, rel_type in edges:
+            if source not in assets or target not in assets:
+                continue
+            if SUPPORT_EDGE_TYPES[rel_type] == 'source':
+                G.add_edge(target, source)
+            else:
+                G.add_edge(source, target)
+
+        costs = {
+            software_id: (count, float(cost_per_period or 0), float(monthly or 0))
+            for software_id, count, cost_per_period, monthly in db.session.query(
+                License.software_asset_id,
+                db.func.count(License.id),
+                db.func.sum(License.cost_per_period),
+                db.func.sum(monthly_cost_expr()),
+            ).filter(
+                License.session_id == session_id,
+                License.software_asset_id.isnot(None),
+            ).group_by(License.software_asset_id)
+        }
+
+        C = nx.condensation(G)
+        members = {c: C.nodes[c]['members'] for c in C.nodes}
+        reach = {}
+        for c in reversed(list(nx.topological_sort(C))):
+            reach[c] = set().union({c}, *(reach[s] for s in C.successors(c)))
+
+        def rollup(node_id, with_contributors=False):
+            supporters = [m for c in reach[C.graph['mapping'][node_id]] for m in members[c]]
+            licensed = [m for m in supporters if m in costs]
+            result = {
+                'asset_id': node_id,
+                'name': assets[node_id].name,
+                'asset_type': assets[node_id].asset_type,
+                'supporting_assets': len(supporters) - 1,
+                'licensed_assets': len(licensed),
+                'license_count': sum(costs[m][0] for m in licensed),
+                'cost_per_period': round(sum(costs[m][1] for m in licensed), 2),
+                'monthly_cost': round(sum(costs[m][2] for m in licensed), 2),
+                'annual_cost': round(sum(costs[m][2] for m in licensed) * 12, 2),
+            }
+            if with_contributors:
+                result['contributors'] = sorted([{
+                    'asset_id': m,
+                    'name': assets[m].name,
+                    'asset_type': assets[m].asset_type,
+                    'license_count': costs[m][0],
+                    'cost_per_period': round(costs[m][1], 2),
+                    'monthly_cost': round(costs[m][2], 2),
+                    'annual_cost': round(costs[m][2] * 12, 2),
+                } for m in licensed], key=lambda x: (-x['annual_cost'], x['name']))
+            return result
+
+        if asset_id is not None:
+            return rollup(asset_id, with_contributors=True)
+
+        top_level = [
+            m for c in C.nodes
+            if C.in_degree(c) == 0 and (C.out_degree(c) > 0 or len(members[c]) > 1)
+            for m in members[c]
+        ]
+        systems = sorted((rollup(m) for m in top_level),
+                         key=lambda x: (-x['annual_cost'], x['name']))
+        return {'systems': systems, 'count': len(systems)}
+
     def create_relationship(self, data):
         """Create a new asset relationship."""
         rel = AssetRelationship(
@@ -159,6 +265,8 @@ class RelationshipService:
             session_id=data.get('session_id', '__default__'),
         )
         db.session.add(rel)
+        db.session.flush()
+        self._propagate_classification(rel)
         db.session.commit()
         return rel
 
@@ -168,4 +276,14 @@ class RelationshipService:
         if not rel:
             raise NotFoundError(f'Relationship {rel_id} not found')
         db.session.delete(rel)
+        db.session.flush()
+        self._propagate_classification(rel)
         db.session.commit()
+
+    def _propagate_classification(self, rel):
+        """Update effective classifications after a relationship change."""
+        from app.services.classification_service import (
+            ClassificationService, PROPAGATION_EDGE_TYPES,
+        )
+        if rel.relationship_type in PROPAGATION_EDGE_TYPES:
+            ClassificationService().propagate(rel.session_id, [rel.source_asset_id])
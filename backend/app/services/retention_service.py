@@ -0,0 +1,226 @@
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import delete, insert, tuple_, update
+
+from app.extensions import db
+from app.models.change import AssetChange, AssetChangeArchive
+from app.audit import get_audit_writer
+from app.errors import BadRequestError
+
+# Change types whose successive edits to one field may be merged
+COMPACTABLE_CHANGE_TYPES = ('updated', 'status_change')
+
+ARCHIVE_COLUMNS = (
+    'id', 'asset_id', 'changed_by', 'change_type', 'field_changed',
+    'old_value', 'new_value', 'changed_at', 'notes', 'session_id',
+)
+
+# Maximum ids per DELETE statement
+_DELETE_CHUNK = 500
+
+
+class RetentionService:
+    """Moves old AssetChange rows into compressed archive blocks."""
+
+    def archive_session(self, session_id='__default__', older_than_days=None):
+        """Archive a session's changes older than ``older_than_days``.
+
+        Work is done in batches of ``CHANGE_ARCHIVE_BATCH_SIZE`` live rows,
+        each in its own short transaction, walking
+        ``(asset_id, changed_at, id)`` so a batch only ever reads one index
+        range. Rows are merged into their asset's existing block for the
+        month, so each (asset, month) has one block however many batches and
+        runs it took to archive. Within a block, successive edits to the
+        same field by the same user less than ``CHANGE_COMPACT_WINDOW``
+        seconds apart are compacted into one row (first old value, last new
+        value).
+        """
+        if older_than_days is None:
+            older_than_days = current_app.config['CHANGE_RETENTION_DAYS']
+        if older_than_days < 1:
+            raise BadRequestError('older_than_days must be 1 or greater')
+        batch_size = current_app.config['CHANGE_ARCHIVE_BATCH_SIZE']
+        window = timedelta(seconds=current_app.config['CHANGE_COMPACT_WINDOW'])
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).replace(tzinfo=None)
+
+        # Queued audit rows would otherwise land after their block was written
+        get_audit_writer().flush()
+
+        archived = blocks = written = 0
+        position = None
+        while True:
+            query = db.session.query(*(getattr(AssetChange, c) for c in ARCHIVE_COLUMNS)).filter(
+                AssetChange.session_id == session_id,
+                AssetChange.changed_at < cutoff,
+            )
+            if position is not None:
+                query = query.filter(tuple_(
+                    AssetChange.asset_id, AssetChange.changed_at, AssetChange.id
+                ) > position)
+            rows = query.order_by(
+                AssetChange.asset_id, AssetChange.changed_at, AssetChange.id
+            ).limit(batch_size).all()
+            if not rows:
+                break
+            last = rows[-1]
+            position = (last.asset_id, last.changed_at, last.id)
+
+            groups = {}
+            for row in rows:
+                month = (row.changed_at.year, row.changed_at.month)
+                groups.setdefault((row.asset_id, month), []).append(row._asdict())
+
+            existing = self._month_blocks(session_id, groups)
+            archive_rows = []
+            for key, group in groups.items():
+                blocks_for_key = existing.get(key, [])
+                source_count = len(group)
+                if blocks_for_key:
+                    for block in blocks_for_key:
+                        group.extend(decode_block(block.payload))
+                        source_count += block.source_count
+                    group.sort(key=lambda row: (row['changed_at'], row['id']))
+                compacted = compact(group, window)
+                values = {
+                    'period_start': compacted[0]['changed_at'],
+                    'period_end': compacted[-1]['changed_at'],
+                    'row_count': len(compacted),
+                    'source_count': source_count,
+                    'payload': encode_block(compacted),
+                    'archived_at': datetime.now(timezone.utc),
+                }
+                written += len(compacted) - sum(block.row_count for block in blocks_for_key)
+                if blocks_for_key:
+                    # Also folds together blocks split by earlier versions
+                    db.session.execute(update(AssetChangeArchive).where(
+                        AssetChangeArchive.id == blocks_for_key[0].id
+                    ).values(**values))
+                    db.session.execute(delete(AssetChangeArchive).where(
+                        AssetChangeArchive.id.in_([block.id for block in blocks_for_key[1:]])
+                    ))
+                else:
+                    archive_rows.append(dict(values, asset_id=key[0], session_id=session_id))
+                    blocks += 1
+            if archive_rows:
+                db.session.execute(insert(AssetChangeArchive), archive_rows)
+
+            ids = [row.id for row in rows]
+            for i in range(0, len(ids), _DELETE_CHUNK):
+                db.session.execute(delete(AssetChange).where(
+                    AssetChange.id.in_(ids[i:i + _DELETE_CHUNK])
+                ))
+            db.session.commit()
+
+            archived += len(rows)
+            if len(rows) < batch_size:
+                break
+
+        return {
+            'session_id': session_id,
+            'cutoff': cutoff.isoformat(),
+            'archived': archived,
+            'written': written,
+            'blocks': blocks,
+        }
+
+    def _month_blocks(self, session_id, groups):
+        """Return the existing blocks for a batch's (asset_id, month) keys."""
+        asset_ids = {asset_id for asset_id, _ in groups}
+        first_month = min(month for _, month in groups)
+        blocks = {}
+        for block in db.session.query(
+            AssetChangeArchive.id, AssetChangeArchive.asset_id,
+            AssetChangeArchive.period_start, AssetChangeArchive.row_count,
+            AssetChangeArchive.source_count, AssetChangeArchive.payload,
+        ).filter(
+            AssetChangeArchive.session_id == session_id,
+            AssetChangeArchive.asset_id.in_(asset_ids),
+            AssetChangeArchive.period_start >= datetime(*first_month, 1),
+        ).order_by(AssetChangeArchive.id):
+            key = (block.asset_id, (block.period_start.year, block.period_start.month))
+            if key in groups:
+                blocks.setdefault(key, []).append(block)
+        return blocks
+
+    def archive_all_sessions(self):
+        """Run archive_session for every session with changes."""
+        session_ids = [sid for (sid,) in db.session.query(AssetChange.session_id).distinct()]
+        return [self.archive_session(sid) for sid in session_ids]
+
+
+def compact(rows, window):
+    """Merge successive same-field edits in ``rows`` (sorted by changed_at, id).
+
+    An edit is merged into the previous edit of the same field when both
+    have the same change type and author and are less than ``window`` apart.
+    The merged row keeps the later row's id and time and records how many
+    rows it replaces in ``compacted`` (rows from an existing block keep
+    their count).
+    """
+    rows = [dict(row, compacted=row.get('compacted', 1)) for row in rows]
+    if not window:
+        return rows
+    result = []
+    latest = {}  # field -> index in result of its most recent edit
+    for row in rows:
+        field = row['field_changed']
+        prev_index = latest.get(field)
+        if (field and row['change_type'] in COMPACTABLE_CHANGE_TYPES
+                and prev_index is not None):
+            prev = result[prev_index]
+            if (prev['change_type'] == row['change_type']
+                    and prev['changed_by'] == row['changed_by']
+                    and row['changed_at'] - prev['changed_at'] < window):
+                # Move the merged row to this row's position in the sequence
+                result[prev_index] = None
+                row['old_value'] = prev['old_value']
+                row['compacted'] += prev['compacted']
+        latest[field] = len(result)
+        result.append(row)
+    return [row for row in result if row is not None]
+
+
+def encode_block(rows):
+    """Compress rows into an archive payload."""
+    data = [
+        dict(row, changed_at=row['changed_at'].isoformat() if row['changed_at'] else None)
+        for row in rows
+    ]
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_block(payload):
+    """Decompress an archive payload into row dicts with datetime changed_at."""
+    rows = json.loads(zlib.decompress(payload))
+    for row in rows:
+        if row['changed_at']:
+            row['changed_at'] = datetime.fromisoformat(row['changed_at'])
+    return rows
+
+
+def archived_blocks(session_id, asset_ids=None, since=None, until=None, newest_first=True):
+    """Yield archive blocks overlapping ``[since, until]``.
+
+    Blocks are ordered by ``period_end`` (newest first by default). Each item
+    is ``(period_start, period_end, payload)``; callers decompress with
+    :func:`decode_block` only the blocks they need.
+    """
+    query = db.session.query(
+        AssetChangeArchive.period_start, AssetChangeArchive.period_end,
+        AssetChangeArchive.payload,
+    ).filter(AssetChangeArchive.session_id == session_id)
+    if asset_ids is not None:
+        query = query.filter(AssetChangeArchive.asset_id.in_(list(asset_ids)))
+    if since is not None:
+        query = query.filter(AssetChangeArchive.period_end >= since)
+    if until is not None:
+        query = query.filter(AssetChangeArchive.period_start <= until)
+    if newest_first:
+        query = query.order_by(AssetChangeArchive.period_end.desc(), AssetChangeArchive.id.desc())
+    else:
+        query = query.order_by(AssetChangeArchive.period_start, AssetChangeArchive.id)
+    for period_start, period_end, payload in query.yield_per(100):
+        yield period_start, period_end, payload
@@ -0,0 +1,316 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import networkx as nx
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import aliased
+
+from app.extensions import db
+from app.models.asset import Asset, AssetRelationship
+from app.models.security import SecurityBoundary
+from app.errors import BadRequestError
+
+# Asset fields that map straight to a column and can be selected without
+# loading the ORM object and its joined relationships
+ASSET_COLUMN_FIELDS = {c.name: c for c in Asset.__table__.columns}
+ASSET_COLUMN_FIELDS['classification'] = Asset.__table__.c.data_classification
+
+# Fields only available through Asset.to_dict() (joined relationship names)
+ASSET_DERIVED_FIELDS = {
+    'security_boundary_name', 'owner_name', 'managed_by_name', 'location_name',
+}
+
+# Relative sensitivity of data classifications (compared case-insensitively)
+CLASSIFICATION_RANK = {'cui': 3, 'fci': 2, 'internal': 1, 'public': 0}
+
+VIOLATION_KINDS = ('boundary_crossing', 'classification_downgrade', 'transitive_crossing')
+
+# Scan results keyed by (session_id, transitive, max_depth); each entry holds
+# the session version it was computed for. Bounded LRU, per process.
+_SCAN_CACHE_SIZE = 32
+_scan_cache = OrderedDict()
+_scan_cache_lock = threading.Lock()
+
+
+def table_version(model, session_id):
+    """Return a cheap fingerprint of a session's rows in one table.
+
+    The count catches deletes and max ``created_at`` catches inserts, even
+    where SQLite reuses the id of a deleted newest row; max ``updated_at``
+    (on tables that have it) catches edits.
+    """
+    columns = [func.count(model.id), func.max(model.id)]
+    for name in ('created_at', 'updated_at'):
+        if hasattr(model, name):
+            columns.append(func.max(getattr(model, name)))
+    return '|'.join(str(v) for v in db.session.query(*columns).filter(
+        model.session_id == session_id
+    ).one())
+
+
+def session_version(session_id):
+    """Return a cheap fingerprint of a session's assets, relationships and boundaries.
+
+    Any change to the graph or to classification/boundary data yields a new
+    version.
+    """
+    return '/'.join(
+        table_version(model, session_id)
+        for model in (Asset, AssetRelationship, SecurityBoundary)
+    )
+
+
+class SecurityService:
+    """Service for security boundary reporting queries."""
+
+    def get_boundary_stats(self, session_id='__default__'):
+        """Return asset counts by classification, status and type per boundary.
+
+        One grouped query over ``assets`` provides every breakdown; the
+        result maps boundary id to its stats.
+        """
+        rows = db.session.query(
+            Asset.security_boundary_id,
+            Asset.data_classification,
+            Asset.status,
+            Asset.asset_type,
+            db.func.count(Asset.id),
+        ).filter(
+            Asset.session_id == session_id,
+            Asset.security_boundary_id.isnot(None),
+        ).group_by(
+            Asset.security_boundary_id,
+            Asset.data_classification,
+            Asset.status,
+            Asset.asset_type,
+        ).all()
+
+        stats = {}
+        for boundary_id, classification, status, asset_type, count in rows:
+            entry = stats.setdefault(boundary_id, {
+                'asset_count': 0,
+                'by_classification': {},
+                'by_status': {},
+                'by_type': {},
+            })
+            entry['asset_count'] += count
+            for key, value in (('by_classification', classification),
+                               ('by_status', status),
+                               ('by_type', asset_type)):
+                label = value or 'unspecified'
+                entry[key][label] = entry[key].get(label, 0) + count
+        return stats
+
+    def get_boundary_assets(self, boundary_id, session_id='__default__',
+                            page=1, per_page=50, fields=None):
+        """Return one page of a boundary's assets and the total count.
+
+        When every requested field is a plain column the page is read as a
+        narrow column select; otherwise full ``to_dict()`` output is trimmed
+        to the requested fields.
+        """
+        if page < 1:
+            raise BadRequestError('page must be 1 or greater')
+        if per_page < 1 or per_page > 500:
+            raise BadRequestError('per_page must be between 1 and 500')
+        if fields:
+            unknown = [f for f in fields
+                       if f not in ASSET_COLUMN_FIELDS and f not in ASSET_DERIVED_FIELDS]
+            if unknown:
+                raise BadRequestError(f'Unknown fields: {", ".join(unknown)}')
+
+        filters = (
+            Asset.security_boundary_id == boundary_id,
+            Asset.session_id == session_id,
+        )
+        total = db.session.query(db.func.count(Asset.id)).filter(*filters).scalar()
+        offset = (page - 1) * per_page
+
+        if fields and not any(f in ASSET_DERIVED_FIELDS for f in fields):
+            columns = [ASSET_COLUMN_FIELDS[f].label(f) for f in fields]
+            rows = db.session.query(*columns).filter(*filters).order_by(
+                Asset.name, Asset.id
+            ).offset(offset).limit(per_page).all()
+            assets = [
+                {f: _serialize(f, getattr(row, f)) for f in fields}
+                for row in rows
+            ]
+        else:
+            rows = Asset.query.filter(*filters).order_by(
+                Asset.name, Asset.id
+            ).offset(offset).limit(per_page).all()
+            assets = [a.to_dict() for a in rows]
+            if fields:
+                assets = [{f: a[f] for f in fields} for a in assets]
+
+        return assets, total
+
+    def scan_violations(self, session_id='__default__', transitive=False, max_depth=5):
+        """Find relationships that break CUI boundary or classification rules.
+
+        Direct violations come from one join of ``asset_relationships``
+        against both endpoint assets and their boundaries:
+
+        - ``boundary_crossing``: a CUI asset is related to an asset that is
+          not inside a ``cui_boundary``.
+        - ``classification_downgrade``: the source asset carries a more
+          sensitive classification than the target.
+
+        With ``transitive`` set, CUI assets are also followed along outgoing
+        edges up to ``max_depth`` hops, and any reached asset outside a CUI
+        boundary that is not already a direct neighbour is reported as a
+        ``transitive_crossing``.
+
+        Results are cached per session version, so repeated report pages do
+        not rescan until the session's assets or relationships change.
+        """
+        if max_depth < 2 or max_depth > 10:
+            raise BadRequestError('max_depth must be between 2 and 10')
+
+        version = session_version(session_id)
+        key = (session_id, bool(transitive), max_depth if transitive else None)
+        with _scan_cache_lock:
+            cached = _scan_cache.get(key)
+            if cached and cached['version'] == version:
+                _scan_cache.move_to_end(key)
+                return dict(cached, cached=True)
+
+        violations = self._scan_direct(session_id)
+        if transitive:
+            violations.extend(self._scan_transitive(session_id, max_depth))
+
+        summary = {kind: 0 for kind in VIOLATION_KINDS}
+        for v in violations:
+            for kind in v['kinds']:
+                summary[kind] += 1
+
+        result = {
+            'session_id': session_id,
+            'version': version,
+            'scanned_at': datetime.now(timezone.utc).isoformat(),
+            'transitive': bool(transitive),
+            'summary': summary,
+            'violations': violations,
+        }
+        with _scan_cache_lock:
+            _scan_cache[key] = result
+            _scan_cache.move_to_end(key)
+            while len(_scan_cache) > _SCAN_CACHE_SIZE:
+                _scan_cache.popitem(last=False)
+        return dict(result, cached=False)
+
+    def _scan_direct(self, session_id):
+        """Return direct boundary-crossing and downgrade edges in one query."""
+        src = aliased(Asset)
+        tgt = aliased(Asset)
+        src_b = aliased(SecurityBoundary)
+        tgt_b = aliased(SecurityBoundary)
+
+        src_cui = func.upper(src.data_classification) == 'CUI'
+        tgt_cui = func.upper(tgt.data_classification) == 'CUI'
+        src_in_cui = func.coalesce(src_b.boundary_type, '') == 'cui_boundary'
+        tgt_in_cui = func.coalesce(tgt_b.boundary_type, '') == 'cui_boundary'
+        crossing = or_(and_(src_cui, ~tgt_in_cui), and_(tgt_cui, ~src_in_cui))
+        downgrade = _rank_expr(src.data_classification) > _rank_expr(tgt.data_classification)
+
+        rows = db.session.query(
+            AssetRelationship.id,
+            AssetRelationship.relationship_type,
+            src.id, src.name, src.data_classification,
+            src.security_boundary_id, src_b.name, src_b.boundary_type,
+            tgt.id, tgt.name, tgt.data_classification,
+            tgt.security_boundary_id, tgt_b.name, tgt_b.boundary_type,
+            crossing.label('crossing'),
+            downgrade.label('downgrade'),
+        ).join(
+            src, src.id == AssetRelationship.source_asset_id
+        ).join(
+            tgt, tgt.id == AssetRelationship.target_asset_id
+        ).outerjoin(
+            src_b, src_b.id == src.security_boundary_id
+        ).outerjoin(
+            tgt_b, tgt_b.id == tgt.security_boundary_id
+        ).filter(
+            AssetRelationship.session_id == session_id,
+            or_(crossing, downgrade),
+        ).order_by(AssetRelationship.id).all()
+
+        violations = []
+        for row in rows:
+            kinds = []
+            if row.crossing:
+                kinds.append('boundary_crossing')
+            if row.downgrade:
+                kinds.append('classification_downgrade')
+            violations.append({
+                'kinds': kinds,
+                'relationship_id': row[0],
+                'relationship_type': row[1],
+                'depth': 1,
+                'source': _endpoint(*row[2:8]),
+                'target': _endpoint(*row[8:14]),
+            })
+        return violations
+
+    def _scan_transitive(self, session_id, max_depth):
+        """Return CUI assets that reach non-CUI-boundary assets over several hops."""
+        assets = {
+            row[0]: row for row in db.session.query(
+                Asset.id, Asset.name, Asset.data_classification,
+                Asset.security_boundary_id, SecurityBoundary.name,
+                SecurityBoundary.boundary_type,
+            ).outerjoin(
+                SecurityBoundary, SecurityBoundary.id == Asset.security_boundary_id
+            ).filter(Asset.session_id == session_id)
+        }
+        G = nx.DiGraph()
+        G.add_nodes_from(assets)
+        G.add_edges_from(db.session.query(
+            AssetRelationship.source_asset_id, AssetRelationship.target_asset_id
+        ).filter(AssetRelationship.session_id == session_id))
+
+        violations = []
+        for asset_id, row in assets.items():
+            if (row[2] or '').upper() != 'CUI':
+                continue
+            lengths = nx.single_source_shortest_path_length(G, asset_id, cutoff=max_depth)
+            for reached, depth in sorted(lengths.items(), key=lambda x: (x[1], x[0])):
+                if depth < 2 or reached not in assets:
+                    continue
+                if assets[reached][5] == 'cui_boundary':
+                    continue
+                violations.append({
+                    'kinds': ['transitive_crossing'],
+                    'relationship_id': None,
+                    'relationship_type': None,
+                    'depth': depth,
+                    'source': _endpoint(*row),
+                    'target': _endpoint(*assets[reached]),
+                })
+        return violations
+
+
+def _rank_expr(column):
+    """SQL expression mapping a classification to its sensitivity rank."""
+    return case(CLASSIFICATION_RANK, value=func.lower(column), else_=None)
+
+
+def _endpoint(asset_id, name, classification, boundary_id, boundary_name, boundary_type):
+    return {
+        'id': asset_id,
+        'name': name,
+        'data_classification': classification,
+        'security_boundary_id': boundary_id,
+        'security_boundary_name': boundary_name,
+        'boundary_type': boundary_type,
+    }
+
+
+def _serialize(field, value):
+    """Render a column value the same way Asset.to_dict() does."""
+    if value is None:
+        return {'attributes': {}, 'tags': []}.get(field)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
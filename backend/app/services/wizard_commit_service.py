@@ -0,0 +1,856 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import delete, insert, or_, select, update
+
+from app.extensions import db
+from app.audit import get_audit_writer
+from app.models.asset import Asset, AssetRelationship
+from app.models.change import AssetChange, AssetChangeArchive
+from app.models.discovery import DiscoveredAsset
+from app.models.license import License
+from app.models.location import Location
+from app.models.people import Person
+from app.models.security import SecurityBoundary
+from app.models.snapshot import AssetSnapshot
+from app.models.wizard_import import WizardSession
+from app.services.classification_service import (
+    ClassificationService, PROPAGATION_EDGE_TYPES, RANK_LABELS, classification_rank,
+)
+from app.services.history_service import SNAPSHOT_FIELDS, audit_value
+from app.services.security_service import table_version
+from app.services.wizard_schema import ENTITY_COLUMNS, EntitySchema, coerce, convert_row, json_safe
+from app.services.wizard_service import ENTITY_TYPES
+from app.services.wizard_staging import delete_staged, iter_staged, staged_counts, staged_version
+from app.errors import BadRequestError, NotFoundError
+
+# Entity types in the order they are promoted; later types reference earlier ones
+COMMIT_ORDER = ('people', 'locations', 'security_boundaries', 'assets', 'licenses', 'relationships')
+
+ENTITY_MODELS = {
+    'people': Person,
+    'locations': Location,
+    'security_boundaries': SecurityBoundary,
+    'assets': Asset,
+    'licenses': License,
+    'relationships': AssetRelationship,
+}
+
+# Columns identifying an existing row in upsert mode, per entity type
+NATURAL_KEYS = {
+    'people': ('email',),
+    'locations': ('name',),
+    'security_boundaries': ('name',),
+    'assets': ('name', 'asset_type'),
+    'licenses': ('contract_number',),
+    'relationships': ('source_asset_id', 'target_asset_id', 'relationship_type'),
+}
+
+COMMIT_MODES = ('insert', 'upsert')
+
+# Asset columns cleared when the row they reference is deleted
+ASSET_REFERENCES = {
+    'people': ('owner_id', 'managed_by_id'),
+    'locations': ('location_id',),
+    'security_boundaries': ('security_boundary_id',),
+}
+
+# Columns never compared or overwritten by an upsert
+_MANAGED_COLUMNS = ('id', 'session_id', 'created_at', 'updated_at', 'effective_classification')
+
+# Row errors kept per entity type in the summary
+MAX_REPORTED_ERRORS = 20
+
+# Rows per bulk INSERT/UPDATE
+COMMIT_BATCH_SIZE = 1000
+
+# Maximum ids per DELETE statement
+_DELETE_CHUNK = 500
+
+DIFF_ACTIONS = ('new', 'changed', 'missing', 'duplicate', 'skipped')
+
+# Dry-run diffs keyed by (session_id, target_session_id, natural keys); each
+# entry holds the staged and live versions it was computed for. Bounded LRU,
+# per process.
+_DIFF_CACHE_SIZE = 8
+_diff_cache = OrderedDict()
+_diff_cache_lock = threading.Lock()
+
+
+class WizardCommitService:
+    """Promotes a wizard session's staged rows into the live tables."""
+
+    def commit(self, session_id, target_session_id='__default__', changed_by='wizard',
+               mode='insert', natural_keys=None, delete_missing=False):
+        """Write every staged entity type into the live tables in one transaction.
+
+        Entity types are promoted in ``COMMIT_ORDER`` with bulk statements.
+        Asset names referenced by licenses and relationships are resolved
+        through a name -> id hash index built once from the target session's
+        assets and extended with the assets written by this commit (which
+        win over existing assets of the same name). Rows with unresolvable
+        references or unparseable values are skipped and reported.
+
+        In ``insert`` mode every row is inserted. In ``upsert`` mode rows are
+        matched against existing rows on their natural key (``NATURAL_KEYS``,
+        overridable per entity type with ``natural_keys``; string parts
+        compare case-insensitively): matches are updated in place, asset
+        field changes are recorded in the change log, and other rows are
+        inserted. A key repeated within the upload updates the row written
+        for its first occurrence. With ``delete_missing``, existing rows of
+        each staged entity type that the upload did not match are deleted.
+        Staged rows are removed once the commit succeeds.
+        """
+        if mode not in COMMIT_MODES:
+            raise BadRequestError(f'mode must be one of: {", ".join(COMMIT_MODES)}')
+        if delete_missing and mode != 'upsert':
+            raise BadRequestError('delete_missing requires upsert mode')
+        keys = _resolve_keys(natural_keys) if mode == 'upsert' else None
+
+        ws = WizardSession.query.filter_by(session_id=session_id).first()
+        if not ws:
+            raise NotFoundError('Session not found')
+
+        started = time.perf_counter()
+        run = _CommitRun(session_id, target_session_id, changed_by, keys)
+        try:
+            summary = run.execute(delete_missing)
+            delete_staged(session_id)
+            ws.updated_at = run.now
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        totals = {
+            field: sum(r[field] for r in summary.values())
+            for field in ('inserted', 'updated', 'unchanged', 'deleted', 'skipped')
+        }
+        message = f'Committed {totals["inserted"]} new records'
+        if mode == 'upsert':
+            message += f', updated {totals["updated"]}, deleted {totals["deleted"]}'
+        return {
+            'message': message,
+            'session_id': session_id,
+            'target_session_id': target_session_id,
+            'mode': mode,
+            'entities': summary,
+            **totals,
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+        }
+
+
+    def dry_run(self, session_id, target_session_id='__default__', natural_keys=None):
+        """Diff a session's staged rows against the live tables without writing.
+
+        Reports what an upsert commit would do: per entity type, the rows
+        that would be inserted (``new``), updated (``changed``, with
+        per-field old and new values) or left ``unchanged``, existing rows
+        the upload does not match (``missing``; deleted by a commit with
+        ``delete_missing``), rows repeating an earlier row's natural key
+        (``duplicate``) and rows that would be ``skipped``.
+
+        Each entity type is one hash join: the target session's rows are
+        loaded once into a natural key -> row index and every staged row
+        is probed against it. Results are cached per staged and live
+        version, so paging through a diff does not recompute it until the
+        upload or the target inventory changes.
+        """
+        keys = _resolve_keys(natural_keys)
+        ws = WizardSession.query.filter_by(session_id=session_id).first()
+        if not ws:
+            raise NotFoundError('Session not found')
+
+        version = f'{staged_version(session_id)}/{_live_version(target_session_id)}'
+        cache_key = (session_id, target_session_id, tuple(sorted(keys.items())))
+        with _diff_cache_lock:
+            cached = _diff_cache.get(cache_key)
+            if cached and cached['version'] == version:
+                _diff_cache.move_to_end(cache_key)
+                return dict(cached, cached=True)
+
+        started = time.perf_counter()
+        summary, entries = _DiffRun(session_id, target_session_id, keys).execute()
+        invalid = staged_counts(session_id, invalid=True)
+        for entity_type, result in summary.items():
+            result['invalid'] = invalid.get(entity_type, 0)
+        totals = {
+            field: sum(r[field] for r in summary.values())
+            for field in ('new', 'changed', 'unchanged', 'missing', 'duplicate', 'skipped')
+        }
+        result = {
+            'message': (f'{totals["new"]:,} new, {totals["changed"]:,} changed, '
+                        f'{totals["missing"]:,} would be deleted'),
+            'session_id': session_id,
+            'target_session_id': target_session_id,
+            'natural_keys': {entity_type: list(columns) for entity_type, columns in keys.items()},
+            'entities': summary,
+            **totals,
+            'entries': entries,
+            'version': version,
+            'computed_at': datetime.now(timezone.utc).isoformat(),
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+        }
+        with _diff_cache_lock:
+            _diff_cache[cache_key] = result
+            _diff_cache.move_to_end(cache_key)
+            while len(_diff_cache) > _DIFF_CACHE_SIZE:
+                _diff_cache.popitem(last=False)
+        return dict(result, cached=False)
+
+    @staticmethod
+    def diff_page(diff, entity_type=None, action=None, page=1, per_page=50):
+        """Return ``(entries, total)``: one page of a dry run's entries as dicts.
+
+        ``entity_type`` and ``action`` filter the entries before paging.
+        """
+        entries = [
+            entry for entry in diff['entries']
+            if (entity_type is None or entry[0] == entity_type)
+            and (action is None or entry[1] == action)
+        ]
+        start = (page - 1) * per_page
+        return [_entry_dict(entry) for entry in entries[start:start + per_page]], len(entries)
+
+    def ingest(self, entity_type, records, target_session_id='__default__', changed_by='ingest',
+               natural_key=None, chunk_size=None):
+        """Validate and upsert a feed of records, one chunk at a time.
+
+        ``records`` yields ``(line, record, error)`` as ``iter_ndjson`` does
+        and is read lazily. Arguments are checked before anything is read;
+        the returned generator then takes ``chunk_size`` records at a time
+        (``WIZARD_INGEST_CHUNK_SIZE`` by default), validates them with the
+        entity type's schema, upserts the valid ones on their natural key
+        (``natural_key`` overrides ``NATURAL_KEYS``) exactly as an upsert
+        commit does, commits, and yields the chunk's result.
+
+        The natural key index and asset names are loaded once per feed;
+        beyond them (which grow only by the rows inserted) just one chunk is
+        held, so memory stays flat however long the feed is. The last item
+        carries ``done`` and the totals. A database
+        error rolls back the current chunk and ends the feed with an
+        ``error`` item; earlier chunks stay committed.
+        """
+        if entity_type not in ENTITY_MODELS:
+            raise NotFoundError(f'Unknown entity type: {entity_type}')
+        keys = _resolve_keys({entity_type: natural_key} if natural_key else None)
+        chunk_size = chunk_size or current_app.config['WIZARD_INGEST_CHUNK_SIZE']
+        spec = ENTITY_TYPES[entity_type]
+        schema = EntitySchema(entity_type, spec.get('required', ()), spec.get('enums'))
+        run = _CommitRun(None, target_session_id, changed_by, keys)
+        return self._ingest_chunks(run, entity_type, schema, iter(records), chunk_size)
+
+    def _ingest_chunks(self, run, entity_type, schema, records, chunk_size):
+        started = time.perf_counter()
+        totals = {field: 0 for field in ('received', 'invalid', 'inserted', 'updated',
+                                         'unchanged', 'skipped')}
+        number = 0
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            number += 1
+            result = {
+                'chunk': number,
+                'first_line': chunk[0][0],
+                'last_line': chunk[-1][0],
+                'received': len(chunk),
+                'invalid': 0,
+                'errors': [],
+            }
+            rows = []
+            for line, record, error in chunk:
+                if error is None:
+                    values, row_errors = schema.validate(line, record)
+                    if not row_errors:
+                        rows.append((line - 1, values, None))
+                        continue
+                    error = row_errors[0]
+                else:
+                    error = f'Line {line}: {error}'
+                result['invalid'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append(str(error))
+
+            run.now = datetime.now(timezone.utc)
+            try:
+                promoted = run._promote(entity_type, rows)
+                run.finish()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                yield dict(result, error=f'Chunk {number} rolled back: {e}')
+                return
+            result['errors'].extend(promoted['errors'][:MAX_REPORTED_ERRORS - len(result['errors'])])
+            for field in ('inserted', 'updated', 'unchanged', 'skipped'):
+                result[field] = promoted[field]
+            for field in totals:
+                totals[field] += result[field]
+            yield result
+
+        yield {
+            'done': True,
+            'entity_type': entity_type,
+            'target_session_id': run.target,
+            'chunks': number,
+            **totals,
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+        }
+
+
+class _CommitRun:
+    """Indexes, pending batches and deferred work of a single commit."""
+
+    def __init__(self, session_id, target_session_id, changed_by, keys):
+        self.session_id = session_id
+        self.target = target_session_id
+        self.changed_by = changed_by
+        self.keys = keys
+        self.now = datetime.now(timezone.utc)
+        self.asset_index = {}
+        for name, asset_id in db.session.query(Asset.name, Asset.id).filter(
+            Asset.session_id == target_session_id
+        ).order_by(Asset.id.desc()):  # lowest id wins among duplicate names
+            self.asset_index[_name_key(name)] = asset_id
+        self.new_assets = {}  # id -> name
+        self.reclassify = set()
+        self.seen = {}  # entity type -> ids matched or inserted
+        self.indexes = {}  # entity type -> natural key -> id
+
+    def execute(self, delete_missing):
+        """Promote every entity type; returns the per-type summary."""
+        summary = {}
+        for entity_type in COMMIT_ORDER:
+            result = self._promote(entity_type)
+            if result['staged']:
+                summary[entity_type] = result
+
+        if delete_missing:
+            for entity_type in reversed(COMMIT_ORDER):
+                if entity_type in summary:
+                    summary[entity_type]['deleted'] = self._delete_missing(entity_type)
+        self.finish()
+        return summary
+
+    def finish(self):
+        """Log created assets and propagate classifications of the rows written."""
+        if self.new_assets:
+            get_audit_writer().record([
+                {
+                    'asset_id': asset_id,
+                    'changed_by': self.changed_by,
+                    'change_type': 'created',
+                    'notes': f'Asset "{name}" created by wizard import',
+                    'session_id': self.target,
+                }
+                for asset_id, name in self.new_assets.items()
+            ])
+        ClassificationService().propagate(self.target, set(self.new_assets) | self.reclassify)
+        self.new_assets.clear()
+        self.reclassify.clear()
+
+    def _promote(self, entity_type, rows=None):
+        """Write ``(row_index, row_data, errors)`` rows, by default the staged ones."""
+        columns = ENTITY_COLUMNS[entity_type]
+        model = ENTITY_MODELS[entity_type]
+        key_columns = self.keys[entity_type] if self.keys else None
+        result = {'staged': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0,
+                  'deleted': 0, 'skipped': 0, 'errors': []}
+        index = None
+        if key_columns:
+            index = self.indexes.get(entity_type)
+            if index is None:
+                index = self.indexes[entity_type] = self._key_index(model, key_columns)
+        seen = self.seen[entity_type] = set()
+        inserts = []
+        updates = {}  # existing id -> values
+        pending = set()  # natural keys of pending inserts
+
+        def flush():
+            if inserts:
+                ids = self._insert(model, entity_type, inserts)
+                result['inserted'] += len(ids)
+                seen.update(ids)
+                if index is not None:
+                    for values, row_id in zip(inserts, ids):
+                        index[_natural_key(values, key_columns)] = row_id
+            if updates:
+                updated = self._update(model, entity_type, updates)
+                result['updated'] += updated
+                result['unchanged'] += len(updates) - updated
+            inserts.clear()
+            updates.clear()
+            pending.clear()
+
+        if rows is None:
+            rows = iter_staged(self.session_id, entity_type, COMMIT_BATCH_SIZE, valid_only=True)
+        for row_index, row_data, _ in rows:
+            result['staged'] += 1
+            values, error = _convert(columns, row_data, self.asset_index, entity_type)
+            key = None
+            if not error and key_columns:
+                key = _natural_key(values, key_columns)
+                if key is None:
+                    error = f'missing natural key ({", ".join(key_columns)})'
+            if error:
+                result['skipped'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append(f'Row {row_index + 1}: {error}')
+                continue
+
+            values['session_id'] = self.target
+            values['created_at'] = self.now
+            if hasattr(model, 'updated_at'):
+                values['updated_at'] = self.now
+            if key is None:
+                inserts.append(values)
+            else:
+                if key in pending or index.get(key) in updates:
+                    flush()  # repeated key: apply the earlier row first
+                existing_id = index.get(key)
+                if existing_id is None:
+                    inserts.append(values)
+                    pending.add(key)
+                else:
+                    updates[existing_id] = values
+                    seen.add(existing_id)
+            if len(inserts) + len(updates) >= COMMIT_BATCH_SIZE:
+                flush()
+        flush()
+        return result
+
+    def _key_index(self, model, key_columns):
+        """Load natural key -> id for the target session's existing rows."""
+        query = db.session.query(model.id, *(getattr(model, c) for c in key_columns)).filter(
+            model.session_id == self.target
+        ).order_by(model.id.desc())  # lowest id wins among duplicate keys
+        index = {}
+        for row_id, *parts in query.yield_per(COMMIT_BATCH_SIZE):
+            key = _normalize_key(parts)
+            if key is not None:
+                index[key] = row_id
+        return index
+
+    def _insert(self, model, entity_type, batch):
+        """Bulk-insert one batch; returns the new ids in batch order."""
+        if entity_type == 'assets':
+            for values in batch:
+                if values.get('status') is None:  # a feed's null must not bypass the default
+                    values['status'] = 'active'
+                values['effective_classification'] = RANK_LABELS.get(
+                    classification_rank(values.get('data_classification'))
+                )
+        ids = db.session.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True), batch
+        ).scalars().all()
+        if entity_type == 'assets':
+            for values, asset_id in zip(batch, ids):
+                self.asset_index[_name_key(values['name'])] = asset_id
+                self.new_assets[asset_id] = values['name']
+                values['id'] = asset_id
+            self._snapshot_assets(batch)
+        elif entity_type == 'relationships':
+            self.reclassify.update(values['source_asset_id'] for values in batch)
+        return ids
+
+    def _update(self, model, entity_type, updates):
+        """Bulk-update rows whose values differ; returns the number changed.
+
+        Imported asset attributes are merged into the existing ones, and
+        blank values never clear existing ones.
+        """
+        table = model.__table__
+        current = {
+            row['id']: row for row in db.session.execute(
+                select(table).where(table.c.id.in_(list(updates)))
+            ).mappings()
+        }
+        params = []
+        changes = []
+        for row_id, values in updates.items():
+            old = current[row_id]
+            new = {}
+            for column, value in values.items():
+                if column in _MANAGED_COLUMNS or value is None:
+                    continue
+                if column == 'attributes':
+                    value = {**(old['attributes'] or {}), **value}
+                if value != old[column]:
+                    new[column] = value
+            if not new:
+                continue
+            if entity_type == 'assets':
+                changes.extend(self._asset_changes(row_id, old, new))
+            elif entity_type == 'relationships':
+                self.reclassify.update((old['source_asset_id'], new.get('source_asset_id')))
+            new['id'] = row_id
+            if 'updated_at' in table.c:
+                new['updated_at'] = self.now
+            params.append(new)
+        if params:
+            db.session.execute(update(model), params)
+        get_audit_writer().record(changes)
+        return len(params)
+
+    def _asset_changes(self, asset_id, old, new):
+        """Change-log rows for an asset update, as AssetService.update writes."""
+        if 'data_classification' in new:
+            self.reclassify.add(asset_id)
+        if 'name' in new:
+            self.asset_index[_name_key(new['name'])] = asset_id
+        return [
+            {
+                'asset_id': asset_id,
+                'changed_by': self.changed_by,
+                'change_type': 'status_change' if field == 'status' else 'updated',
+                'field_changed': field,
+                'old_value': audit_value(field, old[field]),
+                'new_value': audit_value(field, value),
+                'session_id': self.target,
+            }
+            for field, value in new.items()
+        ]
+
+    def _delete_missing(self, entity_type):
+        """Delete the target session's rows of a type this commit did not touch."""
+        model = ENTITY_MODELS[entity_type]
+        seen = self.seen[entity_type]
+        ids = [row_id for (row_id,) in db.session.query(model.id).filter(
+            model.session_id == self.target
+        ) if row_id not in seen]
+        for i in range(0, len(ids), _DELETE_CHUNK):
+            chunk = ids[i:i + _DELETE_CHUNK]
+            if entity_type == 'assets':
+                self._delete_assets(chunk)
+            else:
+                if entity_type == 'relationships':
+                    self.reclassify.update(source for (source,) in db.session.query(
+                        AssetRelationship.source_asset_id
+                    ).filter(AssetRelationship.id.in_(chunk)))
+                for column in ASSET_REFERENCES.get(entity_type, ()):
+                    self._clear_asset_references(column, chunk)
+                db.session.execute(delete(model).where(model.id.in_(chunk)))
+        return len(ids)
+
+    def _delete_assets(self, asset_ids):
+        """Delete assets with their history, relationships and licenses."""
+        self.reclassify.update(source for (source,) in db.session.query(
+            AssetRelationship.source_asset_id
+        ).filter(
+            AssetRelationship.session_id == self.target,
+            AssetRelationship.relationship_type.in_(PROPAGATION_EDGE_TYPES),
+            AssetRelationship.target_asset_id.in_(asset_ids),
+        ).distinct())
+        # Changes still queued for writing must be deleted too
+        get_audit_writer().flush()
+        for model in (AssetChange, AssetChangeArchive, AssetSnapshot, DiscoveredAsset, License):
+            column = License.software_asset_id if model is License else model.asset_id
+            db.session.execute(delete(model).where(column.in_(asset_ids)))
+        db.session.execute(delete(AssetRelationship).where(or_(
+            AssetRelationship.source_asset_id.in_(asset_ids),
+            AssetRelationship.target_asset_id.in_(asset_ids),
+        )))
+        db.session.execute(delete(Asset).where(Asset.id.in_(asset_ids)))
+        deleted = set(asset_ids)
+        for name in [n for n, a in self.asset_index.items() if a in deleted]:
+            del self.asset_index[name]
+
+    def _clear_asset_references(self, column, ids):
+        """Null an asset reference column pointing at deleted rows, logging it."""
+        attr = getattr(Asset, column)
+        rows = db.session.query(Asset.id, attr).filter(
+            Asset.session_id == self.target, attr.in_(ids)
+        ).all()
+        if not rows:
+            return
+        db.session.execute(update(Asset), [
+            {'id': asset_id, column: None, 'updated_at': self.now} for asset_id, _ in rows
+        ])
+        get_audit_writer().record([
+            {
+                'asset_id': asset_id,
+                'changed_by': self.changed_by,
+                'change_type': 'updated',
+                'field_changed': column,
+                'old_value': audit_value(column, old),
+                'new_value': audit_value(column, None),
+                'session_id': self.target,
+            }
+            for asset_id, old in rows
+        ])
+
+    def _snapshot_assets(self, batch):
+        """Bulk-insert initial snapshots, as AssetService.create does per asset."""
+        db.session.execute(insert(AssetSnapshot), [
+            {
+                'asset_id': values['id'],
+                'state': {field: json_safe(values.get(field)) for field in SNAPSHOT_FIELDS},
+                'taken_at': values['created_at'],
+                'session_id': values['session_id'],
+            }
+            for values in batch
+        ])
+
+
+class _DiffRun:
+    """Hash-join of staged rows against live rows for a dry run."""
+
+    def __init__(self, session_id, target_session_id, keys):
+        self.session_id = session_id
+        self.target = target_session_id
+        self.keys = keys
+        self.asset_index = {}
+        self.asset_names = {}  # id -> name, for showing asset references
+        for asset_id, name in db.session.query(Asset.id, Asset.name).filter(
+            Asset.session_id == target_session_id
+        ).order_by(Asset.id.desc()):  # lowest id wins among duplicate names
+            self.asset_index[_name_key(name)] = asset_id
+            self.asset_names[asset_id] = name
+        self._placeholder = 0  # assets the commit would insert get ids -1, -2, ...
+
+    def execute(self):
+        """Return ``(summary, entries)``; entries are tuples, see ``_entry_dict``."""
+        staged = staged_counts(self.session_id)
+        summary = {}
+        entries = []
+        for entity_type in COMMIT_ORDER:
+            # Types without valid staged rows are not committed, so not diffed
+            if staged.get(entity_type):
+                summary[entity_type] = self._diff(entity_type, entries)
+        return summary, [entry for entry in entries if entry is not None]
+
+    def _diff(self, entity_type, entries):
+        columns = ENTITY_COLUMNS[entity_type]
+        model = ENTITY_MODELS[entity_type]
+        key_columns = self.keys[entity_type]
+        result = {'staged': 0, 'new': 0, 'changed': 0, 'unchanged': 0,
+                  'missing': 0, 'duplicate': 0, 'skipped': 0}
+
+        # Build side: every live row of the target session, by natural key
+        table = model.__table__
+        live = {}
+        unmatched = {}  # id -> row, in id order
+        for row in db.session.execute(
+            select(table).where(table.c.session_id == self.target).order_by(table.c.id.desc())
+        ).mappings():
+            unmatched[row['id']] = row
+            key = _natural_key(row, key_columns)
+            if key is not None:
+                live[key] = row
+        unmatched = dict(reversed(unmatched.items()))
+
+        # Probe side: staged rows, streamed. A repeated key is applied by the
+        # commit as an update on top of its first row, so it is folded in here
+        # and the first row's entry shows the combined effect.
+        firsts = {}  # natural key -> [row_index, entry position, existing row, values]
+        for row_index, row_data, _ in iter_staged(self.session_id, entity_type, COMMIT_BATCH_SIZE,
+                                                  valid_only=True):
+            result['staged'] += 1
+            values, error = _convert(columns, row_data, self.asset_index, entity_type)
+            key = None
+            if not error:
+                key = _natural_key(values, key_columns)
+                if key is None:
+                    error = f'missing natural key ({", ".join(key_columns)})'
+            if error:
+                result['skipped'] += 1
+                entries.append((entity_type, 'skipped', row_index, None, None, {'error': error}))
+                continue
+
+            label = self._label(entity_type, values, key_columns)
+            first = firsts.get(key)
+            if first is not None:
+                first_index, position, existing, merged = first
+                result['duplicate'] += 1
+                entries.append((entity_type, 'duplicate', row_index,
+                                existing['id'] if existing else None, label,
+                                {'first_row_index': first_index}))
+                merged = first[3] = _fold(merged, values)
+                if existing is None:
+                    continue  # still one insert, of the folded values
+                fields = self._changes(entity_type, existing, merged)
+                was_changed = entries[position] is not None
+                if fields:
+                    entries[position] = (entity_type, 'changed', first_index, existing['id'],
+                                         self._label(entity_type, merged, key_columns), fields)
+                else:
+                    entries[position] = None
+                if was_changed != bool(fields):
+                    result['changed'] += 1 if fields else -1
+                    result['unchanged'] -= 1 if fields else -1
+                if entity_type == 'assets' and 'name' in fields:
+                    self.asset_index[_name_key(merged['name'])] = existing['id']
+                continue
+
+            existing = live.get(key)
+            firsts[key] = [row_index, len(entries), existing, values]
+            if existing is None:
+                result['new'] += 1
+                entries.append((entity_type, 'new', row_index, None, label, None))
+                if entity_type == 'assets':
+                    self._placeholder -= 1
+                    self.asset_index[_name_key(values['name'])] = self._placeholder
+                    self.asset_names[self._placeholder] = values['name']
+                continue
+
+            unmatched.pop(existing['id'], None)
+            fields = self._changes(entity_type, existing, values)
+            if not fields:
+                result['unchanged'] += 1
+                entries.append(None)  # filled in if a repeated key changes it
+                continue
+            result['changed'] += 1
+            entries.append((entity_type, 'changed', row_index, existing['id'], label, fields))
+            if entity_type == 'assets' and 'name' in fields:
+                self.asset_index[_name_key(values['name'])] = existing['id']
+
+        for row_id, row in unmatched.items():
+            result['missing'] += 1
+            entries.append((entity_type, 'missing', None, row_id,
+                            self._label(entity_type, row, key_columns), None))
+        return result
+
+    def _changes(self, entity_type, old, values):
+        """``{field: {'old': ..., 'new': ...}}`` for the fields an upsert would change.
+
+        Imported asset attributes are compared one by one, as they are merged,
+        and blank values are skipped since they never clear existing ones.
+        """
+        fields = {}
+        for column, value in values.items():
+            if column in _MANAGED_COLUMNS or value is None:
+                continue
+            if column == 'attributes':
+                current = old['attributes'] or {}
+                for name, item in value.items():
+                    if item != current.get(name):
+                        fields[f'attributes.{name}'] = {'old': current.get(name), 'new': item}
+                continue
+            if value != old[column]:
+                fields[column] = {
+                    'old': self._display(entity_type, column, old[column]),
+                    'new': self._display(entity_type, column, value),
+                }
+        return fields
+
+    def _label(self, entity_type, values, key_columns):
+        """Human-readable natural key, e.g. ``"web-01 / server"``."""
+        return ' / '.join(
+            str(self._display(entity_type, column, values.get(column)) or '')
+            for column in key_columns
+        )
+
+    def _display(self, entity_type, column, value):
+        if column in _ASSET_REF_COLUMNS.get(entity_type, ()) and value is not None:
+            return self.asset_names.get(value, value)
+        return json_safe(value)
+
+
+# Model columns holding asset ids, per entity type
+_ASSET_REF_COLUMNS = {
+    entity_type: {column for column, kind in columns.values() if kind == 'asset_ref'}
+    for entity_type, columns in ENTITY_COLUMNS.items()
+}
+
+
+def _entry_dict(entry):
+    entity_type, action, row_index, record_id, key, detail = entry
+    item = {
+        'entity_type': entity_type,
+        'action': action,
+        'row_index': row_index,
+        'id': record_id,
+        'key': key,
+    }
+    if action == 'changed':
+        item['fields'] = detail
+    elif detail:
+        item.update(detail)
+    return item
+
+
+def _fold(values, later):
+    """Apply a repeated key's row on top of ``values`` as the commit's update does."""
+    values = dict(values)
+    for column, value in later.items():
+        if value is None and column in values:
+            continue
+        if column == 'attributes':
+            value = {**(values.get('attributes') or {}), **value}
+        values[column] = value
+    return values
+
+
+def _live_version(target_session_id):
+    """Return a cheap fingerprint of a target session's live rows."""
+    return '|'.join(table_version(model, target_session_id) for model in ENTITY_MODELS.values())
+
+
+def _resolve_keys(natural_keys):
+    """Merge per-request natural key overrides into ``NATURAL_KEYS``.
+
+    Overrides may name staged columns (``software_name``) or model columns.
+    """
+    keys = dict(NATURAL_KEYS)
+    for entity_type, names in (natural_keys or {}).items():
+        if entity_type not in ENTITY_MODELS:
+            raise BadRequestError(f'Unknown entity type: {entity_type}')
+        if isinstance(names, str):
+            names = [names]
+        table_columns = ENTITY_MODELS[entity_type].__table__.c
+        resolved = []
+        for name in names:
+            column = ENTITY_COLUMNS[entity_type].get(name, (name,))[0]
+            if column not in table_columns or column in _MANAGED_COLUMNS:
+                raise BadRequestError(f'Unknown {entity_type} key column: {name}')
+            resolved.append(column)
+        if not resolved:
+            raise BadRequestError(f'Natural key for {entity_type} needs at least one column')
+        keys[entity_type] = tuple(resolved)
+    return keys
+
+
+def _natural_key(values, key_columns):
+    return _normalize_key([values.get(column) for column in key_columns])
+
+
+def _normalize_key(parts):
+    """Hashable natural key, or None when a part is missing."""
+    key = []
+    for part in parts:
+        if isinstance(part, str):
+            part = part.strip().casefold()
+        if part is None or part == '':
+            return None
+        key.append(part)
+    return tuple(key)
+
+
+def _name_key(name):
+    """Asset index key; names match case-insensitively, like natural keys."""
+    return str(name).strip().casefold()
+
+
+def _convert(columns, row, asset_index, entity_type):
+    """Map a staged row to model column values. Returns ``(values, error)``."""
+    return convert_row(
+        columns, row, lambda kind, raw: _coerce(kind, raw, asset_index),
+        attributes=entity_type == 'assets',
+    )
+
+
+def _coerce(kind, raw, asset_index):
+    if kind != 'asset_ref':
+        return coerce(kind, raw)
+    if isinstance(raw, str):
+        raw = raw.strip()
+    if raw is None or raw == '':
+        return None
+    asset_id = asset_index.get(_name_key(raw))
+    if asset_id is None:
+        raise ValueError(f'no asset named "{raw}"')
+    return asset_id
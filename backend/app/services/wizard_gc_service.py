@@ -0,0 +1,156 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import delete
+
+from app.extensions import db
+from app.import_jobs import FINISHED_STATUSES
+from app.models.wizard_import import ImportJob, WizardImport, WizardImportChunk, WizardSession
+from app.services.wizard_service import ENTITY_TYPES, WizardService
+from app.errors import BadRequestError
+
+logger = logging.getLogger(__name__)
+
+
+class WizardGCService:
+    """Deletes abandoned wizard sessions and their staged data."""
+
+    def sweep(self, ttl_hours=None, vacuum=True):
+        """Delete wizard sessions idle for more than ``ttl_hours``.
+
+        A session is idle once its ``updated_at`` is older than the TTL
+        (``WIZARD_SESSION_TTL_HOURS`` by default); sessions with a queued or
+        running import job are kept. Staged rows whose session row is gone
+        are swept by the age of their newest row. Sessions are deleted in
+        batches of ``WIZARD_GC_BATCH_SIZE``, each in its own short
+        transaction, together with their staged rows, finished import jobs
+        and error files.
+
+        On SQLite, the space freed is then reclaimed with ``VACUUM`` (or an
+        incremental vacuum when the database uses ``auto_vacuum =
+        INCREMENTAL``) once the free pages exceed
+        ``WIZARD_VACUUM_THRESHOLD_MB``.
+        """
+        if ttl_hours is None:
+            ttl_hours = current_app.config['WIZARD_SESSION_TTL_HOURS']
+        if ttl_hours < 1:
+            raise BadRequestError('ttl_hours must be 1 or greater')
+        batch_size = current_app.config['WIZARD_GC_BATCH_SIZE']
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=ttl_hours)).replace(tzinfo=None)
+
+        result = {
+            'cutoff': cutoff.isoformat(),
+            'sessions': 0,
+            'staged_rows': 0,
+            'staged_chunks': 0,
+            'import_jobs': 0,
+            'error_files': 0,
+        }
+        active = db.session.query(ImportJob.session_id).filter(
+            ImportJob.status.notin_(FINISHED_STATUSES)
+        )
+        while True:
+            session_ids = [sid for (sid,) in db.session.query(WizardSession.session_id).filter(
+                WizardSession.updated_at < cutoff,
+                WizardSession.session_id.notin_(active),
+            ).order_by(WizardSession.updated_at).limit(batch_size)]
+            if not session_ids:
+                break
+            self._delete_sessions(session_ids, result)
+            result['sessions'] += len(session_ids)
+            if len(session_ids) < batch_size:
+                break
+
+        known = db.session.query(WizardSession.session_id)
+        for model in (WizardImport, WizardImportChunk):
+            while True:
+                orphans = [sid for (sid,) in db.session.query(model.session_id).filter(
+                    model.session_id.notin_(known),
+                    model.session_id.notin_(active),
+                ).group_by(model.session_id).having(
+                    db.func.max(model.created_at) < cutoff
+                ).limit(batch_size)]
+                if not orphans:
+                    break
+                self._delete_sessions(orphans, result)
+                if len(orphans) < batch_size:
+                    break
+
+        result['vacuum'] = self.vacuum() if vacuum else None
+        logger.info('Wizard GC removed %d sessions, %d staged rows, %d chunks',
+                    result['sessions'], result['staged_rows'], result['staged_chunks'])
+        return result
+
+    def _delete_sessions(self, session_ids, result):
+        """Delete sessions' staged data, finished jobs and rows in one transaction."""
+        for key, model in (('staged_rows', WizardImport), ('staged_chunks', WizardImportChunk)):
+            result[key] += db.session.execute(
+                delete(model).where(model.session_id.in_(session_ids))
+            ).rowcount
+        result['import_jobs'] += db.session.execute(delete(ImportJob).where(
+            ImportJob.session_id.in_(session_ids),
+            ImportJob.status.in_(FINISHED_STATUSES),
+        )).rowcount
+        db.session.execute(delete(WizardSession).where(WizardSession.session_id.in_(session_ids)))
+        db.session.commit()
+
+        service = WizardService()
+        for session_id in session_ids:
+            for entity_type in ENTITY_TYPES:
+                path = service.error_file_path(session_id, entity_type)
+                if os.path.exists(path):
+                    os.remove(path)
+                    result['error_files'] += 1
+
+    def vacuum(self, threshold_mb=None):
+        """Reclaim free SQLite pages once they exceed ``threshold_mb``.
+
+        Returns the database size and free space before and after, and
+        whether a vacuum ran; None on other databases.
+        """
+        if db.engine.dialect.name != 'sqlite':
+            return None
+        if threshold_mb is None:
+            threshold_mb = current_app.config['WIZARD_VACUUM_THRESHOLD_MB']
+
+        before = _page_stats()
+        result = {
+            'ran': None,
+            'database_bytes_before': before['database_bytes'],
+            'free_bytes_before': before['free_bytes'],
+        }
+        if before['free_bytes'] and before['free_bytes'] >= threshold_mb * 1024 * 1024:
+            db.session.commit()
+            if before['auto_vacuum'] == 2:  # INCREMENTAL
+                # execute() steps the pragma once, freeing a single page;
+                # executescript() runs it to completion in one call
+                with db.engine.connect() as conn:
+                    conn.connection.driver_connection.executescript('PRAGMA incremental_vacuum;')
+                result['ran'] = 'incremental'
+            else:
+                # VACUUM cannot run inside a transaction
+                with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                    conn.exec_driver_sql('VACUUM')
+                result['ran'] = 'full'
+        after = _page_stats() if result['ran'] else before
+        result['database_bytes_after'] = after['database_bytes']
+        result['free_bytes_after'] = after['free_bytes']
+        result['reclaimed_bytes'] = before['database_bytes'] - after['database_bytes']
+        return result
+
+
+def _page_stats():
+    """Return SQLite database size, free pages and bytes, and auto_vacuum mode."""
+    with db.engine.connect() as conn:
+        page_size, page_count, free_pages, auto_vacuum = (
+            conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+            for name in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum')
+        )
+    return {
+        'database_bytes': page_size * page_count,
+        'free_pages': free_pages,
+        'free_bytes': page_size * free_pages,
+        'auto_vacuum': auto_vacuum,
+    }
@@ -0,0 +1,266 @@
+"""Streaming parsers for wizard imports.
+
+Uploads are decoded incrementally and turned into cleaned row dicts one at a
+time, so memory use is bounded by the read chunk size rather than the size
+of the upload.
+"""
+import codecs
+import csv
+import io
+import json
+import re
+from datetime import datetime, time
+
+# Byte-order marks, longest first so UTF-32 LE is not mistaken for UTF-16 LE
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+# Tried in order on the first chunk when there is no BOM
+FALLBACK_ENCODINGS = ('utf-8', 'cp1252', 'latin-1')
+
+SNIFF_DELIMITERS = ',;|'
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Splits after \n, \r\n or a lone \r, keeping the line endings
+_LINE_END = re.compile(r'(?<=\n)|(?<=\r)(?!\n)')
+
+
+class Row(dict):
+    """Row dict that remembers the source line it starts on."""
+    __slots__ = ('line',)
+
+    def __init__(self, line=None):
+        super().__init__()
+        self.line = line
+
+
+def detect_encoding(head):
+    """Return ``(encoding, bom_length)`` for the first bytes of an upload."""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            # final=False tolerates a multi-byte sequence cut at the chunk end
+            codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            return encoding, 0
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1', 0
+
+
+def iter_text_chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Decode a binary stream chunk by chunk, detecting BOM and encoding.
+
+    Without a BOM the encoding is guessed from the first chunk. If that chunk
+    was plain ASCII and UTF-8 later turns out to be wrong, decoding switches
+    to the next fallback encoding; otherwise invalid bytes are replaced
+    rather than failing the import.
+    """
+    head = stream.read(chunk_size)
+    if not head:
+        return
+    encoding, bom_length = detect_encoding(head)
+    guessed = bom_length == 0 and encoding == 'utf-8' and head.isascii()
+    decoder = codecs.getincrementaldecoder(encoding)(errors='strict' if guessed else 'replace')
+
+    data = head[bom_length:]
+    while data:
+        try:
+            text = decoder.decode(data)
+        except UnicodeDecodeError:
+            # Only reachable while the ASCII-only UTF-8 guess is unconfirmed
+            decoder = codecs.getincrementaldecoder(FALLBACK_ENCODINGS[1])(errors='replace')
+            guessed = False
+            text = decoder.decode(data)
+        else:
+            if guessed and not data.isascii():
+                # Valid non-ASCII UTF-8 confirms the guess
+                guessed = False
+                decoder.errors = 'replace'
+        if text:
+            yield text
+        data = stream.read(chunk_size)
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_lines(chunks):
+    """Split text chunks into lines, keeping line endings for the csv module."""
+    pending = ''
+    for chunk in chunks:
+        pending += chunk
+        # Hold back a trailing \r in case the next chunk starts with \n
+        held = ''
+        if pending.endswith('\r'):
+            pending, held = pending[:-1], '\r'
+        lines = _LINE_END.split(pending)
+        pending = lines.pop() + held
+        yield from lines
+    if pending:
+        yield pending
+
+
+def sniff_delimiter(header_line):
+    """Pick the delimiter from the header line.
+
+    Tabs win outright (pasted spreadsheet data); otherwise the csv sniffer
+    chooses among ``SNIFF_DELIMITERS``, falling back to a comma.
+    """
+    if '\t' in header_line:
+        return '\t'
+    try:
+        return csv.Sniffer().sniff(header_line, delimiters=SNIFF_DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+
+
+def iter_csv_lines(lines):
+    """Yield cleaned row dicts from an iterator of CSV/TSV lines.
+
+    Keys and values are stripped, columns without a header are dropped, and
+    blank lines (before the header or between rows) are skipped. Rows are
+    :class:`Row` dicts carrying the line number they start on.
+    """
+    lines = iter(lines)
+    header_line = None
+    skipped = 0
+    for line in lines:
+        if line.strip():
+            header_line = line
+            break
+        skipped += 1
+    if header_line is None:
+        return
+
+    delimiter = sniff_delimiter(header_line)
+    reader = csv.reader(_chain_first(header_line, lines), delimiter=delimiter)
+    headers = [h.strip() for h in next(reader)]
+    line_num = reader.line_num
+    for values in reader:
+        row = Row(skipped + line_num + 1)
+        line_num = reader.line_num
+        for key, value in zip(headers, values):
+            if key:
+                row[key] = value.strip()
+        if not any(row.values()):
+            continue
+        for key in headers[len(values):]:
+            if key:
+                row.setdefault(key, '')
+        yield row
+
+
+def iter_csv_stream(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield cleaned row dicts from a binary CSV/TSV stream."""
+    return iter_csv_lines(iter_lines(iter_text_chunks(stream, chunk_size)))
+
+
+def iter_csv_text(text):
+    """Yield cleaned row dicts from pasted CSV/TSV text."""
+    return iter_csv_lines(io.StringIO(text, newline=''))
+
+
+def iter_ndjson(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield ``(line, record, error)`` from a binary NDJSON stream.
+
+    Each non-blank line must hold one JSON object; ``record`` is that object
+    as a :class:`Row` and ``error`` is None. Lines that are not JSON objects
+    yield ``(line, None, message)`` instead, so one bad line does not end
+    the feed.
+    """
+    for number, line in enumerate(iter_lines(iter_text_chunks(stream, chunk_size)), 1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            yield number, None, f'invalid JSON: {e}'
+            continue
+        if not isinstance(value, dict):
+            yield number, None, 'expected a JSON object'
+            continue
+        row = Row(number)
+        for key, item in value.items():
+            row[key.strip()] = item.strip() if isinstance(item, str) else item
+        yield number, row, None
+
+
+def iter_xlsx_rows(stream, sheet=None):
+    """Yield row dicts from an Excel workbook, one worksheet row at a time.
+
+    The workbook is opened read-only, so rows are streamed from the sheet
+    XML instead of being loaded up front. ``sheet`` is a sheet name or a
+    1-based position (default: the active sheet); an unknown sheet raises
+    ValueError before any row is read. The first non-empty row is the
+    header. Cells keep their types: numbers and booleans pass through,
+    date cells become dates (datetimes if they have a time), strings are
+    stripped and empty cells become ''. Rows are :class:`Row` dicts
+    carrying their sheet row number.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        ws = _select_sheet(wb, sheet)
+    except ValueError:
+        wb.close()
+        raise
+    return _iter_sheet_rows(wb, ws)
+
+
+def _select_sheet(wb, sheet):
+    if sheet is None or sheet == '':
+        return wb.active
+    if sheet in wb.sheetnames:
+        return wb[sheet]
+    if str(sheet).isdigit() and 1 <= int(sheet) <= len(wb.sheetnames):
+        return wb.worksheets[int(sheet) - 1]
+    raise ValueError(f'Sheet "{sheet}" not found; available: {", ".join(wb.sheetnames)}')
+
+
+def _iter_sheet_rows(wb, ws):
+    try:
+        rows = enumerate(ws.iter_rows(values_only=True), start=1)
+        headers = None
+        for line, values in rows:
+            if any(v is not None and v != '' for v in values):
+                headers = [str(h).strip() if h is not None else '' for h in values]
+                break
+        if headers is None:
+            return
+        for line, values in rows:
+            row = Row(line)
+            for key, value in zip(headers, values):
+                if key:
+                    row[key] = _cell_value(value)
+            if not any(v != '' for v in row.values()):
+                continue
+            for key in headers[len(values):]:
+                if key:
+                    row.setdefault(key, '')
+            yield row
+    finally:
+        wb.close()
+
+
+def _cell_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, datetime) and value.time() == time(0):
+        return value.date()
+    return value
+
+
+def _chain_first(first, rest):
+    yield first
+    yield from rest
@@ -0,0 +1,320 @@
+"""Typed validation of wizard rows.
+
+Each entity type's columns are compiled once into converters that check
+required values, coerce dates, numbers and booleans, and map enum values to
+their canonical spelling. Large uploads are validated in chunks on a process
+pool; results come back in upload order with every row error and its line.
+"""
+import csv
+import multiprocessing
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time
+from itertools import islice
+
+# Staged column -> (model column, type) per entity type. Asset columns not
+# listed here are kept in the asset's attributes.
+ENTITY_COLUMNS = {
+    'people': {
+        'name': ('name', 'str'), 'email': ('email', 'str'), 'role': ('role', 'str'),
+        'team': ('team', 'str'), 'phone': ('phone', 'str'),
+    },
+    'locations': {
+        'name': ('name', 'str'), 'location_type': ('location_type', 'str'),
+        'address': ('address', 'str'), 'notes': ('notes', 'str'),
+    },
+    'security_boundaries': {
+        'name': ('name', 'str'), 'boundary_type': ('boundary_type', 'str'),
+        'description': ('description', 'str'), 'cmmc_level': ('cmmc_level', 'str'),
+        'assessment_date': ('assessment_date', 'date'),
+    },
+    'assets': {
+        'name': ('name', 'str'), 'asset_type': ('asset_type', 'str'),
+        'sub_type': ('sub_type', 'str'), 'description': ('description', 'str'),
+        'status': ('status', 'str'), 'data_classification': ('data_classification', 'str'),
+        'classification': ('data_classification', 'str'), 'vendor': ('vendor', 'str'),
+        'acquired_date': ('acquired_date', 'date'), 'warranty_expiry': ('warranty_expiry', 'date'),
+        'last_audit_date': ('last_audit_date', 'date'),
+    },
+    'licenses': {
+        'software_name': ('software_asset_id', 'asset_ref'), 'license_type': ('license_type', 'str'),
+        'vendor': ('vendor', 'str'), 'total_seats': ('total_seats', 'int'),
+        'used_seats': ('used_seats', 'int'), 'cost_per_period': ('cost_per_period', 'float'),
+        'billing_period': ('billing_period', 'str'), 'start_date': ('start_date', 'date'),
+        'expiry_date': ('expiry_date', 'date'), 'auto_renew': ('auto_renew', 'bool'),
+        'contract_number': ('contract_number', 'str'), 'notes': ('notes', 'str'),
+    },
+    'relationships': {
+        'source_asset': ('source_asset_id', 'asset_ref'), 'target_asset': ('target_asset_id', 'asset_ref'),
+        'relationship_type': ('relationship_type', 'str'), 'description': ('description', 'str'),
+    },
+}
+
+TRUE_VALUES = {'true', 't', 'yes', 'y', '1'}
+FALSE_VALUES = {'false', 'f', 'no', 'n', '0', ''}
+
+
+class RowError(namedtuple('RowError', 'line column value message')):
+    """One problem with one row; ``line`` is the source line or row number."""
+    __slots__ = ()
+
+    def to_dict(self):
+        return self._asdict()
+
+    def __str__(self):
+        prefix = f'Line {self.line}: ' if self.line is not None else ''
+        if self.column:
+            return f'{prefix}{self.column}: {self.message}'
+        return f'{prefix}{self.message}'
+
+
+def coerce(kind, raw):
+    """Convert a raw cell to ``kind`` (str, int, float, bool or date).
+
+    Blank strings become None (False for bool). Raises ValueError with a
+    user-facing message when the value cannot be converted.
+    """
+    if isinstance(raw, str):
+        raw = raw.strip()
+        if raw == '' and kind != 'bool':
+            return None
+    if raw is None:
+        return None
+    if kind == 'str':
+        return str(raw)
+    if kind == 'int':
+        try:
+            number = float(raw)
+        except (TypeError, ValueError):
+            number = None
+        if number is None or not number.is_integer():
+            raise ValueError(f'"{raw}" is not a whole number')
+        return int(number)
+    if kind == 'float':
+        try:
+            return float(str(raw).replace(',', '').lstrip('$'))
+        except ValueError:
+            raise ValueError(f'"{raw}" is not a number')
+    if kind == 'bool':
+        text = str(raw).lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+        raise ValueError(f'"{raw}" is not true/false')
+    if kind == 'date':
+        if isinstance(raw, datetime):
+            return raw.date()
+        if isinstance(raw, date):
+            return raw
+        try:
+            return date.fromisoformat(str(raw)[:10])
+        except ValueError:
+            raise ValueError(f'"{raw}" is not a YYYY-MM-DD date')
+    raise ValueError(f'unknown column type {kind}')
+
+
+def convert_row(columns, row, coerce_value=coerce, attributes=False, aliases=None, ignore=()):
+    """Map a row to model column values. Returns ``(values, error)``.
+
+    ``columns`` maps row keys to ``(column, type)`` as ENTITY_COLUMNS does,
+    and each value is converted with ``coerce_value(type, raw)``. Other
+    non-blank keys are kept in ``attributes`` if it is set, renamed per
+    ``aliases``; keys in ``ignore`` are dropped.
+    """
+    values = {}
+    extra = {}
+    aliases = aliases or {}
+    for key, raw in row.items():
+        spec = columns.get(key)
+        if spec is None:
+            if attributes and key not in ignore and raw not in (None, ''):
+                extra[aliases.get(key, key)] = raw
+            continue
+        column, kind = spec
+        try:
+            value = coerce_value(kind, raw)
+        except ValueError as e:
+            return None, f'{key}: {e}'
+        if value is not None or column not in values:
+            values[column] = value
+    if extra:
+        values['attributes'] = extra
+    return values, None
+
+
+def json_safe(value):
+    """Return dates and times as ISO strings, other values unchanged."""
+    return value.isoformat() if isinstance(value, (date, time)) else value
+
+
+class EntitySchema:
+    """Compiled validator for one entity type's staged rows."""
+
+    def __init__(self, entity_type, required=(), enums=None):
+        self.entity_type = entity_type
+        self.required = tuple(required)
+        self._converters = {}
+        enums = enums or {}
+        for column, (_, kind) in ENTITY_COLUMNS.get(entity_type, {}).items():
+            allowed = enums.get(column)
+            if allowed:
+                self._converters[column] = _enum_converter(allowed)
+            elif kind in ('str', 'asset_ref'):
+                continue  # resolved against live rows at commit time
+            else:
+                self._converters[column] = _typed_converter(kind)
+
+    def validate(self, line, row):
+        """Return ``(values, errors)``; the row is valid if errors is empty.
+
+        Blank cells are kept as-is; other typed cells are replaced by their
+        coerced, JSON-safe values. Invalid rows come back with their
+        original (JSON-safe) values.
+        """
+        errors = []
+        for column in self.required:
+            value = row.get(column)
+            if value is None or str(value).strip() == '':
+                errors.append(RowError(line, column, '', 'missing required value'))
+        values = dict(row)
+        for column, convert in self._converters.items():
+            raw = row.get(column)
+            if raw is None or (isinstance(raw, str) and raw.strip() == ''):
+                continue
+            try:
+                values[column] = convert(raw)
+            except ValueError as e:
+                errors.append(RowError(line, column, json_safe(raw), str(e)))
+        if errors:
+            values = dict(row)
+        for column, value in values.items():
+            # Typed spreadsheet cells in untyped columns
+            values[column] = json_safe(value)
+        return values, errors
+
+
+def _typed_converter(kind):
+    if kind == 'date':
+        return lambda raw: coerce('date', raw).isoformat()
+    return lambda raw: coerce(kind, raw)
+
+
+def _enum_converter(allowed):
+    canonical = {value.casefold(): value for value in allowed}
+    choices = ', '.join(allowed)
+
+    def convert(raw):
+        value = canonical.get(str(raw).strip().casefold())
+        if value is None:
+            raise ValueError(f'"{raw}" is not one of: {choices}')
+        return value
+    return convert
+
+
+# Compiled schemas per process, keyed by entity type
+_SCHEMAS = {}
+
+
+def validate_chunk(entity_type, spec, chunk):
+    """Validate ``[(line, row), ...]``; returns ``[(line, values, errors), ...]``.
+
+    Runs in pool workers, so arguments and results are plain picklable data.
+    """
+    schema = _SCHEMAS.get(entity_type)
+    if schema is None:
+        schema = _SCHEMAS[entity_type] = EntitySchema(
+            entity_type, spec.get('required', ()), spec.get('enums'),
+        )
+    return [(line, *schema.validate(line, row)) for line, row in chunk]
+
+
+_pool = None
+_pool_workers = 0
+
+
+def _get_pool(workers):
+    """Return the shared validation pool, (re)created for ``workers``."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        # spawn: forking a threaded server process is unsafe
+        _pool = ProcessPoolExecutor(max_workers=workers,
+                                    mp_context=multiprocessing.get_context('spawn'))
+        _pool_workers = workers
+    return _pool
+
+
+def iter_validated(entity_type, spec, rows, chunk_size=5000, workers=0):
+    """Yield ``(line, values, errors)`` for each row, in upload order.
+
+    ``rows`` yields ``(line, row)`` pairs and is read lazily in chunks of
+    ``chunk_size``. Uploads of more than one chunk are validated on a pool
+    of ``workers`` processes with at most two chunks per worker in flight;
+    smaller uploads, or ``workers=0``, validate in-process.
+    """
+    rows = iter(rows)
+    first = list(islice(rows, chunk_size))
+    second = list(islice(rows, chunk_size))
+    if not second or workers < 1:
+        schema = EntitySchema(entity_type, spec.get('required', ()), spec.get('enums'))
+        for chunk in (first, second):
+            for line, row in chunk:
+                yield (line, *schema.validate(line, row))
+        for line, row in rows:
+            yield (line, *schema.validate(line, row))
+        return
+
+    pool = _get_pool(workers)
+    pending = deque()
+    chunk = first
+    while chunk:
+        pending.append(pool.submit(validate_chunk, entity_type, spec, chunk))
+        if len(pending) >= workers * 2:
+            yield from pending.popleft().result()
+        chunk = second or list(islice(rows, chunk_size))
+        second = None
+    while pending:
+        yield from pending.popleft().result()
+
+
+class ErrorReport:
+    """Collects import errors: all go to a CSV file, the first ``cap`` are kept.
+
+    Items are RowErrors or plain messages for errors not tied to a row.
+    """
+
+    HEADER = ('line', 'column', 'value', 'error')
+
+    def __init__(self, path, cap):
+        self.path = path
+        self.cap = cap
+        self.count = 0
+        self.messages = []
+        self._file = None
+        self._writer = None
+
+    def append(self, item):
+        self.count += 1
+        if len(self.messages) < self.cap:
+            self.messages.append(str(item))
+        if self.path is None:
+            return
+        if self._writer is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.HEADER)
+        if isinstance(item, RowError):
+            self._writer.writerow(item)
+        else:
+            self._writer.writerow(('', '', '', item))
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,15 +1,33 @@
-import csv
-import io
+import os
 import uuid
 from datetime import datetime, timezone
 
+from flask import current_app
+from sqlalchemy import insert
+from werkzeug.utils import secure_filename
+
 from app.extensions import db
+from app.errors import BadRequestError
 from app.models.wizard_import import WizardImport, WizardSession
+from app.services.wizard_parsing import iter_csv_stream, iter_csv_text, iter_xlsx_rows
+from app.services.wizard_schema import ErrorReport, iter_validated
+from app.services.wizard_staging import (
+    delete_staged, page_staged, pending_key, stage_columnar, staged_counts, swap_staged,
+)
+
+# Row errors returned from an import; all of them go to the error file
+MAX_REPORTED_ERRORS = 20
 
 # Entity type definitions with required columns and descriptions
 ENTITY_TYPES = {
     'assets': {
         'required': ['name', 'asset_type'],
+        'enums': {
+            'asset_type': ['hardware', 'software', 'cloud_service', 'license', 'network', 'contract'],
+            'status': ['active', 'retired', 'in_storage', 'disposed', 'maintenance', 'planned'],
+            'data_classification': ['CUI', 'FCI', 'public', 'internal'],
+            'classification': ['CUI', 'FCI', 'public', 'internal'],
+        },
         'description': 'Assets with name, asset_type (hardware/software/cloud_service/network/contract), sub_type, status, data_classification, vendor, description',
         'sample': 'name,asset_type,sub_type,status,data_classification,vendor,description\nPROD-SVR-01,hardware,server,active,CUI,Dell,Production Server 1\nMission App v3.2,software,custom_app,active,CUI,,Custom Java/Spring Boot application',
     },
@@ -20,21 +38,34 @@ ENTITY_TYPES = {
     },
     'locations': {
         'required': ['name'],
+        'enums': {'location_type': ['data_center', 'office', 'cloud_region', 'colo']},
         'description': 'Locations with name, location_type (data_center/office/cloud_region/colo), address, notes',
         'sample': 'name,location_type,address,notes\nReston Main Office,office,"11955 Democracy Dr, Reston, VA 20190",Main corporate HQ\nAWS GovCloud US-East,cloud_region,us-gov-east-1,FedRAMP High authorized',
     },
     'security_boundaries': {
         'required': ['name'],
+        'enums': {
+            'boundary_type': ['cui_boundary', 'fci_boundary', 'corporate'],
+            'cmmc_level': ['level_1', 'level_2', 'level_3'],
+        },
         'description': 'Security boundaries with name, boundary_type (cui_boundary/fci_boundary/corporate), description, cmmc_level (level_1/level_2/level_3), assessment_date',
         'sample': 'name,boundary_type,description,cmmc_level,assessment_date\nCUI Enclave,cui_boundary,Controlled Unclassified Information boundary,level_2,2025-09-15\nCorporate Network,corporate,Standard corporate network,level_1,2025-06-01',
     },
     'licenses': {
         'required': ['software_name', 'vendor'],
+        'enums': {
+            'license_type': ['perpetual', 'subscription', 'per_seat', 'site'],
+            'billing_period': ['monthly', 'annual'],
+        },
         'description': 'Licenses with software_name (matches asset name), license_type (perpetual/subscription/per_seat/site), vendor, total_seats, used_seats, cost_per_period, billing_period, start_date, expiry_date, auto_renew, contract_number',
         'sample': 'software_name,license_type,vendor,total_seats,used_seats,cost_per_period,billing_period,start_date,expiry_date,auto_renew,contract_number\nMicrosoft 365 GCC,per_seat,Microsoft,15,12,22,monthly,2025-01-01,2026-12-31,true,MS-GOV-2025-001',
     },
     'relationships': {
         'required': ['source_asset', 'target_asset', 'relationship_type'],
+        'enums': {
+            'relationship_type': ['runs', 'depends_on', 'supports', 'assigned_to', 'licensed_under',
+                                  'installed_on', 'protects', 'within_boundary'],
+        },
         'description': 'Asset relationships with source_asset (name), target_asset (name), relationship_type (runs/depends_on/supports/assigned_to/licensed_under/installed_on/protects/within_boundary), description',
         'sample': 'source_asset,target_asset,relationship_type,description\nPROD-SVR-01,Mission App v3.2,runs,Production server runs mission app\nMission App v3.2,PostgreSQL 15,depends_on,App depends on database',
     },
@@ -55,7 +86,7 @@ class WizardService:
     def get_entity_types(self):
         """Return available entity types with metadata."""
         return {
-            k: {'required': v['required'], 'description': v['description']}
+            k: {'required': v['required'], 'enums': v.get('enums', {}), 'description': v['description']}
             for k, v in ENTITY_TYPES.items()
         }
 
@@ -68,126 +99,197 @@ class WizardService:
 
     def parse_csv_text(self, text):
         """Parse pasted CSV or TSV text into list of dicts."""
-        text = text.strip()
-        if not text:
-            return []
-
-        # Auto-detect delimiter
-        first_line = text.split('\n')[0]
-        if '\t' in first_line:
-            delimiter = '\t'
-        else:
-            delimiter = ','
-
-        reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
-        rows = []
-        for row in reader:
-            # Strip whitespace from keys and values
-            cleaned = {k.strip(): (v.strip() if v else '') for k, v in row.items() if k}
-            rows.append(cleaned)
-        return rows
+        return list(iter_csv_text(text))
 
     def parse_file(self, file_storage):
         """Parse an uploaded CSV or Excel file into list of dicts."""
+        return list(self.iter_file(file_storage))
+
+    def iter_file(self, file_storage, sheet=None):
+        """Yield row dicts from an uploaded CSV, TSV or Excel file.
+
+        CSV and TSV uploads are decoded and parsed incrementally; Excel
+        workbooks are streamed row by row from ``sheet`` (name or 1-based
+        position, default the active sheet) with typed cells. Raises
+        BadRequestError for an unknown sheet.
+        """
         filename = file_storage.filename or ''
 
         if filename.endswith('.csv') or filename.endswith('.tsv'):
-            text = file_storage.read().decode('utf-8')
-            return self.parse_csv_text(text)
+            chunk_size = current_app.config['WIZARD_STREAM_CHUNK_SIZE']
+            return iter_csv_stream(file_storage.stream, chunk_size)
 
         elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-            import openpyxl
-            wb = openpyxl.load_workbook(file_storage, read_only=True, data_only=True)
-            ws = wb.active
-            rows_iter = ws.iter_rows(values_only=True)
-            headers = [str(h).strip() if h else '' for h in next(rows_iter)]
-            rows = []
-            for row_vals in rows_iter:
-                row_dict = {}
-                for i, val in enumerate(row_vals):
-                    if i < len(headers) and headers[i]:
-                        row_dict[headers[i]] = str(val).strip() if val is not None else ''
-                rows.append(row_dict)
-            wb.close()
-            return rows
-
-        return []
+            try:
+                return iter_xlsx_rows(file_storage.stream, sheet)
+            except ValueError as e:
+                raise BadRequestError(str(e))
 
-    def validate_rows(self, entity_type, rows):
-        """Validate rows against required columns for the entity type."""
-        et = ENTITY_TYPES.get(entity_type)
-        if not et:
-            return [], [f'Unknown entity type: {entity_type}']
+        return iter([])
 
-        required = et['required']
+    def validate_rows(self, entity_type, rows):
+        """Validate and coerce rows against the entity type's schema."""
         errors = []
-        valid_rows = []
+        valid_rows = list(self.iter_valid_rows(entity_type, rows, errors))
+        return valid_rows, [str(e) for e in errors]
 
-        if not rows:
-            return [], ['No data rows provided']
+    def iter_valid_rows(self, entity_type, rows, errors, counts=None):
+        """Yield coerced valid rows, appending problems to ``errors``.
 
+        See :meth:`iter_checked_rows`; invalid rows are dropped.
+        """
+        for values, row_errors in self.iter_checked_rows(entity_type, rows, errors, counts):
+            if not row_errors:
+                yield values
+
+    def iter_checked_rows(self, entity_type, rows, errors, counts=None):
+        """Yield ``(values, row_errors)`` per row, appending problems to ``errors``.
+
+        Rows are checked for required values, dates, numbers, booleans and
+        enum values (see ``EntitySchema``); row errors are RowErrors carrying
+        the source line, and ``row_errors`` is empty for valid rows. ``rows``
+        may be any iterable and is consumed lazily; large inputs are
+        validated on a pool of ``WIZARD_VALIDATE_WORKERS`` processes. If
+        ``counts`` is given, its ``total`` and ``invalid`` entries are kept
+        up to date. Nothing is yielded when required columns are missing.
+        """
+        et = ENTITY_TYPES.get(entity_type)
+        if not et:
+            errors.append(f'Unknown entity type: {entity_type}')
+            return
+
+        rows = iter(rows)
+        if counts is None:
+            counts = {}
+        counts.setdefault('total', 0)
+        counts.setdefault('invalid', 0)
+
+        first = next(rows, None)
+        if first is None:
+            errors.append('No data rows provided')
+            return
         # Check that required columns exist in the first row
-        if rows:
-            available_cols = set(rows[0].keys())
-            missing = [c for c in required if c not in available_cols]
-            if missing:
-                return [], [f'Missing required columns: {", ".join(missing)}']
-
-        for i, row in enumerate(rows):
-            row_errors = []
-            for col in required:
-                val = row.get(col, '')
-                if not val or str(val).strip() == '':
-                    row_errors.append(f'Row {i + 1}: missing required value for "{col}"')
+        missing = [c for c in et['required'] if c not in first]
+        if missing:
+            errors.append(f'Missing required columns: {", ".join(missing)}')
+            counts['total'] = sum(1 for _ in rows) + 1
+            counts['invalid'] = counts['total']
+            return
+
+        numbered = (
+            (getattr(row, 'line', None) or i + 1, dict(row))
+            for i, row in enumerate(_chain_first(first, rows))
+        )
+        for line, values, row_errors in iter_validated(
+            entity_type, et, numbered,
+            chunk_size=current_app.config['WIZARD_VALIDATE_CHUNK_SIZE'],
+            workers=current_app.config['WIZARD_VALIDATE_WORKERS'],
+        ):
+            counts['total'] += 1
             if row_errors:
+                counts['invalid'] += 1
                 errors.extend(row_errors)
-            else:
-                valid_rows.append(row)
-
-        return valid_rows, errors
+            yield values, row_errors
 
-    def import_entity(self, session_id, entity_type, rows):
+    def import_entity(self, session_id, entity_type, rows, on_batch=None):
         """Import rows into the staging table for a given entity type.
 
         Replaces any existing rows for this session + entity_type (idempotent).
+        ``rows`` may be a lazy iterator; rows are validated and staged as
+        they are read, in Core bulk inserts of ``WIZARD_STAGE_BATCH_SIZE``
+        rows, each committed so the open transaction stays small. Rows are
+        stored per ``WIZARD_STAGING_FORMAT`` (see wizard_staging). Invalid
+        rows are staged with their errors for review but never committed.
+        New rows are staged under :func:`pending_key` and swapped in for the
+        previous ones only once the import succeeds; if it fails part-way,
+        the pending rows are removed and the previous upload is kept.
+        ``on_batch(counts)`` is called after each batch with running
+        ``total``, ``invalid`` and ``valid`` counts. The first
+        ``MAX_REPORTED_ERRORS`` errors are returned; all of them are written
+        to the file at :meth:`error_file_path`.
         """
         # Validate session exists
         ws = WizardSession.query.filter_by(session_id=session_id).first()
         if not ws:
-            return {'imported': 0, 'errors': ['Invalid session_id'], 'total': 0}
-
-        valid_rows, errors = self.validate_rows(entity_type, rows)
-
-        # Delete existing rows for this session + entity_type (idempotent re-import)
-        WizardImport.query.filter_by(
-            session_id=session_id, entity_type=entity_type
-        ).delete()
-
-        # Insert valid rows
-        for i, row in enumerate(valid_rows):
-            wi = WizardImport(
-                session_id=session_id,
-                entity_type=entity_type,
-                row_data=row,
-                row_index=i,
-            )
-            db.session.add(wi)
-
+            return {'imported': 0, 'errors': ['Invalid session_id'], 'error_count': 1, 'total': 0}
+
+        path = self.error_file_path(session_id, entity_type)
+        if os.path.exists(path):
+            os.remove(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        errors = ErrorReport(path, MAX_REPORTED_ERRORS)
+        counts = {}
+        batch_size = current_app.config['WIZARD_STAGE_BATCH_SIZE']
+
+        # Clear pending rows left by an earlier import that never finished
+        pending = pending_key(entity_type)
+        delete_staged(session_id, pending)
+        stage = stage_columnar if current_app.config['WIZARD_STAGING_FORMAT'] == 'columnar' else stage_rows
+
+        def committed_batch(staged):
+            db.session.commit()
+            if on_batch:
+                on_batch(dict(counts, valid=counts['total'] - counts['invalid']))
+
+        checked = (
+            (values, [e.to_dict() for e in row_errors] or None)
+            for values, row_errors in self.iter_checked_rows(entity_type, rows, errors, counts)
+        )
+        try:
+            stage(session_id, pending, checked, batch_size, on_batch=committed_batch)
+        except Exception:
+            db.session.rollback()
+            delete_staged(session_id, pending)
+            db.session.commit()
+            raise
+        finally:
+            errors.close()
+
+        swap_staged(session_id, entity_type)
         ws.updated_at = datetime.now(timezone.utc)
         db.session.commit()
 
         return {
-            'imported': len(valid_rows),
-            'errors': errors[:20],  # cap at 20 errors
-            'total': len(rows),
+            'imported': counts.get('total', 0) - counts.get('invalid', 0),
+            'errors': errors.messages,  # capped at MAX_REPORTED_ERRORS
+            'error_count': errors.count,
+            'total': counts.get('total', 0),
         }
 
-    def get_preview(self, session_id, entity_type, limit=50):
-        """Return imported rows for preview."""
-        rows = WizardImport.query.filter_by(
-            session_id=session_id, entity_type=entity_type
-        ).order_by(WizardImport.row_index).limit(limit).all()
-        return [r.row_data for r in rows]
+    def error_file_path(self, session_id, entity_type):
+        """Path of the CSV holding every error from the last import."""
+        error_dir = current_app.config.get('WIZARD_ERROR_DIR') or os.path.join(
+            current_app.instance_path, 'import_errors'
+        )
+        return os.path.join(
+            error_dir, f'{secure_filename(session_id)}-{secure_filename(entity_type)}-errors.csv'
+        )
+
+    def get_preview(self, session_id, entity_type, limit=50, after=None,
+                    columns=None, filters=None, errors_only=False):
+        """Return a page of staged rows for review.
+
+        Rows come in ``row_index`` order after the ``after`` cursor.
+        ``columns`` limits the returned row data to those columns,
+        ``filters`` maps columns to text their values must contain, and
+        ``errors_only`` returns only rows that failed validation.
+        """
+        rows, has_more = page_staged(
+            session_id, entity_type, after=after, limit=limit,
+            filters=filters, errors_only=errors_only,
+        )
+        if columns:
+            rows = [
+                (row_index, {c: row_data[c] for c in columns if c in row_data}, row_errors)
+                for row_index, row_data, row_errors in rows
+            ]
+        return {
+            'rows': [
+                {'row_index': row_index, 'data': row_data, 'errors': row_errors}
+                for row_index, row_data, row_errors in rows
+            ],
+            'next_cursor': rows[-1][0] if has_more else None,
+        }
 
     def get_session_status(self, session_id):
         """Return counts per entity type for this session."""
@@ -195,23 +297,60 @@ class WizardService:
         if not ws:
             return None
 
-        counts = db.session.query(
-            WizardImport.entity_type,
-            db.func.count(WizardImport.id)
-        ).filter_by(session_id=session_id).group_by(
-            WizardImport.entity_type
-        ).all()
-
+        counts = staged_counts(session_id)
         return {
             'session_id': session_id,
             'created_at': ws.created_at.isoformat(),
             'updated_at': ws.updated_at.isoformat() if ws.updated_at else None,
-            'entities': {et: count for et, count in counts},
-            'total_rows': sum(c for _, c in counts),
+            'entities': counts,
+            'invalid': staged_counts(session_id, invalid=True),
+            'total_rows': sum(counts.values()),
         }
 
     def clear_session(self, session_id):
         """Delete all staged data for a session."""
-        WizardImport.query.filter_by(session_id=session_id).delete()
+        delete_staged(session_id)
         WizardSession.query.filter_by(session_id=session_id).delete()
         db.session.commit()
+        for entity_type in ENTITY_TYPES:
+            path = self.error_file_path(session_id, entity_type)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def stage_rows(session_id, entity_type, rows, batch_size, on_batch=None):
+    """Bulk-insert rows into wizard_imports in batches; return the row count.
+
+    ``rows`` yields ``(row_data, errors)`` pairs, errors being None for
+    valid rows. Each batch is one executemany of plain dicts, with no ORM
+    objects or unit-of-work bookkeeping per row. ``on_batch(staged)`` is
+    called after each batch. Does not commit.
+    """
+    now = datetime.now(timezone.utc)
+    batch = []
+    staged = 0
+    for row, errors in rows:
+        batch.append({
+            'session_id': session_id,
+            'entity_type': entity_type,
+            'row_data': row,
+            'row_index': staged,
+            'errors': errors,
+            'created_at': now,
+        })
+        staged += 1
+        if len(batch) >= batch_size:
+            db.session.execute(insert(WizardImport), batch)
+            batch = []
+            if on_batch:
+                on_batch(staged)
+    if batch:
+        db.session.execute(insert(WizardImport), batch)
+    if on_batch:
+        on_batch(staged)
+    return staged
+
+
+def _chain_first(first, rest):
+    yield first
+    yield from rest
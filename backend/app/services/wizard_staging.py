@@ -0,0 +1,275 @@
+"""Storage of staged wizard rows.
+
+Rows are staged either as one WizardImport record per row (``rows``) or as
+compressed columnar WizardImportChunk blobs (``columnar``), chosen by
+``WIZARD_STAGING_FORMAT``. A columnar chunk stores the header once and one
+array per column; columns with many repeated values are dictionary
+encoded. Rows that failed validation are staged with their errors for
+review and skipped by the commit. The readers here accept both formats.
+"""
+import json
+import zlib
+from datetime import datetime, timezone
+from itertools import islice
+
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models.wizard_import import WizardImport, WizardImportChunk
+
+STAGING_FORMATS = ('rows', 'columnar')
+
+# A re-import stages under ``<entity_type>:pending`` until it succeeds, so
+# the rows of the previous upload stay in place if it fails or is cancelled
+PENDING_SUFFIX = ':pending'
+
+# Dictionary-encode a column when it has at most this share of distinct values
+DICTIONARY_RATIO = 0.5
+
+
+def encode_chunk(rows, errors=None):
+    """Compress a list of row dicts into a columnar payload.
+
+    Columns are the union of row keys in first-seen order; offsets of rows
+    lacking a column are kept in ``absent`` so decoding restores each row's
+    exact keys. ``errors`` is an optional list of per-row error lists
+    (None for valid rows), stored by offset.
+    """
+    names = {}
+    for row in rows:
+        for key in row:
+            names.setdefault(key, None)
+
+    columns = []
+    for name in names:
+        values = []
+        absent = []
+        for offset, row in enumerate(rows):
+            if name in row:
+                values.append(row[name])
+            else:
+                values.append(None)
+                absent.append(offset)
+        column = {'name': name}
+        codes = _dictionary_codes(values)
+        if codes is not None:
+            column['dict'], column['codes'] = codes
+        else:
+            column['values'] = values
+        if absent:
+            column['absent'] = absent
+        columns.append(column)
+
+    data = {'count': len(rows), 'columns': columns}
+    if errors and any(errors):
+        data['errors'] = {str(offset): e for offset, e in enumerate(errors) if e}
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_chunk(payload):
+    """Decompress a columnar payload into ``(rows, errors)`` lists."""
+    data = json.loads(zlib.decompress(payload))
+    rows = [{} for _ in range(data['count'])]
+    for column in data['columns']:
+        name = column['name']
+        if 'codes' in column:
+            dictionary = column['dict']
+            values = (dictionary[code] for code in column['codes'])
+        else:
+            values = column['values']
+        absent = set(column.get('absent', ()))
+        for offset, (row, value) in enumerate(zip(rows, values)):
+            if offset not in absent:
+                row[name] = value
+    row_errors = data.get('errors', {})
+    return rows, [row_errors.get(str(offset)) for offset in range(data['count'])]
+
+
+def _dictionary_codes(values):
+    """Return ``(dictionary, codes)`` if dictionary encoding pays off."""
+    limit = int(len(values) * DICTIONARY_RATIO)
+    dictionary = {}
+    codes = []
+    for value in values:
+        try:
+            # Keyed by type too, since 1, 1.0 and True are equal dict keys
+            code = dictionary.setdefault((type(value), value), len(dictionary))
+        except TypeError:
+            return None  # lists or objects from JSON rows
+        if len(dictionary) > limit:
+            return None
+        codes.append(code)
+    return [value for _, value in dictionary], codes
+
+
+def stage_columnar(session_id, entity_type, rows, batch_size, on_batch=None):
+    """Stage rows as columnar chunks of ``batch_size``; return the row count.
+
+    Same contract as ``stage_rows``: ``rows`` yields ``(row_data, errors)``
+    pairs, ``on_batch(staged)`` is called after each chunk and nothing is
+    committed.
+    """
+    rows = iter(rows)
+    staged = 0
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        errors = [row_errors for _, row_errors in chunk]
+        db.session.execute(insert(WizardImportChunk), [{
+            'session_id': session_id,
+            'entity_type': entity_type,
+            'row_start': staged,
+            'row_count': len(chunk),
+            'error_count': sum(1 for e in errors if e),
+            'payload': encode_chunk([row for row, _ in chunk], errors),
+            'created_at': datetime.now(timezone.utc),
+        }])
+        staged += len(chunk)
+        if on_batch:
+            on_batch(staged)
+    if on_batch and not staged:
+        on_batch(staged)
+    return staged
+
+
+def iter_staged(session_id, entity_type, batch_size=1000, valid_only=False):
+    """Yield ``(row_index, row_data, errors)`` for staged rows in row order.
+
+    ``errors`` is None for valid rows; ``valid_only`` skips the others.
+    Chunks are decompressed one at a time as they are reached.
+    """
+    query = db.session.query(
+        WizardImport.row_index, WizardImport.row_data, WizardImport.errors
+    ).filter_by(session_id=session_id, entity_type=entity_type)
+    if valid_only:
+        query = query.filter(WizardImport.errors.is_(None))
+    yield from query.order_by(WizardImport.row_index).yield_per(batch_size)
+
+    for row_start, rows, errors in _iter_chunks(session_id, entity_type):
+        for offset, (row_data, row_errors) in enumerate(zip(rows, errors)):
+            if not (valid_only and row_errors):
+                yield row_start + offset, row_data, row_errors
+
+
+def page_staged(session_id, entity_type, after=None, limit=50, filters=None, errors_only=False):
+    """Return up to ``limit`` staged rows after row index ``after``.
+
+    ``filters`` maps column names to text that the column's value must
+    contain (case-insensitive); ``errors_only`` keeps rows that failed
+    validation. Returns ``(rows, has_more)`` with rows as
+    ``(row_index, row_data, errors)``. Row-format pages are one indexed
+    range query over (session_id, entity_type, row_index); columnar pages
+    decode only chunks past the cursor, skipping error-free chunks when
+    ``errors_only`` is set.
+    """
+    filters = filters or {}
+    query = db.session.query(
+        WizardImport.row_index, WizardImport.row_data, WizardImport.errors
+    ).filter_by(session_id=session_id, entity_type=entity_type)
+    if after is not None:
+        query = query.filter(WizardImport.row_index > after)
+    if errors_only:
+        query = query.filter(WizardImport.errors.isnot(None))
+    for column, text in filters.items():
+        query = query.filter(
+            WizardImport.row_data[column].as_string().ilike(f'%{_escape_like(text)}%', escape='\\')
+        )
+    rows = query.order_by(WizardImport.row_index).limit(limit + 1).all()
+    if rows:
+        return [tuple(row) for row in rows[:limit]], len(rows) > limit
+
+    # Columnar staging (an entity type is staged in one format at a time)
+    needles = {column: text.casefold() for column, text in filters.items()}
+    rows = []
+    for row_start, chunk_rows, errors in _iter_chunks(session_id, entity_type, after, errors_only):
+        for offset, (row_data, row_errors) in enumerate(zip(chunk_rows, errors)):
+            row_index = row_start + offset
+            if after is not None and row_index <= after:
+                continue
+            if errors_only and not row_errors:
+                continue
+            if any(needle not in str(row_data.get(column, '')).casefold()
+                   for column, needle in needles.items()):
+                continue
+            rows.append((row_index, row_data, row_errors))
+            if len(rows) > limit:
+                return rows[:limit], True
+    return rows, False
+
+
+def _iter_chunks(session_id, entity_type, after=None, errors_only=False):
+    """Yield ``(row_start, rows, errors)`` per chunk, fetching payloads lazily."""
+    query = db.session.query(
+        WizardImportChunk.id, WizardImportChunk.row_start
+    ).filter_by(session_id=session_id, entity_type=entity_type)
+    if after is not None:
+        query = query.filter(
+            WizardImportChunk.row_start + WizardImportChunk.row_count > after + 1
+        )
+    if errors_only:
+        query = query.filter(WizardImportChunk.error_count > 0)
+    for chunk_id, row_start in query.order_by(WizardImportChunk.row_start).all():
+        payload = db.session.query(WizardImportChunk.payload).filter_by(id=chunk_id).scalar()
+        rows, errors = decode_chunk(payload)
+        yield row_start, rows, errors
+
+
+def staged_counts(session_id, invalid=False):
+    """Return ``{entity_type: row count}`` of valid (or invalid) staged rows."""
+    condition = WizardImport.errors.isnot(None) if invalid else WizardImport.errors.is_(None)
+    counts = dict(db.session.query(
+        WizardImport.entity_type, db.func.count(WizardImport.id)
+    ).filter_by(session_id=session_id).filter(condition).group_by(WizardImport.entity_type).all())
+    chunk_rows = (WizardImportChunk.error_count if invalid
+                  else WizardImportChunk.row_count - WizardImportChunk.error_count)
+    for entity_type, count in db.session.query(
+        WizardImportChunk.entity_type, db.func.sum(chunk_rows)
+    ).filter_by(session_id=session_id).group_by(WizardImportChunk.entity_type):
+        if count:
+            counts[entity_type] = counts.get(entity_type, 0) + int(count)
+    return {e: n for e, n in counts.items() if not e.endswith(PENDING_SUFFIX)}
+
+
+def staged_version(session_id):
+    """Return a cheap fingerprint of a session's staged rows.
+
+    Counts catch rows added or removed; max ids and creation times catch a
+    clear followed by a re-import of the same number of rows.
+    """
+    parts = []
+    for model in (WizardImport, WizardImportChunk):
+        parts.extend(db.session.query(
+            db.func.count(model.id), db.func.max(model.id), db.func.max(model.created_at)
+        ).filter(model.session_id == session_id).one())
+    return '|'.join(str(v) for v in parts)
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def delete_staged(session_id, entity_type=None):
+    """Delete a session's staged rows (of one entity type if given)."""
+    for model in (WizardImport, WizardImportChunk):
+        query = model.query.filter_by(session_id=session_id)
+        if entity_type is not None:
+            query = query.filter_by(entity_type=entity_type)
+        query.delete()
+
+
+def pending_key(entity_type):
+    """Entity type under which an import in progress stages its rows."""
+    return entity_type + PENDING_SUFFIX
+
+
+def swap_staged(session_id, entity_type):
+    """Replace an entity type's staged rows with its pending ones.
+
+    Does not commit, so the old rows go and the new ones appear together.
+    """
+    delete_staged(session_id, entity_type)
+    for model in (WizardImport, WizardImportChunk):
+        model.query.filter_by(
+            session_id=session_id, entity_type=pending_key(entity_type)
+        ).update({'entity_type': entity_type}, synchronize_session=False)
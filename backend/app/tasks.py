@@ -0,0 +1,117 @@
+"""In-process periodic background tasks.
+
+Each task runs on a daemon thread inside an application context. Tasks are
+enabled by setting their interval (in seconds) in the app config; an interval
+of 0 leaves the task disabled. Tasks never start under the testing config.
+
+Every worker process (e.g. each gunicorn worker) starts the same tasks, so
+a run first takes the task's TaskLease row: only the process holding an
+unexpired lease runs the task, and another process takes over once the
+holder has stopped renewing it for two intervals.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models.task_lease import TaskLease
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask(threading.Thread):
+    """Daemon thread that calls ``func`` every ``interval`` seconds."""
+
+    def __init__(self, app, name, interval, func):
+        super().__init__(name=name, daemon=True)
+        self.app = app
+        self.interval = interval
+        self.func = func
+        self._stop_event = threading.Event()
+
+    def run(self):
+        holder = f'{socket.gethostname()}:{os.getpid()}'
+        while not self._stop_event.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    if self._acquire(holder):
+                        self.func()
+                        self._acquire(holder)  # renew from the end of a long run
+                except Exception:
+                    logger.exception('Periodic task %s failed', self.name)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def _acquire(self, holder):
+        """Take or renew this task's lease. Returns False if another process holds it."""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        expires_at = now + timedelta(seconds=self.interval * 2)
+        table = TaskLease.__table__
+        renewed = db.session.execute(update(table).where(
+            table.c.name == self.name,
+            or_(table.c.holder == holder, table.c.expires_at < now),
+        ).values(holder=holder, expires_at=expires_at)).rowcount
+        if not renewed:
+            if db.session.get(TaskLease, self.name) is not None:
+                db.session.rollback()
+                return False
+            db.session.add(TaskLease(name=self.name, holder=holder, expires_at=expires_at))
+        try:
+            db.session.commit()
+        except IntegrityError:  # another process created the lease first
+            db.session.rollback()
+            return False
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def register_tasks(app):
+    """Start the periodic tasks enabled in the app config."""
+    if app.config.get('TESTING'):
+        return
+
+    tasks = []
+
+    interval = app.config.get('LICENSE_SEAT_RECONCILE_INTERVAL', 0)
+    if interval:
+        from app.services.license_service import LicenseService
+        tasks.append(PeriodicTask(
+            app, 'license-seat-reconcile', interval,
+            LicenseService().reconcile_all_sessions,
+        ))
+
+    interval = app.config.get('ASSET_SNAPSHOT_INTERVAL', 0)
+    if interval:
+        from app.services.history_service import HistoryService
+        tasks.append(PeriodicTask(
+            app, 'asset-snapshot', interval,
+            HistoryService().snapshot_all_sessions,
+        ))
+
+    interval = app.config.get('CHANGE_ARCHIVE_INTERVAL', 0)
+    if interval:
+        from app.services.retention_service import RetentionService
+        tasks.append(PeriodicTask(
+            app, 'change-archive', interval,
+            RetentionService().archive_all_sessions,
+        ))
+
+    interval = app.config.get('WIZARD_GC_INTERVAL', 0)
+    if interval:
+        from app.services.wizard_gc_service import WizardGCService
+        tasks.append(PeriodicTask(
+            app, 'wizard-gc', interval,
+            WizardGCService().sweep,
+        ))
+
+    for task in tasks:
+        task.start()
+    app.extensions['periodic_tasks'] = tasks
@@ -8,6 +8,12 @@ interface AssetListResponse {
   per_page: number;
 }
 
+export interface AssetChangePage {
+  changes: AssetChange[];
+  next_cursor: string | null;
+  limit: number;
+}
+
 export const assetsApi = {
   getAssets: async (filters?: AssetFilters, page = 1, perPage = 50): Promise<AssetListResponse> => {
     const params: Record<string, string | number> = { page, per_page: perPage };
@@ -48,8 +54,10 @@ export const assetsApi = {
     return data;
   },
 
-  getAssetChanges: async (id: number): Promise<AssetChange[]> => {
-    const { data } = await client.get<AssetChange[]>(`/assets/${id}/changes`);
+  getAssetChanges: async (id: number, cursor?: string): Promise<AssetChangePage> => {
+    const params: Record<string, string> = {};
+    if (cursor) params.cursor = cursor;
+    const { data } = await client.get<AssetChangePage>(`/assets/${id}/changes`, { params });
     return data;
   },
 };
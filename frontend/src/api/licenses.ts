@@ -1,14 +1,26 @@
 import client from './client';
 import type { License } from '@/types';
 
+export interface LicenseSummary {
+  annual_cost: number;
+  total_seats: number;
+  used_seats: number;
+  expiring_soon: number;
+}
+
 interface LicenseListResponse {
   licenses: License[];
   total: number;
+  page: number;
+  per_page: number;
+  summary: LicenseSummary;
 }
 
 export const licensesApi = {
-  getLicenses: async (): Promise<LicenseListResponse> => {
-    const { data } = await client.get<LicenseListResponse>('/licenses');
+  getLicenses: async (page = 1, perPage = 50): Promise<LicenseListResponse> => {
+    const { data } = await client.get<LicenseListResponse>('/licenses', {
+      params: { page, per_page: perPage },
+    });
     return data;
   },
 
@@ -158,6 +158,7 @@ export default function AssetDetailPage() {
   const [relationships, setRelationships] = useState<AssetRelationship[]>(MOCK_RELATIONSHIPS);
   const [licenses, setLicenses] = useState<License[]>(MOCK_LICENSES);
   const [changes, setChanges] = useState<AssetChange[]>(MOCK_CHANGES);
+  const [changesCursor, setChangesCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
 
   useEffect(() => {
@@ -178,7 +179,10 @@ export default function AssetDetailPage() {
       if (assetRes.status === 'fulfilled') setAsset(assetRes.value);
       if (relRes.status === 'fulfilled') setRelationships(relRes.value.relationships || relRes.value);
       if (licRes.status === 'fulfilled') setLicenses(licRes.value.licenses || licRes.value);
-      if (chgRes.status === 'fulfilled') setChanges(chgRes.value);
+      if (chgRes.status === 'fulfilled') {
+        setChanges(chgRes.value.changes);
+        setChangesCursor(chgRes.value.next_cursor);
+      }
     }).finally(() => {
       if (!cancelled) setLoading(false);
     });
@@ -186,6 +190,14 @@ export default function AssetDetailPage() {
     return () => { cancelled = true; };
   }, [id]);
 
+  const loadMoreChanges = () => {
+    if (!id || !changesCursor) return;
+    assetsApi.getAssetChanges(parseInt(id, 10), changesCursor).then((page) => {
+      setChanges((prev) => [...prev, ...page.changes]);
+      setChangesCursor(page.next_cursor);
+    });
+  };
+
   if (loading && !asset) {
     return (
       <div className="flex items-center justify-center py-20 text-eaw-muted">
@@ -458,6 +470,14 @@ export default function AssetDetailPage() {
                 </div>
               </div>
             ))}
+            {changesCursor && (
+              <button
+                onClick={loadMoreChanges}
+                className="text-sm text-eaw-link hover:text-eaw-link-hover"
+              >
+                Load older changes
+              </button>
+            )}
           </div>
         ) : (
           <p className="text-sm text-eaw-muted">No change history available.</p>
@@ -7,6 +7,7 @@ import {
   AlertTriangle,
 } from 'lucide-react';
 import { licensesApi } from '@/api/licenses';
+import type { LicenseSummary } from '@/api/licenses';
 import type { License } from '@/types';
 
 /* ── Mock Data ──────────────────────────────────────────────────────── */
@@ -41,31 +42,52 @@ function formatCurrency(n: number): string {
   return '$' + n.toLocaleString();
 }
 
+const PER_PAGE = 50;
+
 export default function LicenseTrackerPage() {
   const [licenses, setLicenses] = useState<License[]>(MOCK_LICENSES);
+  const [summary, setSummary] = useState<LicenseSummary | null>(null);
+  const [total, setTotal] = useState(MOCK_LICENSES.length);
+  const [page, setPage] = useState(1);
   const [loading, setLoading] = useState(false);
 
   useEffect(() => {
     setLoading(true);
     licensesApi
-      .getLicenses()
-      .then((res) => setLicenses(res.licenses))
+      .getLicenses(page, PER_PAGE)
+      .then((res) => {
+        setLicenses(res.licenses);
+        setSummary(res.summary);
+        setTotal(res.total);
+      })
       .catch(() => {
         /* keep mock */
       })
       .finally(() => setLoading(false));
-  }, []);
+  }, [page]);
+
+  const pageCount = Math.max(1, Math.ceil(total / PER_PAGE));
 
+  // KPIs cover every license, so they come from the server summary rather
+  // than the current page; the mock data is summed locally.
   const stats = useMemo(() => {
-    const totalCost = licenses.reduce((sum, l) => sum + l.annual_cost, 0);
-    const totalSeats = licenses.reduce((sum, l) => sum + l.total_seats, 0);
-    const usedSeats = licenses.reduce((sum, l) => sum + l.used_seats, 0);
+    const totalCost = summary
+      ? summary.annual_cost
+      : licenses.reduce((sum, l) => sum + l.annual_cost, 0);
+    const totalSeats = summary
+      ? summary.total_seats
+      : licenses.reduce((sum, l) => sum + l.total_seats, 0);
+    const usedSeats = summary
+      ? summary.used_seats
+      : licenses.reduce((sum, l) => sum + l.used_seats, 0);
     const avgUtil = totalSeats > 0 ? Math.round((usedSeats / totalSeats) * 100) : 0;
-    const expiringSoon = licenses.filter(
-      (l) => l.status === 'active' && daysUntil(l.expiry_date) <= 90 && daysUntil(l.expiry_date) > 0
-    ).length;
+    const expiringSoon = summary
+      ? summary.expiring_soon
+      : licenses.filter(
+          (l) => l.status === 'active' && daysUntil(l.expiry_date) <= 90 && daysUntil(l.expiry_date) > 0
+        ).length;
     return { totalCost, totalSeats, avgUtil, expiringSoon };
-  }, [licenses]);
+  }, [licenses, summary]);
 
   // Sort: expired first, then by expiry date ascending
   const sortedLicenses = useMemo(() => {
@@ -133,7 +155,7 @@ export default function LicenseTrackerPage() {
             <Key size={14} />
             All Licenses
           </span>
-          <span className="badge-muted">{licenses.length}</span>
+          <span className="badge-muted">{total}</span>
         </div>
         {/* Desktop table */}
         <div className="eaw-section-content p-0 overflow-x-auto hidden md:block">
@@ -296,6 +318,28 @@ export default function LicenseTrackerPage() {
             </div>
           )}
         </div>
+
+        {pageCount > 1 && (
+          <div className="flex items-center justify-between px-4 py-3 border-t border-eaw-border text-sm">
+            <button
+              onClick={() => setPage((p) => p - 1)}
+              disabled={page <= 1 || loading}
+              className="text-eaw-link hover:text-eaw-link-hover disabled:text-eaw-muted"
+            >
+              Previous
+            </button>
+            <span className="text-eaw-muted">
+              Page {page} of {pageCount}
+            </span>
+            <button
+              onClick={() => setPage((p) => p + 1)}
+              disabled={page >= pageCount || loading}
+              className="text-eaw-link hover:text-eaw-link-hover disabled:text-eaw-muted"
+            >
+              Next
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );